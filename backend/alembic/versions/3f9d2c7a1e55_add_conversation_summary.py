@@ -0,0 +1,30 @@
+"""Add rolling summary to conversations
+
+Revision ID: 3f9d2c7a1e55
+Revises: 7c1e2a9d4b10
+Create Date: 2026-10-19 11:02:47.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9d2c7a1e55'
+down_revision: Union[str, None] = '7c1e2a9d4b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_message_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversations', 'summary_message_id')
+    op.drop_column('conversations', 'summary')
@@ -0,0 +1,30 @@
+"""Composite indexes for chat cursor pagination
+
+Revision ID: 5a7e3b91c2d4
+Revises: 3f9d2c7a1e55
+Create Date: 2026-10-19 13:41:09.552170
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a7e3b91c2d4'
+down_revision: Union[str, None] = '3f9d2c7a1e55'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_conversations_user_id_last_modified', 'conversations', ['user_id', 'last_modified'], unique=False)
+    op.create_index('ix_messages_convo_id_created_at', 'messages', ['convo_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_messages_convo_id_created_at', table_name='messages')
+    op.drop_index('ix_conversations_user_id_last_modified', table_name='conversations')
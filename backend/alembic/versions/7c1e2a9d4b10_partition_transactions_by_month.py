@@ -0,0 +1,124 @@
+"""Partition transactions by month on date_posted
+
+Revision ID: 7c1e2a9d4b10
+Revises: b345b3b3ec0c
+Create Date: 2026-10-19 10:12:31.204518
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.partitions import install_partitioning_ddl, ensure_transaction_partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e2a9d4b10'
+down_revision: Union[str, None] = 'b345b3b3ec0c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = (
+    "id, user_id, plaid_transaction_id, date_posted, name, amount, type, payment_source, "
+    "plaid_category, user_category, is_recurring, new_balance_after_transaction, notes, created_at"
+)
+
+
+def _rename_constraint(table, old, new):
+    op.execute(f"""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = '{old}') THEN
+                ALTER TABLE {table} RENAME CONSTRAINT {old} TO {new};
+            END IF;
+        END $$;
+    """)
+
+
+def _transaction_columns():
+    return [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('plaid_transaction_id', sa.String(), nullable=False),
+        sa.Column('date_posted', sa.Date(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('type', sa.String(), nullable=False),
+        sa.Column('payment_source', sa.String(), nullable=True),
+        sa.Column('plaid_category', sa.String(), nullable=True),
+        sa.Column('user_category', sa.String(), nullable=True),
+        sa.Column('is_recurring', sa.Boolean(), nullable=True),
+        sa.Column('new_balance_after_transaction', sa.Numeric(precision=10, scale=2), nullable=True),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    has_legacy = sa.inspect(conn).has_table('transactions')
+
+    if has_legacy:
+        # Move the unpartitioned table out of the way (its names would collide)
+        op.rename_table('transactions', 'transactions_legacy')
+        _rename_constraint('transactions_legacy', 'transactions_pkey', 'transactions_legacy_pkey')
+        _rename_constraint('transactions_legacy', 'transactions_plaid_transaction_id_key',
+                           'transactions_legacy_plaid_transaction_id_key')
+        op.execute("ALTER INDEX IF EXISTS ix_transactions_user_id RENAME TO ix_transactions_legacy_user_id")
+        # Keep the id sequence alive when the legacy table is dropped
+        op.execute("ALTER SEQUENCE IF EXISTS transactions_id_seq OWNED BY NONE")
+
+    op.create_table('transaction_keys',
+    sa.Column('plaid_transaction_id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date_posted', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('plaid_transaction_id')
+    )
+    op.create_table('transactions',
+    *_transaction_columns(),
+    sa.PrimaryKeyConstraint('id', 'date_posted'),
+    postgresql_partition_by='RANGE (date_posted)'
+    )
+    op.create_index(op.f('ix_transactions_user_id'), 'transactions', ['user_id'], unique=False)
+    op.create_index(op.f('ix_transactions_plaid_transaction_id'), 'transactions', ['plaid_transaction_id'], unique=False)
+    op.create_index('ix_transactions_user_id_date_posted', 'transactions', ['user_id', 'date_posted'], unique=False)
+
+    install_partitioning_ddl(conn)
+
+    since = None
+    if has_legacy:
+        since = conn.execute(sa.text("SELECT min(date_posted) FROM transactions_legacy")).scalar()
+    ensure_transaction_partitions(conn, since=since or date.today())
+
+    if has_legacy:
+        # The key trigger rejects duplicate Plaid ids, same as the old unique constraint
+        op.execute(f"INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_legacy")
+        op.execute("SELECT setval('transactions_id_seq', COALESCE((SELECT max(id) FROM transactions), 0) + 1, false)")
+        op.drop_table('transactions_legacy')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table('transactions_unpartitioned',
+    *_transaction_columns(),
+    sa.PrimaryKeyConstraint('id', name='transactions_unpartitioned_pkey'),
+    sa.UniqueConstraint('plaid_transaction_id', name='transactions_unpartitioned_plaid_transaction_id_key')
+    )
+    op.execute(f"INSERT INTO transactions_unpartitioned ({COLUMNS}) SELECT {COLUMNS} FROM transactions")
+
+    op.drop_table('transactions')  # drops every partition with it
+    op.execute("DROP FUNCTION IF EXISTS transactions_maintain_keys()")
+    op.drop_table('transaction_keys')
+
+    op.rename_table('transactions_unpartitioned', 'transactions')
+    _rename_constraint('transactions', 'transactions_unpartitioned_pkey', 'transactions_pkey')
+    _rename_constraint('transactions', 'transactions_unpartitioned_plaid_transaction_id_key',
+                       'transactions_plaid_transaction_id_key')
+    op.execute("ALTER TABLE transactions ALTER COLUMN id SET DEFAULT nextval('transactions_id_seq')")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+    op.create_index(op.f('ix_transactions_user_id'), 'transactions', ['user_id'], unique=False)
@@ -0,0 +1,40 @@
+"""Add per-user conversation title counter
+
+Revision ID: 8b2f6d0e4a13
+Revises: 5a7e3b91c2d4
+Create Date: 2026-10-19 14:20:36.871045
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2f6d0e4a13'
+down_revision: Union[str, None] = '5a7e3b91c2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('conversation_counter', sa.Integer(), server_default='0', nullable=False))
+    # Continue numbering after the highest existing "New Conversation N" title
+    op.execute(r"""
+        UPDATE users
+           SET conversation_counter = numbered.max_num
+          FROM (
+                SELECT user_id, max(substring(title from '^New Conversation (\d+)')::int) AS max_num
+                  FROM conversations
+                 WHERE title ~ '^New Conversation \d+'
+                 GROUP BY user_id
+               ) AS numbered
+         WHERE numbered.user_id = users.id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'conversation_counter')
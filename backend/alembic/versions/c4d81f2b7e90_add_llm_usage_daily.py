@@ -0,0 +1,38 @@
+"""Add per-user daily LLM usage table
+
+Revision ID: c4d81f2b7e90
+Revises: 8b2f6d0e4a13
+Create Date: 2026-10-19 16:05:12.334918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d81f2b7e90'
+down_revision: Union[str, None] = '8b2f6d0e4a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('llm_usage_daily',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('requests', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('prompt_tokens', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('completion_tokens', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('cost_usd', sa.Numeric(precision=12, scale=6), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('llm_usage_daily')
@@ -1,135 +1,25 @@
+import os
+from dotenv import load_dotenv
 
-# SSL applied only when needed for specific services (like Plaid)
-import sys
-
-# Apply SSL fix for urllib3 recursion issues (especially in production environments)
-def apply_urllib3_ssl_fix():
-    """Apply comprehensive SSL fix for urllib3 recursion issues"""
-    try:
-        import urllib3.util.ssl_
-        import ssl
-        
-        # Check if already patched to avoid recursion
-        if hasattr(urllib3.util.ssl_.create_urllib3_context, '_patched_for_production'):
-            return True
-            
-        # Store the original function
-        original_func = urllib3.util.ssl_.create_urllib3_context
-        
-        def production_safe_ssl_context(*args, **kwargs):
-            """Production-safe SSL context that prevents recursion"""
-            try:
-                # Try to create a simple, direct SSL context
-                context = ssl.create_default_context()
-                
-                # Basic secure settings
-                context.check_hostname = True
-                context.verify_mode = ssl.CERT_REQUIRED
-                
-                # Disable insecure protocols
-                try:
-                    context.options |= ssl.OP_NO_SSLv2
-                    context.options |= ssl.OP_NO_SSLv3
-                    context.options |= ssl.OP_NO_TLSv1
-                    context.options |= ssl.OP_NO_TLSv1_1
-                except AttributeError:
-                    # Some options might not be available in all environments
-                    pass
-                
-                return context
-                
-            except Exception as fallback_error:
-                # Ultimate fallback - create minimal SSL context
-                try:
-                    return ssl.create_default_context()
-                except Exception:
-                    # If all else fails, try the original function once
-                    try:
-                        return original_func(*args, **kwargs)
-                    except RecursionError:
-                        # Create absolutely minimal context
-                        return ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-        
-        # Mark as patched and apply
-        production_safe_ssl_context._patched_for_production = True
-        urllib3.util.ssl_.create_urllib3_context = production_safe_ssl_context
-        
-        print("✅ Applied production-safe SSL fix for urllib3")
-        return True
-        
-    except Exception as e:
-        print(f"⚠️ Could not apply SSL fix: {e}")
-        return False
-
-# Apply the fix immediately
-apply_urllib3_ssl_fix()
-
-# Additional production environment SSL fixes
-def apply_production_ssl_fixes():
-    """Apply additional SSL fixes specifically for production environments"""
-    try:
-        import os
-        
-        # Check if we're in production
-        is_production = (
-            os.getenv('FLASK_ENV') == 'production' or 
-            os.getenv('RENDER') or 
-            os.getenv('PORT') or
-            'render.com' in os.getenv('RENDER_EXTERNAL_HOSTNAME', '')
-        )
-        
-        if is_production:
-            # Set environment variables that might help with SSL
-            os.environ['PYTHONHTTPSVERIFY'] = '1'
-            os.environ['CURL_CA_BUNDLE'] = ''
-            
-            # Try to preload and configure requests/urllib3 for production
-            try:
-                import requests
-                import urllib3
-                
-                # Disable urllib3 warnings that might interfere
-                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-                
-                # Create a session with specific SSL settings for Stripe
-                session = requests.Session()
-                adapter = requests.adapters.HTTPAdapter(
-                    max_retries=urllib3.util.retry.Retry(
-                        total=3,
-                        backoff_factor=0.1,
-                        status_forcelist=[500, 502, 503, 504]
-                    )
-                )
-                session.mount('https://', adapter)
-                
-                # Store the session for later use
-                import stripe
-                if hasattr(stripe, 'set_app_info'):
-                    stripe.set_app_info("Polarity", version="1.0.0")
-                
-                print("✅ Applied production SSL configurations")
-                
-            except Exception as e:
-                print(f"⚠️ Could not apply production SSL configs: {e}")
-                
-    except Exception as e:
-        print(f"⚠️ Error in production SSL setup: {e}")
-
-# Apply production fixes
-apply_production_ssl_fixes()
+load_dotenv()
+
+# urllib3 SSL workarounds for old production images, off unless SSL_COMPAT_PATCHES=true.
+# Applied before anything imports urllib3 (see ssl_patches.py).
+if os.getenv('SSL_COMPAT_PATCHES', 'False').lower() == 'true':
+    from .ssl_patches import apply_ssl_patches
+    apply_ssl_patches()
 
-import os
 from flask import Flask, jsonify
 from flask_cors import CORS
 from .config import Config
-from .database import test_db_connection
-from dotenv import load_dotenv
+from .database import init_app as init_db
+from .auth.passwords import PasswordHasherBusy
+from .auth.revocation import revocation_store
+from . import lifecycle, query_stats, rate_limit, tracing
 from flask_jwt_extended import JWTManager
-from .extensions import blacklist
 
 from flask_socketio import SocketIO
 
-blacklist = set()
 # SocketIO CORS - environment-based (default to * for local dev, restrict in production)
 socketio_cors_origins = os.getenv('SOCKETIO_CORS_ORIGINS', '*')
 # Configure SocketIO for gevent compatibility (used in production with gunicorn)
@@ -169,22 +59,32 @@ def create_app():
              
          ],
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-         expose_headers=["Content-Type", "Authorization"]
+         expose_headers=["Content-Type", "Authorization", "X-Next-Cursor"]
          )
 
     jwt = JWTManager(app)
 
-    #register blacklist loader
+    #register revocation loader (shared store, see auth/revocation.py)
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
         jti = jwt_payload["jti"] #jti = unique identifer for JWT
-        return jti in blacklist
+        return revocation_store.is_revoked(jti)
 
     @jwt.revoked_token_loader
     def revoked_token_callback(jwt_header, jwt_payload):
         return jsonify({"error": "Token has been revoked"}), 401
 
-    test_db_connection()
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(error):
+        response = jsonify({"error": str(error)})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response
+
+    init_db(app)
+    tracing.init_app(app)
+    query_stats.init_app(app)
+    rate_limit.init_app(app)
 
     from .routes import main_bp
     from .auth.routes import auth_bp
@@ -204,6 +104,8 @@ def create_app():
     app.register_blueprint(waitlist_bp)
 
     socketio.init_app(app)
+    from .chat import sockets  # noqa: F401 - registers chat socket handlers
+    lifecycle.init_app(app)  # optional pool warm-up, after socketio owns the background tasks
 
     
     # print("Blueprint 'auth_bp' registered successfully")
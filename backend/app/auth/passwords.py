@@ -0,0 +1,123 @@
+"""
+Password Hashing Service
+
+bcrypt is deliberately slow (~200ms at cost 12) and CPU-bound. Under gunicorn's
+gevent worker, calling it in a greenlet blocks the hub, so one login stalls
+every other request on that worker. Hashing and verification run in a small
+pool of real OS threads instead (bcrypt releases the GIL), and the greenlet
+just waits for the result.
+
+Features:
+- gevent threadpool of PASSWORD_HASH_THREADS threads when running under gevent,
+  inline otherwise (flask dev server, tests)
+- Bounded queue (PASSWORD_HASH_MAX_QUEUE): a login storm gets fast 503s with
+  Retry-After instead of an unbounded backlog
+- Configurable cost (BCRYPT_ROUNDS); needs_rehash() lets login upgrade hashes
+  transparently when the cost changes
+- Hash time and queue depth exported on /metrics
+"""
+
+import os
+import re
+import threading
+import time
+
+import bcrypt
+
+from ..metrics import registry
+
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_THREADS = int(os.getenv('PASSWORD_HASH_THREADS', 4))  # 0 = always inline
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv('PASSWORD_HASH_MAX_QUEUE', 64))
+
+PASSWORD_HASH_SECONDS = registry.histogram(
+    'password_hash_seconds', 'bcrypt time per operation (excluding queueing)', ['operation'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.4, 0.8, 1.6))
+PASSWORD_HASH_PENDING = registry.gauge(
+    'password_hash_pending', 'bcrypt operations running or waiting for a thread')
+PASSWORD_HASH_REJECTED = registry.counter(
+    'password_hash_rejected_total', 'bcrypt operations refused because the queue was full')
+
+_BCRYPT_COST = re.compile(r'^\$2[abxy]?\$(\d{2})\$')
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashes pending; routes answer 503 with Retry-After"""
+
+    def __init__(self, message="Too many sign-in attempts in progress, please retry", retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _gevent_threadpool(threads):
+    """Real OS threads, only when threading is monkey-patched (gunicorn gevent worker)"""
+    if threads <= 0:
+        return None
+    try:
+        from gevent import monkey
+        from gevent.threadpool import ThreadPool
+    except ImportError:
+        return None
+    if not monkey.is_module_patched('threading'):
+        return None
+    return ThreadPool(threads)
+
+
+class PasswordHasher:
+    def __init__(self, rounds=BCRYPT_ROUNDS, threads=PASSWORD_HASH_THREADS, max_queue=PASSWORD_HASH_MAX_QUEUE):
+        self.rounds = rounds
+        self.threads = threads
+        self.max_pending = max(threads, 1) + max_queue
+        self._pool = None
+        self._pool_ready = False
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        # Created on first use: the gevent patch state is only final once the worker booted
+        if not self._pool_ready:
+            self._pool = _gevent_threadpool(self.threads)
+            self._pool_ready = True
+        return self._pool
+
+    def _run(self, operation, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                PASSWORD_HASH_REJECTED.inc()
+                raise PasswordHasherBusy()
+            self._pending += 1
+            PASSWORD_HASH_PENDING.set(self._pending)
+
+        def timed():
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                PASSWORD_HASH_SECONDS.observe(time.perf_counter() - start, operation=operation)
+
+        try:
+            pool = self.pool
+            return pool.spawn(timed).get() if pool is not None else timed()
+        finally:
+            with self._lock:
+                self._pending -= 1
+                PASSWORD_HASH_PENDING.set(self._pending)
+
+    def hash(self, password: str) -> str:
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._run('hash', bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify(self, password: str, hashed: str) -> bool:
+        try:
+            return self._run('verify', bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+        except ValueError:
+            return False  # not a bcrypt hash
+
+    def needs_rehash(self, hashed: str) -> bool:
+        match = _BCRYPT_COST.match(hashed or '')
+        return match is None or int(match.group(1)) != self.rounds
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,250 @@
+"""
+Token Revocation Store
+
+Revoked JWTs (logout) are recorded in a shared store so every gunicorn worker
+rejects them and they survive restarts. Entries only live until the token would
+have expired anyway.
+
+Features:
+- Pluggable backends (TOKEN_REVOCATION_BACKEND): "database" (revoked_tokens
+  table, shared by all workers) or "memory" (single process, dev/tests)
+- In-process Bloom filter front: the common case (a token that was never
+  revoked) is answered in O(1) without touching the database
+- Positive answers are confirmed against the backend and kept in an LRU, so
+  Bloom false positives never reject a valid token
+- Workers pick up each other's revocations with an incremental sync at most every
+  REVOCATION_SYNC_INTERVAL seconds (the staleness bound across workers)
+- Background purge of expired entries, which also rebuilds the Bloom filter
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app, has_app_context
+
+from ..cache import TTLCache
+from ..database import get_db_session
+from ..metrics import registry
+from ..models import RevokedToken
+
+
+TOKEN_REVOCATION_BACKEND = os.getenv('TOKEN_REVOCATION_BACKEND', 'database')
+REVOCATION_BLOOM_CAPACITY = int(os.getenv('REVOCATION_BLOOM_CAPACITY', 100000))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv('REVOCATION_BLOOM_ERROR_RATE', 0.001))
+REVOCATION_SYNC_INTERVAL = float(os.getenv('REVOCATION_SYNC_INTERVAL', 2))
+REVOCATION_PURGE_INTERVAL = float(os.getenv('REVOCATION_PURGE_INTERVAL', 3600))
+# Rows committed slightly out of order (clock skew between workers) are re-read
+SYNC_OVERLAP = timedelta(seconds=30)
+
+REVOCATION_LOOKUPS = registry.counter(
+    'token_revocation_lookups_total', 'Revocation checks by where they were answered', ['result'])
+REVOCATION_PURGED = registry.counter(
+    'token_revocation_purged_total', 'Expired revocation entries deleted')
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything stored here is UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter (double hashing over one blake2b digest)"""
+
+    def __init__(self, capacity: int = REVOCATION_BLOOM_CAPACITY, error_rate: float = REVOCATION_BLOOM_ERROR_RATE):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class MemoryRevocationBackend:
+    """Per-process store; revocations are lost on restart and not shared between workers"""
+    shared = False
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[datetime, datetime]] = {}  # jti -> (expires_at, revoked_at)
+        self._lock = threading.Lock()
+
+    def add(self, jti: str, expires_at: datetime, user_id=None) -> None:
+        with self._lock:
+            self._entries[jti] = (expires_at, _utcnow())
+
+    def contains(self, jti: str) -> bool:
+        entry = self._entries.get(jti)
+        return entry is not None and entry[0] > _utcnow()
+
+    def changed_since(self, since: Optional[datetime]) -> List[Tuple[str, datetime]]:
+        now = _utcnow()
+        with self._lock:
+            return [(jti, revoked_at) for jti, (expires_at, revoked_at) in self._entries.items()
+                    if expires_at > now and (since is None or revoked_at > since)]
+
+    def purge(self, now: datetime) -> int:
+        with self._lock:
+            expired = [jti for jti, (expires_at, _) in self._entries.items() if expires_at <= now]
+            for jti in expired:
+                del self._entries[jti]
+        return len(expired)
+
+
+class DatabaseRevocationBackend:
+    """revoked_tokens table, indexed on expires_at (purge) and revoked_at (sync)"""
+    shared = True
+
+    def add(self, jti: str, expires_at: datetime, user_id=None) -> None:
+        with get_db_session() as db:
+            db.merge(RevokedToken(jti=jti, user_id=int(user_id) if user_id is not None else None,
+                                  expires_at=expires_at, revoked_at=_utcnow()))
+            db.commit()
+
+    def contains(self, jti: str) -> bool:
+        # Read-only: a replica lagging behind a logout is no worse than the sync interval
+        with get_db_session(readonly=True) as db:
+            return db.query(RevokedToken.jti).filter(
+                RevokedToken.jti == jti, RevokedToken.expires_at > _utcnow()).first() is not None
+
+    def changed_since(self, since: Optional[datetime]) -> List[Tuple[str, datetime]]:
+        with get_db_session() as db:
+            query = db.query(RevokedToken.jti, RevokedToken.revoked_at).filter(RevokedToken.expires_at > _utcnow())
+            if since is not None:
+                query = query.filter(RevokedToken.revoked_at > since)
+            return [(jti, _aware(revoked_at)) for jti, revoked_at in query.all()]
+
+    def purge(self, now: datetime) -> int:
+        with get_db_session() as db:
+            deleted = db.query(RevokedToken).filter(RevokedToken.expires_at <= now).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+
+
+REVOCATION_BACKENDS = {
+    'database': DatabaseRevocationBackend,
+    'memory': MemoryRevocationBackend,
+}
+
+
+class RevocationStore:
+    def __init__(self, backend=None, capacity: int = REVOCATION_BLOOM_CAPACITY,
+                 error_rate: float = REVOCATION_BLOOM_ERROR_RATE, sync_interval: float = REVOCATION_SYNC_INTERVAL):
+        self.backend = backend or REVOCATION_BACKENDS[TOKEN_REVOCATION_BACKEND]()
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._confirmed = TTLCache('token_revocation', maxsize=10000, ttl=sync_interval or 1)
+        self._watermark: Optional[datetime] = None
+        self._synced_at: Optional[float] = None  # monotonic time of the last sync attempt
+        self._lock = threading.Lock()
+        self._purger_started = False
+
+    def revoke(self, jti: str, expires_at: datetime, user_id=None) -> None:
+        self.backend.add(jti, expires_at, user_id)
+        with self._lock:
+            self._bloom.add(jti)
+        self._confirmed.set(jti, True)
+
+    def is_revoked(self, jti: str) -> bool:
+        self.sync()
+        if jti not in self._bloom:
+            REVOCATION_LOOKUPS.inc(result='bloom_negative')
+            return False
+        cached = self._confirmed.get(jti)
+        if cached is not None:
+            REVOCATION_LOOKUPS.inc(result='cache')
+            return cached
+        revoked = self.backend.contains(jti)
+        REVOCATION_LOOKUPS.inc(result='backend_revoked' if revoked else 'bloom_false_positive')
+        self._confirmed.set(jti, revoked)
+        return revoked
+
+    def _add_rows(self, bloom: BloomFilter, rows: Iterable[Tuple[str, datetime]]) -> Optional[datetime]:
+        latest = None
+        for jti, revoked_at in rows:
+            bloom.add(jti)
+            latest = revoked_at if latest is None or revoked_at > latest else latest
+        return latest
+
+    def sync(self, force: bool = False) -> None:
+        """Pull revocations made by other workers (one indexed query per interval)"""
+        if not self.backend.shared and self._synced_at is not None:
+            return
+        now = time.monotonic()
+        if not force and self._synced_at is not None and now - self._synced_at < self.sync_interval:
+            return
+        with self._lock:
+            if not force and self._synced_at is not None and now - self._synced_at < self.sync_interval:
+                return
+            since = self._watermark - SYNC_OVERLAP if self._watermark else None
+            try:
+                rows = self.backend.changed_since(since)
+            except Exception as e:
+                # Keep answering from what we know; retried on the next interval
+                self._synced_at = now
+                if has_app_context():
+                    current_app.logger.warning(f"Token revocation sync failed: {str(e)}")
+                return
+            latest = self._add_rows(self._bloom, rows)
+            if latest is not None and (self._watermark is None or latest > self._watermark):
+                self._watermark = latest
+            self._synced_at = now
+        self._maybe_start_purger()
+
+    def purge(self) -> int:
+        """Delete expired entries and rebuild the Bloom filter without them"""
+        deleted = self.backend.purge(_utcnow())
+        REVOCATION_PURGED.inc(deleted)
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        rows = self.backend.changed_since(None)
+        with self._lock:
+            latest = self._add_rows(bloom, rows)
+            self._bloom = bloom
+            self._watermark = latest
+            self._synced_at = time.monotonic()
+        return deleted
+
+    def _maybe_start_purger(self) -> None:
+        if self._purger_started or not has_app_context():
+            return
+        app = current_app._get_current_object()
+        if app.testing or not REVOCATION_PURGE_INTERVAL:
+            return
+        self._purger_started = True
+        from .. import socketio
+        socketio.start_background_task(self._purge_loop, app)
+
+    def _purge_loop(self, app) -> None:
+        from .. import socketio
+        with app.app_context():
+            while True:
+                socketio.sleep(REVOCATION_PURGE_INTERVAL)
+                try:
+                    deleted = self.purge()
+                    app.logger.info(f"Purged {deleted} expired revoked tokens")
+                except Exception as e:
+                    app.logger.error(f"Revoked token purge failed: {str(e)}")
+
+
+revocation_store = RevocationStore()
@@ -6,14 +6,20 @@
 """
 
 import json
-import bcrypt
 import string
 from flask import Blueprint, request, jsonify, current_app, make_response
 from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt, jwt_required, get_jwt_identity
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from ..database import get_db_session
-from ..models import User
-from ..extensions import blacklist
+from ..models import Transaction, User
+from ..partitions import month_bounds
+from ..prepared import prepare_as, warmup
+from ..rate_limit import rate_limit, body_field
+from ..user_snapshot import SNAPSHOT_COLUMNS, get_user_snapshot, remember_user_snapshot, snapshot_from_row
+from .passwords import password_hasher, PasswordHasherBusy
+from .revocation import revocation_store
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -61,6 +67,7 @@ def testing():
     return "Testing testing"
 
 @auth_bp.route('/signup', methods=['POST'])
+@rate_limit('signup_ip', '10/hour')
 def signup():
     try:
         with get_db_session() as db:
@@ -78,13 +85,13 @@ def signup():
             if existing_user:
                 return jsonify({"error": "User already exists"}), 409
 
-            password = request_data.get('password')
-            bytes_password = password.encode('utf-8')
-            salt = bcrypt.gensalt() #generate pseudo-random string to add to the password
-            hashed_pw = bcrypt.hashpw(bytes_password, salt)
+        # bcrypt runs in the hashing thread pool, with no pooled connection held
+        hashed_pw = password_hasher.hash(request_data.get('password'))
+
+        with get_db_session() as db:
             new_user = User(
                 email=request_data.get('email'),
-                password=hashed_pw.decode('utf-8'),
+                password=hashed_pw,
                 onboarding_completed=False,
                 onboarding_step=0,
                 name=None,
@@ -106,13 +113,33 @@ def signup():
             "message": "User Created Successfully",
             "user_id": user_id,
             }), 201
+    except PasswordHasherBusy:
+        raise
+    except IntegrityError:
+        return jsonify({"error": "User already exists"}), 409
     except Exception as e: 
         if db is not None:
             db.rollback()
         current_app.logger.error(f"Signup error: {str(e)}")
         return jsonify({"error": "Failed to create user"}), 500
 
+def upgrade_password_hash(user_id, password, old_hash):
+    """Re-hash at the current BCRYPT_ROUNDS after a successful login (best effort)"""
+    try:
+        new_hash = password_hasher.hash(password)
+        with get_db_session() as db:
+            # Only if the password didn't change meanwhile
+            db.query(User).filter(User.id == user_id, User.password == old_hash).update(
+                {"password": new_hash}, synchronize_session=False)
+            db.commit()
+    except PasswordHasherBusy:
+        pass  # upgraded on a later login
+    except Exception as e:
+        current_app.logger.warning(f"Password rehash failed for user {user_id}: {str(e)}")
+
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login_ip', '30/minute')
+@rate_limit('login_identifier', '10/minute', key=body_field('email', 'username'))
 def login():
     """
     Login Endpoint:
@@ -138,31 +165,39 @@ def login():
                 login_identifier = login_identifier.lower()
             
             
-            verified_user = db.query(User).filter(
+            verified_user = db.query(User.password, *SNAPSHOT_COLUMNS).filter(
                 (User.email == login_identifier) | (User.username == login_identifier)
             ).first()
 
+        # Session released before bcrypt, which runs in the hashing thread pool
+        if verified_user and password_hasher.verify(password, verified_user.password):
+            if password_hasher.needs_rehash(verified_user.password):
+                upgrade_password_hash(verified_user.id, password, verified_user.password)
+            # Warm the snapshot cache for the requests the app makes right after login
+            remember_user_snapshot(snapshot_from_row(verified_user))
+
             #upon logging in: generate JWT token
-            if verified_user and bcrypt.checkpw(request_data.get('password').encode('utf-8'), verified_user.password.encode('utf-8')):
-                jwt_access_token = create_access_token(identity=str(verified_user.id)) 
-                refresh_token = create_refresh_token(identity=str(verified_user.id)) #allows client to obtain new access tokens without user re-auth
-                resp = make_response(jsonify({"access_token": jwt_access_token, 
-                                              "message": "Login successful",
-                                              "onboarding_completed": verified_user.onboarding_completed,
-                                              "onboarding_step": verified_user.onboarding_step,
-                                              })) #sending this back to frontend 
-                #setting the refresh token as a cookie
-                resp.set_cookie(
-                    "refresh_token",
-                    refresh_token,
-                    httponly=True, #can't be accessed by JS
-                    secure=current_app.config.get('JWT_COOKIE_SECURE', False), #environment-based
-                    samesite='Lax' if current_app.config.get('DEBUG', True) else 'Strict' #lax for dev, strict for prod
-                )
-                return resp, 200
-            else:
-                return jsonify({"error": "Invalid Credentials"}), 401
+            jwt_access_token = create_access_token(identity=str(verified_user.id)) 
+            refresh_token = create_refresh_token(identity=str(verified_user.id)) #allows client to obtain new access tokens without user re-auth
+            resp = make_response(jsonify({"access_token": jwt_access_token, 
+                                          "message": "Login successful",
+                                          "onboarding_completed": verified_user.onboarding_completed,
+                                          "onboarding_step": verified_user.onboarding_step,
+                                          })) #sending this back to frontend 
+            #setting the refresh token as a cookie
+            resp.set_cookie(
+                "refresh_token",
+                refresh_token,
+                httponly=True, #can't be accessed by JS
+                secure=current_app.config.get('JWT_COOKIE_SECURE', False), #environment-based
+                samesite='Lax' if current_app.config.get('DEBUG', True) else 'Strict' #lax for dev, strict for prod
+            )
+            return resp, 200
+        else:
+            return jsonify({"error": "Invalid Credentials"}), 401
     
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         current_app.logger.error(f"Login error: {str(e)}")
         return jsonify({"error": "Login failed"}), 500
@@ -172,8 +207,9 @@ def login():
 @jwt_required(refresh=True)
 def logout():
     try:
-        jti = get_jwt()["jti"]
-        blacklist.add(jti)
+        token = get_jwt()
+        revocation_store.revoke(token["jti"], datetime.fromtimestamp(token["exp"], timezone.utc),
+                                user_id=get_jwt_identity())
         response = jsonify({"message": "Successfully logged out"})
         response.delete_cookie("refresh_token") 
         return response, 200
@@ -181,6 +217,21 @@ def logout():
         current_app.logger.error(f"Logout error: {str(e)}")
         return jsonify({"error": "Logout failed"}), 500
     
+@warmup
+def query_monthly_income(db, user_id=0):
+    """Income transactions summed over the current month (run as a prepared statement where enabled)"""
+    # Current month as a date range so Postgres prunes to one partition
+    month_start, next_month_start = month_bounds(datetime.now().date())
+    current_month_income = prepare_as(db.query(
+        func.sum(Transaction.amount).label('total_income')
+    ), 'monthly_income').filter(
+        Transaction.user_id == user_id,
+        Transaction.type == 'income',
+        Transaction.date_posted >= month_start,
+        Transaction.date_posted < next_month_start
+    ).scalar()
+    return float(current_month_income) if current_month_income else 0
+
 @auth_bp.route('/user', methods=['GET'])
 @jwt_required()
 def get_current_user():
@@ -189,63 +240,39 @@ def get_current_user():
     def calculate_monthly_income_from_transactions(user_id):
         """Calculate monthly income based on actual transactions for current month"""
         try:
-            from datetime import datetime
-            from sqlalchemy import func, extract
-            from ..models import Transaction
-            
-            with get_db_session() as db:
-                # Get current month and year
-                current_date = datetime.now()
-                current_month = current_date.month
-                current_year = current_date.year
-                
-                # Get all income transactions for current month
-                current_month_income = db.query(
-                    func.sum(Transaction.amount).label('total_income')
-                ).filter(
-                    Transaction.user_id == user_id,
-                    Transaction.type == 'income',
-                    extract('month', Transaction.date_posted) == current_month,
-                    extract('year', Transaction.date_posted) == current_year
-                ).scalar()
-                
-                return float(current_month_income) if current_month_income else 0
+            with get_db_session(readonly=True) as db:
+                return query_monthly_income(db, user_id)
                     
         except Exception as e:
             current_app.logger.error(f"Error calculating monthly income: {str(e)}")
             return 0
     
-    with get_db_session() as db:
-        user = db.query(User).get(user_id)
-        if not user:
-            return jsonify({"message": "User not found"}), 404
-        try:
-            financial_goals = json.loads(user.financial_goals) if user.financial_goals not in (None, '', 'null') else []
-        except Exception:
-            financial_goals = []
-            
-        # Calculate monthly income from transactions instead of using static field
-        calculated_monthly_income = calculate_monthly_income_from_transactions(user_id)
-        
-        return jsonify({
-            "user_id": user.id,
-            "name": user.name,
-            "username": user.username,
-            "email": user.email,
-            "onboarding_completed": user.onboarding_completed,
-            "onboarding_step": user.onboarding_step,
-            "budget_profile": {
-                "salary_monthly": calculated_monthly_income,  # Use calculated value instead of static
-                "monthly_spending_goal": user.monthly_spending_goal,  # Keep onboarding value
-                "total_balance": user.total_balance,
-            },
-            "profile_info": {
-                "age": user.age,
-                "is_student": user.is_student,
-                "college_name": user.college_name,
-                "financial_goals": financial_goals
-            }
-        }), 200
+    user = get_user_snapshot(user_id)
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+
+    # Calculate monthly income from transactions instead of using static field
+    calculated_monthly_income = calculate_monthly_income_from_transactions(user_id)
+    
+    return jsonify({
+        "user_id": user.id,
+        "name": user.name,
+        "username": user.username,
+        "email": user.email,
+        "onboarding_completed": user.onboarding_completed,
+        "onboarding_step": user.onboarding_step,
+        "budget_profile": {
+            "salary_monthly": calculated_monthly_income,  # Use calculated value instead of static
+            "monthly_spending_goal": user.monthly_spending_goal,  # Keep onboarding value
+            "total_balance": user.total_balance,
+        },
+        "profile_info": {
+            "age": user.age,
+            "is_student": user.is_student,
+            "college_name": user.college_name,
+            "financial_goals": user.financial_goals
+        }
+    }), 200
 
 @auth_bp.route('/refresh', methods=['POST'])
 @jwt_required(refresh=True)
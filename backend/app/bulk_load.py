@@ -0,0 +1,245 @@
+"""
+Bulk Transaction Loader
+
+Historical backfills and recategorization rewrite thousands of transactions at a
+time; going through ORM flushes costs a round trip (and a trigger + index update
+on a fully loaded object) per row. Here rows are streamed with COPY into a
+temporary staging table and merged into transactions with one statement per
+kind of change.
+
+Features:
+- merge_transactions(): upsert Plaid rows, UPDATE ... FROM for known plaid ids
+  and INSERT ... SELECT for the rest. Partitioned tables can't carry a unique
+  index on plaid_transaction_id, so "known" is looked up in transaction_keys
+  (INSERT ... ON CONFLICT isn't available on transactions). A changed date_posted
+  (pending -> posted) moves the row to its new month's partition
+- Rows are merged in batches of MERGE_BATCH_ROWS, so a backfill never holds more
+  than one batch in memory
+- update_transactions(): UPDATE ... FROM for changes to existing rows keyed by
+  (id, date_posted), e.g. new categories
+- Only rows whose values actually change are rewritten (no dead tuples for no-ops)
+- recategorize_user() / backfill_user(): the /transactions/recategorize and
+  bulk_load.py CLI entry points
+- Staging tables are dropped at commit; on SQLite (tests) COPY falls back to an
+  executemany INSERT (see database.copy_rows)
+"""
+
+from datetime import date, timedelta
+from itertools import islice
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import text
+
+from .database import copy_rows
+from .metrics import registry
+from .models import Transaction
+
+
+STAGING_TABLE = 'staging_transactions'
+IDENTITY_COLUMNS = ('id', 'user_id', 'plaid_transaction_id')  # never rewritten by a merge
+PLAID_PAGE_SIZE = 500  # Plaid's maximum for /transactions/get
+MERGE_BATCH_ROWS = 20000
+
+BULK_ROWS = registry.counter('bulk_load_rows_total', 'Rows written by the bulk loader', ['operation'])
+
+
+def _is_postgres(db) -> bool:
+    return db.get_bind().dialect.name == 'postgresql'
+
+
+def stage_rows(db, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+    """COPY rows (tuples in `columns` order) into a fresh staging table shaped like transactions"""
+    on_commit = ' ON COMMIT DROP' if _is_postgres(db) else ''
+    db.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+    db.execute(text(f"CREATE TEMPORARY TABLE {STAGING_TABLE}{on_commit} AS "
+                    f"SELECT {', '.join(columns)} FROM transactions WHERE 1 = 0"))
+    count = copy_rows(db, Transaction.__table__, columns, rows, target=STAGING_TABLE)
+    if _is_postgres(db):
+        db.execute(text(f"ANALYZE {STAGING_TABLE}"))  # temp tables get no autovacuum stats
+    return count
+
+
+def _changed(db, columns: Sequence[str]) -> str:
+    # Null-safe "any of these differ"
+    distinct = 'IS DISTINCT FROM' if _is_postgres(db) else 'IS NOT'
+    target = ', '.join(f"t.{name}" for name in columns)
+    staged = ', '.join(f"s.{name}" for name in columns)
+    return f"({target}) {distinct} ({staged})"
+
+
+def _update_from_staging(db, keys: Sequence[str], columns: Sequence[str], also_from: str = '',
+                         also_where: str = '') -> int:
+    assignments = ', '.join(f"{name} = s.{name}" for name in columns)
+    matches = ' AND '.join([f"t.{name} = s.{name}" for name in keys] + ([also_where] if also_where else []))
+    result = db.execute(text(
+        f"UPDATE transactions AS t SET {assignments} FROM {STAGING_TABLE} AS s{also_from} "
+        f"WHERE {matches} AND {_changed(db, columns)}"
+    ))
+    return result.rowcount
+
+
+def update_transactions(db, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+    """
+    Bulk UPDATE existing transactions. rows are tuples in `columns` order and must
+    start with id and date_posted (the primary key). Returns rows changed.
+    """
+    if tuple(columns[:2]) != ('id', 'date_posted'):
+        raise ValueError("columns must start with ('id', 'date_posted')")
+    updated = 0
+    if stage_rows(db, columns, rows):
+        updated = _update_from_staging(db, columns[:2], columns[2:])
+    db.execute(text(f"DROP TABLE {STAGING_TABLE}"))
+    BULK_ROWS.inc(updated, operation='update')
+    return updated
+
+
+def merge_transactions(db, columns: Sequence[str], rows: Iterable[Sequence]) -> Tuple[int, int]:
+    """
+    Upsert Plaid transactions by plaid_transaction_id. rows are tuples in `columns`
+    order; columns must include user_id, plaid_transaction_id and date_posted.
+    Known rows get every column but the ids rewritten, date_posted included.
+    Returns (inserted, updated).
+    """
+    missing = {'user_id', 'plaid_transaction_id', 'date_posted'} - set(columns)
+    if missing:
+        raise ValueError(f"columns must include {sorted(missing)}")
+    plaid_id = columns.index('plaid_transaction_id')
+    rows = iter(rows)
+    inserted = updated = 0
+    while True:
+        batch = list(islice(rows, MERGE_BATCH_ROWS))
+        if not batch:
+            break
+        # Last one wins for repeated plaid ids: within a batch here, across batches
+        # the later batch updates the row the earlier one wrote
+        batch_inserted, batch_updated = _merge_batch(db, columns, list({row[plaid_id]: row for row in batch}.values()))
+        inserted += batch_inserted
+        updated += batch_updated
+    BULK_ROWS.inc(inserted, operation='insert')
+    BULK_ROWS.inc(updated, operation='update')
+    return inserted, updated
+
+
+def _merge_batch(db, columns: Sequence[str], rows: List[Sequence]) -> Tuple[int, int]:
+    stage_rows(db, columns, rows)
+    values = [name for name in columns if name not in IDENTITY_COLUMNS]
+    if _is_postgres(db):
+        # transaction_keys says which partition (date_posted) a known plaid id lives in.
+        # A new date_posted in another month makes Postgres move the row (DELETE +
+        # INSERT), and the key trigger follows it to the new date.
+        existing = 'transaction_keys'
+        updated = _update_from_staging(
+            db, ('plaid_transaction_id',), values, also_from=', transaction_keys AS k',
+            also_where='k.plaid_transaction_id = s.plaid_transaction_id AND t.date_posted = k.date_posted')
+    else:
+        existing = 'transactions'
+        updated = _update_from_staging(db, ('plaid_transaction_id',), values)
+
+    column_list = ', '.join(columns)
+    inserted = db.execute(text(
+        f"INSERT INTO transactions ({column_list}) "
+        f"SELECT {', '.join(f's.{name}' for name in columns)} FROM {STAGING_TABLE} AS s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {existing} AS e WHERE e.plaid_transaction_id = s.plaid_transaction_id)"
+    )).rowcount
+    db.execute(text(f"DROP TABLE {STAGING_TABLE}"))
+    return inserted, updated
+
+
+def categorize(plaid_like: Dict, history: List[Dict]) -> Tuple[str, bool, bool]:
+    """(user_category, is_recurring, is_gambling) the way the Plaid sync assigns them"""
+    from .gambling_detection import get_gambling_detection_details, categorize_gambling_transaction
+    from .transaction_categorization import categorize_transaction
+
+    if get_gambling_detection_details(plaid_like).is_gambling:
+        return categorize_gambling_transaction(plaid_like), False, True
+    result = categorize_transaction(plaid_like, history)
+    return result.category, result.is_recurring, False
+
+
+def _history(rows) -> List[Dict]:
+    return [{'name': row.name, 'amount': float(row.amount), 'date': row.date_posted.isoformat()} for row in rows]
+
+
+def recategorize_user(db, user_id) -> Dict[str, int]:
+    """Re-run categorization over all of a user's transactions; caller commits"""
+    rows = db.query(
+        Transaction.id, Transaction.date_posted, Transaction.name, Transaction.amount,
+        Transaction.plaid_category, Transaction.user_category, Transaction.is_recurring,
+    ).filter(Transaction.user_id == user_id).all()
+    history = _history(rows)
+
+    changes = []
+    gambling_updated = 0
+    for row in rows:
+        plaid_like = {
+            'name': row.name,
+            'amount': float(row.amount),
+            'merchant_name': None,  # Not available in our current data
+            'category': row.plaid_category.split(', ') if row.plaid_category else [],
+        }
+        category, is_recurring, is_gambling = categorize(plaid_like, history)
+        gambling_updated += is_gambling
+        if (row.user_category, row.is_recurring) != (category, is_recurring):
+            changes.append((row.id, row.date_posted, category, is_recurring))
+
+    if changes:
+        update_transactions(db, ('id', 'date_posted', 'user_category', 'is_recurring'), changes)
+    return {
+        'total_transactions': len(rows),
+        'recategorized_count': len(changes),
+        'gambling_updated_count': gambling_updated,
+    }
+
+
+def plaid_history(access_token: str, start_date: date, end_date: date) -> Iterable[Dict]:
+    """All Plaid transactions in [start_date, end_date], a page at a time"""
+    from plaid.model.transactions_get_request import TransactionsGetRequest
+    from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
+    from .plaid.client import get_plaid_client
+
+    offset = 0
+    while True:
+        response = get_plaid_client().transactions_get(TransactionsGetRequest(
+            access_token=access_token,
+            start_date=start_date,
+            end_date=end_date,
+            options=TransactionsGetRequestOptions(count=PLAID_PAGE_SIZE, offset=offset),
+        ))
+        page = response['transactions']
+        yield from page
+        offset += len(page)
+        if not page or offset >= response['total_transactions']:
+            return
+
+
+BACKFILL_COLUMNS = ('user_id', 'plaid_transaction_id', 'date_posted', 'name', 'amount', 'type',
+                    'payment_source', 'plaid_category', 'user_category', 'is_recurring')
+
+
+def backfill_user(db, user_id, access_token: str, days: int = 730, today: date = None) -> Tuple[int, int]:
+    """Merge `days` of Plaid history for a user; caller commits. Returns (inserted, updated)."""
+    end_date = today or date.today()
+    existing = db.query(Transaction.name, Transaction.amount, Transaction.date_posted).filter(
+        Transaction.user_id == user_id).all()
+    history = _history(existing)
+
+    def rows():
+        for plaid_transaction in plaid_history(access_token, end_date - timedelta(days=days), end_date):
+            posted = plaid_transaction['date']
+            if isinstance(posted, str):
+                posted = date.fromisoformat(posted)
+            category, is_recurring, _ = categorize(plaid_transaction, history)
+            yield (
+                user_id,
+                plaid_transaction['transaction_id'],
+                posted,
+                plaid_transaction['name'],
+                abs(float(plaid_transaction['amount'])),
+                'expense' if plaid_transaction['amount'] > 0 else 'income',
+                plaid_transaction.get('account_id'),
+                ', '.join(plaid_transaction.get('category') or []),
+                category,
+                is_recurring,
+            )
+
+    return merge_transactions(db, BACKFILL_COLUMNS, rows())
@@ -0,0 +1,143 @@
+"""
+In-Process Caching
+
+Small TTL + LRU caches for per-user derived data (chat financial context, ...)
+that is expensive to rebuild but cheap to keep for a few minutes.
+
+Features:
+- TTLCache: thread/greenlet safe LRU with per-entry expiry and hit/miss metrics
+- Per-user data generations: invalidate_user() bumps the user's generation, which
+  retires every cached entry derived from their data in one step
+- The generation table is bounded: idle users expire after USER_GENERATION_TTL
+  (longer than any cache TTL) and the least recently used drop out past
+  USER_GENERATION_MAXSIZE, so it does not grow with every user ever invalidated
+- Caches are per worker process; the TTL bounds how stale another worker can be
+"""
+
+import itertools
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from .metrics import registry
+
+
+CACHE_HITS = registry.counter('cache_hits_total', 'Cache lookups served from memory', ['cache'])
+CACHE_MISSES = registry.counter('cache_misses_total', 'Cache lookups that had to be rebuilt', ['cache'])
+
+_MISSING = object()
+_all_caches = weakref.WeakSet()
+
+
+class TTLCache:
+    """LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        _all_caches.add(self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    CACHE_HITS.inc(cache=self.name)
+                    return value
+                del self._entries[key]
+        CACHE_MISSES.inc(cache=self.name)
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+USER_GENERATION_TTL = float(os.getenv('USER_GENERATION_TTL', 3600))  # must exceed every cache TTL
+USER_GENERATION_MAXSIZE = int(os.getenv('USER_GENERATION_MAXSIZE', 100000))
+
+_user_generations = OrderedDict()  # user id -> (expires_at, generation)
+_generation_lock = threading.Lock()
+_generation_counter = itertools.count(1)
+# Users without an entry read the floor. Generations come from one counter, so a
+# user's next generation is always above any value their old entries were keyed on;
+# dropping a live entry for space raises the floor past it for the same reason.
+_generation_floor = 0
+
+
+def user_generation(user_id) -> int:
+    """Reading the generation keeps it alive: no entry keyed on it can outlive it"""
+    key = str(user_id)
+    now = time.monotonic()
+    with _generation_lock:
+        entry = _user_generations.get(key)
+        if entry is None:
+            return _generation_floor
+        if entry[0] <= now:
+            # Idle for longer than any cache TTL, nothing keyed on it is left
+            del _user_generations[key]
+            return _generation_floor
+        _user_generations[key] = (now + USER_GENERATION_TTL, entry[1])
+        _user_generations.move_to_end(key)
+        return entry[1]
+
+
+def invalidate_user(user_id) -> None:
+    """The user's financial data changed (sync, profile edit, ...): retire their cached entries"""
+    global _generation_floor
+    if user_id is None:
+        return
+    key = str(user_id)
+    now = time.monotonic()
+    with _generation_lock:
+        _user_generations[key] = (now + USER_GENERATION_TTL, next(_generation_counter))
+        _user_generations.move_to_end(key)
+        while len(_user_generations) > USER_GENERATION_MAXSIZE:
+            _, (expires_at, generation) = _user_generations.popitem(last=False)
+            if expires_at > now:
+                _generation_floor = max(_generation_floor, generation)
+
+
+def user_key(user_id, *parts) -> tuple:
+    """Cache key that stops matching as soon as the user's data is invalidated"""
+    return (str(user_id), user_generation(user_id)) + parts
+
+
+def clear_all_caches() -> None:
+    """Drop every cached entry in this process (tests, admin tooling)"""
+    for cache in list(_all_caches):
+        cache.clear()
+    global _generation_floor
+    with _generation_lock:
+        _user_generations.clear()
+        _generation_floor = 0
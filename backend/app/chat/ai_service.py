@@ -1,27 +1,96 @@
 #logic for calling chatbot
 
-import os
-from openai import OpenAI
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from .ai_instructions import dev_system_instr
+from .llm_client import get_client, llm_limiter, LLMSaturated, upstream_retry_after
+from .llm_usage import track_llm_call
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+CHAT_MODEL = "gpt-4o-mini"
 
-def get_ai_response(user_message, conversation_history=None):
+
+@contextmanager
+def _upstream_errors():
+    """Surface OpenAI rate limiting as LLMSaturated so callers answer 429 + Retry-After"""
+    try:
+        yield
+    except Exception as e:
+        from openai import RateLimitError  # already loaded by the client that raised
+        if not isinstance(e, RateLimitError):
+            raise
+        raise LLMSaturated("Chat is rate limited, please retry shortly", status_code=429,
+                           retry_after=upstream_retry_after(e)) from e
+
+
+def get_ai_response(user_message, conversation_history=None, user_id=None):
     """
     Basic function to give our chatbot instructions, and also store message history.
 
-    Question is, is it efficient?
+    Takes a limiter slot for the call; don't hold a DB session while calling this.
+    Latency and token usage are recorded (per user when user_id is given).
+    """
+    messages = [{"role": "system", "content": dev_system_instr}]
+    if conversation_history:
+        messages.extend(conversation_history)
+    messages.append({"role": "user", "content": user_message})
+
+    with llm_limiter.slot(), _upstream_errors(), track_llm_call('chat', CHAT_MODEL, user_id) as call:
+        completion = get_client().chat.completions.create(
+            model=CHAT_MODEL,
+            messages=messages
+        )
+        call.record_usage(completion.usage)
+    return completion.choices[0].message.content
+
+def stream_ai_response(user_message, conversation_history=None, user_id=None):
+    """
+    Streaming variant of get_ai_response: yields content deltas as the model
+    produces them so the first token reaches the user right away.
+
+    The caller holds the limiter slot (llm_limiter.acquire/release) for the whole
+    stream, so saturation is reported before the response starts.
     """
     messages = [{"role": "system", "content": dev_system_instr}]
     if conversation_history:
         messages.extend(conversation_history)
     messages.append({"role": "user", "content": user_message})
 
-    completion = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages
+    with _upstream_errors(), track_llm_call('chat_stream', CHAT_MODEL, user_id) as call:
+        stream = get_client().chat.completions.create(
+            model=CHAT_MODEL,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True}  # usage arrives on a final chunk with no choices
+        )
+        for chunk in stream:
+            if chunk.usage:
+                call.record_usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                call.first_token()
+                yield delta
+
+def summarize_conversation(previous_summary, messages, user_id=None):
+    """
+    Fold older turns into the conversation's rolling summary so they can be
+    dropped from future prompts.
+    """
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    prompt = (
+        "Update the summary of this budgeting conversation. Keep every figure, goal and "
+        "decision the user mentioned; drop small talk. Answer with the summary only, "
+        "at most 150 words.\n\n"
+        f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"
     )
+    with llm_limiter.slot(), _upstream_errors(), track_llm_call('summarize', CHAT_MODEL, user_id) as call:
+        completion = get_client().chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=300
+        )
+        call.record_usage(completion.usage)
     return completion.choices[0].message.content
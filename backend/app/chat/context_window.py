@@ -0,0 +1,201 @@
+"""
+Token-Budgeted Context Window
+
+Builds the history sent to the model for a chat turn so prompt size stays bounded
+no matter how long a conversation gets.
+
+Features:
+- Token counting with tiktoken when installed (falls back to a ~4 chars/token estimate)
+- Keeps the system prompt (+ optional user context) and the most recent turns
+  within CHAT_CONTEXT_TOKEN_BUDGET
+- Older turns are folded into a rolling summary persisted on the conversation
+  (summarized in chunks so the summarizer isn't called on every turn)
+- Reports prompt tokens saved per request (log line + /metrics counters)
+"""
+
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from ..metrics import registry
+from ..models import Messages
+
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CHAT_CONTEXT_TOKEN_BUDGET', 3000))
+# After summarizing, recent turns only fill this share of the budget so the
+# next few turns fit without summarizing again
+CONTEXT_KEEP_RATIO = float(os.getenv('CHAT_CONTEXT_KEEP_RATIO', 0.6))
+MESSAGE_OVERHEAD_TOKENS = 4  # role/separator tokens the chat format adds per message
+TOKENIZER_MODEL = "gpt-4o-mini"
+
+PROMPT_TOKENS = registry.histogram(
+    'chat_prompt_tokens', 'Prompt tokens sent per chat request',
+    buckets=(250, 500, 1000, 2000, 3000, 4000, 8000, 16000))
+PROMPT_TOKENS_SAVED = registry.counter(
+    'chat_prompt_tokens_saved_total', 'Prompt tokens avoided by summarizing older turns')
+SUMMARIES_CREATED = registry.counter(
+    'chat_summaries_total', 'Rolling conversation summaries generated')
+
+
+_encoding = None
+_encoding_loaded = False
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+        except Exception:
+            _encoding = None  # not installed or BPE file unavailable offline
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def message_tokens(message: dict) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def summary_message(summary: str) -> dict:
+    return {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+
+
+@dataclass
+class ContextWindow:
+    history: List[dict] = field(default_factory=list)  # summary + recent turns, excludes the new message
+    prompt_tokens: int = 0
+    full_tokens: int = 0  # what the prompt would cost with the whole conversation
+    summary: Optional[str] = None
+    summary_message_id: Optional[int] = None
+    summarized: bool = False  # summary changed, persist it on the conversation
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(self.full_tokens - self.prompt_tokens, 0)
+
+    def report(self) -> dict:
+        return {
+            "event": "chat_context",
+            "prompt_tokens": self.prompt_tokens,
+            "full_tokens": self.full_tokens,
+            "tokens_saved": self.tokens_saved,
+            "summarized": self.summarized,
+        }
+
+
+def load_conversation_turns(db, convo_id):
+    """(id, sender, content) rows in order - plain tuples so no session is needed afterwards"""
+    return [
+        tuple(row) for row in
+        db.query(Messages.id, Messages.sender, Messages.content)
+        .filter(Messages.convo_id == convo_id)
+        .order_by(Messages.created_at, Messages.id)
+        .all()
+    ]
+
+
+def _to_history(rows) -> List[dict]:
+    return [
+        {"role": "user" if sender == "user" else "assistant", "content": content}
+        for _id, sender, content in rows
+    ]
+
+
+def _unsummarized_start(rows, summary_message_id) -> int:
+    if summary_message_id is None:
+        return 0
+    return next((i for i, row in enumerate(rows) if row[0] > summary_message_id), len(rows))
+
+
+def _recent_start(turn_tokens, start: int, available: int) -> int:
+    """Index of the oldest turn kept when filling available tokens from the newest back"""
+    used, index = 0, len(turn_tokens)
+    while index > start and used + turn_tokens[index - 1] <= available:
+        used += turn_tokens[index - 1]
+        index -= 1
+    return index
+
+
+def background_fold_plan(rows, summary_message_id, reserved_tokens: int,
+                         budget: Optional[int] = None) -> Optional[tuple]:
+    """
+    (start, keep_from) slice of rows the background worker should fold into the
+    summary ahead of time, or None. Triggers once unsummarized turns outgrow the
+    keep share of the budget, well before build_context_window would have to
+    summarize on the request path.
+    """
+    budget = budget or CONTEXT_TOKEN_BUDGET
+    turn_tokens = [message_tokens(turn) for turn in _to_history(rows)]
+    start = _unsummarized_start(rows, summary_message_id)
+    keep_share = int((budget - reserved_tokens) * CONTEXT_KEEP_RATIO)
+    if sum(turn_tokens[start:]) <= keep_share:
+        return None
+    keep_from = _recent_start(turn_tokens, start, keep_share // 2)
+    return (start, keep_from) if keep_from > start else None
+
+
+def build_context_window(rows, user_message: str, system_prompt: str,
+                         summary: Optional[str] = None, summary_message_id: Optional[int] = None,
+                         summarize: Optional[Callable] = None, context: Optional[str] = None,
+                         budget: Optional[int] = None) -> ContextWindow:
+    """
+    History for the next model call, where rows come from load_conversation_turns
+    and user_message is the new turn (not saved yet, the model call appends it).
+
+    summarize(previous_summary, messages) -> str folds turns that no longer fit. It
+    may call the model, so this runs without a DB session; callers persist
+    window.summary / window.summary_message_id when window.summarized is set.
+    context (e.g. the user's financial snapshot) is sent as a system message ahead
+    of the history and counts against the budget.
+    """
+    budget = budget or CONTEXT_TOKEN_BUDGET
+    turns = _to_history(rows)
+    turn_tokens = [message_tokens(turn) for turn in turns]
+
+    fixed_tokens = count_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+    fixed_tokens += count_tokens(user_message) + MESSAGE_OVERHEAD_TOKENS
+    if context:
+        fixed_tokens += count_tokens(context) + MESSAGE_OVERHEAD_TOKENS
+    window = ContextWindow(full_tokens=fixed_tokens + sum(turn_tokens),
+                           summary=summary, summary_message_id=summary_message_id)
+
+    # Turns already folded into the summary are never sent again
+    start = _unsummarized_start(rows, summary_message_id)
+
+    def summary_tokens():
+        return message_tokens(summary_message(window.summary)) if window.summary else 0
+
+    def recent_start(available):
+        return _recent_start(turn_tokens, start, available)
+
+    first_kept = recent_start(budget - fixed_tokens - summary_tokens())
+    if first_kept > start and summarize is not None:
+        # Over budget: fold a chunk of older turns into the rolling summary
+        keep_from = recent_start(int((budget - fixed_tokens) * CONTEXT_KEEP_RATIO) - summary_tokens())
+        window.summary = summarize(window.summary, turns[start:keep_from])
+        window.summary_message_id = rows[keep_from - 1][0]
+        SUMMARIES_CREATED.inc()
+        window.summarized = True
+        start = keep_from
+        first_kept = recent_start(budget - fixed_tokens - summary_tokens())
+
+    if context:
+        window.history.append({"role": "system", "content": context})
+    if window.summary:
+        window.history.append(summary_message(window.summary))
+    window.history.extend(turns[first_kept:])
+    window.prompt_tokens = fixed_tokens + summary_tokens() + sum(turn_tokens[first_kept:])
+
+    PROMPT_TOKENS.observe(window.prompt_tokens)
+    PROMPT_TOKENS_SAVED.inc(window.tokens_saved)
+    return window
@@ -0,0 +1,164 @@
+"""
+Financial Context for Spark
+
+Gives the chat model a compact snapshot of the user's finances so answers are
+personalized: balance, income this month, top spending categories, gambling
+trend and recurring charges.
+
+Features:
+- Built from three grouped aggregate queries (no per-transaction scans in Python)
+- Rendered text is bounded to FINANCIAL_CONTEXT_MAX_TOKENS
+- Cached per user (TTL) and retired by cache.invalidate_user() on sync/profile writes,
+  so a chat turn normally costs zero extra queries
+"""
+
+import os
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, func
+
+from ..cache import TTLCache, user_key
+from ..database import get_db_session
+from ..gambling_detection import GamblingDetector
+from ..models import Transaction, User
+from ..partitions import add_months, month_start
+from .context_window import count_tokens
+
+
+FINANCIAL_CONTEXT_TTL = int(os.getenv('FINANCIAL_CONTEXT_TTL', 600))
+FINANCIAL_CONTEXT_MAX_TOKENS = int(os.getenv('FINANCIAL_CONTEXT_MAX_TOKENS', 250))
+LOOKBACK_DAYS = 90
+TOP_CATEGORIES = 5
+TOP_RECURRING = 5
+
+_context_cache = TTLCache('financial_context', maxsize=5000, ttl=FINANCIAL_CONTEXT_TTL)
+
+
+@dataclass
+class FinancialSnapshot:
+    total_balance: float = 0.0
+    salary_monthly: float = 0.0
+    monthly_spending_goal: float = 0.0
+    income_this_month: float = 0.0
+    spending_this_month: float = 0.0
+    top_categories: List[Tuple[str, float]] = field(default_factory=list)  # this month, largest first
+    gambling_this_month: float = 0.0
+    gambling_last_month: float = 0.0
+    gambling_90_days: float = 0.0
+    recurring: List[Tuple[str, float]] = field(default_factory=list)  # name, typical amount
+
+    @property
+    def gambling_trend(self) -> str:
+        if not self.gambling_90_days:
+            return "none"
+        if self.gambling_this_month > self.gambling_last_month * 1.1:
+            return "rising"
+        if self.gambling_this_month < self.gambling_last_month * 0.9:
+            return "falling"
+        return "flat"
+
+    def render(self, max_tokens: int = FINANCIAL_CONTEXT_MAX_TOKENS) -> str:
+        """Plain-text block for the system prompt, trimmed to max_tokens"""
+        categories = list(self.top_categories)
+        recurring = list(self.recurring)
+        while True:
+            text = self._render(categories, recurring)
+            if count_tokens(text) <= max_tokens or not (categories or recurring):
+                return text
+            # Drop the smallest entries first
+            if len(recurring) >= len(categories):
+                recurring.pop()
+            else:
+                categories.pop()
+
+    def _render(self, categories, recurring) -> str:
+        lines = [
+            "User's financial snapshot (use it to personalize answers, don't recite it):",
+            f"- Balance: ${self.total_balance:,.2f}",
+            f"- Income this month: ${self.income_this_month:,.2f} (stated monthly salary ${self.salary_monthly:,.0f})",
+            f"- Spent this month: ${self.spending_this_month:,.2f} of a ${self.monthly_spending_goal:,.0f} goal",
+        ]
+        if categories:
+            lines.append("- Top categories this month: " + ", ".join(
+                f"{name} ${amount:,.0f}" for name, amount in categories))
+        if self.gambling_90_days:
+            lines.append(
+                f"- Gambling: ${self.gambling_this_month:,.0f} this month, ${self.gambling_last_month:,.0f} "
+                f"last month, ${self.gambling_90_days:,.0f} over 90 days (trend: {self.gambling_trend})")
+        if recurring:
+            lines.append("- Recurring charges: " + ", ".join(
+                f"{name} ~${amount:,.0f}" for name, amount in recurring))
+        return "\n".join(lines)
+
+
+def build_financial_snapshot(db, user_id, today: Optional[date] = None) -> FinancialSnapshot:
+    today = today or date.today()
+    this_month = month_start(today)
+    last_month = add_months(this_month, -1)
+    since = today - timedelta(days=LOOKBACK_DAYS)
+
+    snapshot = FinancialSnapshot()
+    user = db.query(User.total_balance, User.salary_monthly, User.monthly_spending_goal).filter(
+        User.id == user_id).first()
+    if user:
+        snapshot.total_balance = float(user.total_balance or 0)
+        snapshot.salary_monthly = float(user.salary_monthly or 0)
+        snapshot.monthly_spending_goal = float(user.monthly_spending_goal or 0)
+
+    period = case(
+        (Transaction.date_posted >= this_month, 'this_month'),
+        (Transaction.date_posted >= last_month, 'last_month'),
+        else_='earlier',
+    )
+    category = func.coalesce(Transaction.user_category, Transaction.plaid_category, 'Uncategorized')
+    totals = db.query(
+        period.label('period'), Transaction.type, category.label('category'), func.sum(Transaction.amount)
+    ).filter(
+        Transaction.user_id == user_id,
+        Transaction.date_posted >= since,
+    ).group_by(period, Transaction.type, category).all()
+
+    gambling_categories = set(GamblingDetector.GAMBLING_CATEGORIES)
+    month_categories = {}
+    for row_period, row_type, row_category, amount in totals:
+        amount = float(amount or 0)
+        if row_type == 'income':
+            if row_period == 'this_month':
+                snapshot.income_this_month += amount
+            continue
+        if row_category in gambling_categories:
+            snapshot.gambling_90_days += amount
+            if row_period == 'this_month':
+                snapshot.gambling_this_month += amount
+            elif row_period == 'last_month':
+                snapshot.gambling_last_month += amount
+        if row_period == 'this_month':
+            snapshot.spending_this_month += amount
+            month_categories[row_category] = month_categories.get(row_category, 0) + amount
+
+    snapshot.top_categories = sorted(month_categories.items(), key=lambda item: item[1], reverse=True)[:TOP_CATEGORIES]
+
+    typical_amount = func.avg(Transaction.amount)
+    recurring = db.query(Transaction.name, typical_amount).filter(
+        Transaction.user_id == user_id,
+        Transaction.type == 'expense',
+        Transaction.is_recurring.is_(True),
+        Transaction.date_posted >= since,
+    ).group_by(Transaction.name).order_by(typical_amount.desc()).limit(TOP_RECURRING).all()
+    snapshot.recurring = [(name, float(amount or 0)) for name, amount in recurring]
+    return snapshot
+
+
+def get_financial_context(user_id, db=None) -> str:
+    """Cached rendered snapshot; db is used on a miss (a readonly session is opened otherwise)"""
+    key = user_key(user_id, date.today().isoformat())
+
+    def build():
+        if db is not None:
+            return build_financial_snapshot(db, user_id).render()
+        with get_db_session(readonly=True, user_id=user_id) as session:
+            return build_financial_snapshot(session, user_id).render()
+
+    return _context_cache.get_or_set(key, build)
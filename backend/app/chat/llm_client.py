@@ -0,0 +1,145 @@
+"""
+OpenAI Client + Concurrency Limiter
+
+A chat turn spends seconds waiting on the model. Under gevent that wait is cheap
+for the worker, but unbounded fan-out to OpenAI isn't: upstream rate limits kick in
+and every waiting request piles up. Callers take a limiter slot for the duration
+of a model call and get a fast 429/503 with Retry-After when the service is full.
+
+Features:
+- Lazily created OpenAI client on a shared keep-alive httpx connection pool
+- OPENAI_BASE_URL support (point it at openai_stub_server.py for load tests)
+- Semaphore capping concurrent upstream calls with a bounded wait queue
+- LLMSaturated error carrying the status code and Retry-After to send back
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+from ..metrics import registry
+
+
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 16))
+LLM_MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', 32))
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', 5))  # seconds a request may wait for a slot
+LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', 60))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 1))
+
+LLM_IN_FLIGHT = registry.gauge('llm_requests_in_flight', 'Model calls currently running')
+LLM_QUEUED = registry.gauge('llm_requests_queued', 'Requests waiting for a model call slot')
+LLM_REJECTED = registry.counter('llm_requests_rejected_total', 'Requests shed by the limiter', ['reason'])
+
+
+class LLMSaturated(Exception):
+    """No model call slot available. Routes turn this into a 429/503 with Retry-After."""
+
+    def __init__(self, message, status_code=503, retry_after=1):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Bounded semaphore with a bounded wait queue.
+
+    threading primitives are monkey-patched under gunicorn's gevent worker, so
+    waiting here only parks the greenlet.
+    """
+
+    def __init__(self, max_concurrent, max_queue, queue_timeout):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+
+    def acquire(self):
+        if self._semaphore.acquire(blocking=False):
+            self._started()
+            return
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                LLM_REJECTED.inc(reason='queue_full')
+                raise LLMSaturated("Too many chat requests in progress", status_code=429,
+                                   retry_after=max(int(self.queue_timeout), 1))
+            self._waiting += 1
+            LLM_QUEUED.set(self._waiting)
+        try:
+            acquired = self._semaphore.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                LLM_QUEUED.set(self._waiting)
+        if not acquired:
+            LLM_REJECTED.inc(reason='timeout')
+            raise LLMSaturated("Chat is busy, please retry shortly", status_code=503,
+                               retry_after=max(int(self.queue_timeout), 1))
+        self._started()
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+            LLM_IN_FLIGHT.set(self._in_flight)
+        self._semaphore.release()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def _started(self):
+        with self._lock:
+            self._in_flight += 1
+            LLM_IN_FLIGHT.set(self._in_flight)
+
+
+llm_limiter = ConcurrencyLimiter(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """OpenAI client built on first use, sharing one keep-alive connection pool"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import httpx
+                from openai import OpenAI
+                http_client = httpx.Client(
+                    timeout=httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=5.0),
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONCURRENCY,
+                        max_keepalive_connections=LLM_MAX_CONCURRENCY,
+                        keepalive_expiry=60,
+                    ),
+                )
+                _client = OpenAI(
+                    api_key=os.getenv('OPENAI_API_KEY'),
+                    base_url=os.getenv('OPENAI_BASE_URL') or None,
+                    max_retries=LLM_MAX_RETRIES,
+                    http_client=http_client,
+                )
+    return _client
+
+
+def upstream_retry_after(error, default=1):
+    """Retry-After from an OpenAI rate limit response, if it sent one"""
+    response = getattr(error, 'response', None)
+    value = response.headers.get('retry-after') if response is not None else None
+    try:
+        return max(int(float(value)), 1)
+    except (TypeError, ValueError):
+        return default
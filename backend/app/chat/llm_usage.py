@@ -0,0 +1,184 @@
+"""
+LLM Call Instrumentation
+
+Every model call goes through track_llm_call() so latency, token usage and cost
+are visible per model, per operation and per user. History growth, cache hit
+ratios and summarization show up directly in these numbers.
+
+Features:
+- llm_request_seconds and llm_time_to_first_token_seconds histograms
+- llm_prompt_tokens_total / llm_completion_tokens_total / llm_cost_usd_total counters
+  and llm_errors_total by error type (all on /metrics)
+- Each call is an llm.<operation> span on the request trace, next to the
+  request's db.query spans
+- Per-user daily totals upserted into llm_usage_daily, backing an optional daily
+  token quota (LLM_DAILY_TOKEN_QUOTA)
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from ..database import get_db_session
+from ..metrics import registry
+from ..models import LLMUsageDaily
+from ..tracing import span
+from .llm_client import LLMSaturated
+
+
+LLM_DAILY_TOKEN_QUOTA = int(os.getenv('LLM_DAILY_TOKEN_QUOTA', 0))  # prompt + completion tokens, 0 = unlimited
+
+# USD per 1M tokens (input, output); unknown models are counted at zero cost
+MODEL_PRICES = {
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'text-embedding-3-small': (0.02, 0.0),
+}
+
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+LLM_LATENCY = registry.histogram(
+    'llm_request_seconds', 'Upstream model call duration (whole stream for streamed calls)',
+    ['model', 'operation', 'status'], buckets=LLM_BUCKETS)
+LLM_TTFT = registry.histogram(
+    'llm_time_to_first_token_seconds', 'Time until the first streamed token arrived',
+    ['model', 'operation'], buckets=LLM_BUCKETS)
+LLM_PROMPT_TOKENS = registry.counter(
+    'llm_prompt_tokens_total', 'Prompt tokens billed by the model provider', ['model', 'operation'])
+LLM_COMPLETION_TOKENS = registry.counter(
+    'llm_completion_tokens_total', 'Completion tokens billed by the model provider', ['model', 'operation'])
+LLM_COST = registry.counter(
+    'llm_cost_usd_total', 'Estimated model spend in USD', ['model', 'operation'])
+LLM_ERRORS = registry.counter(
+    'llm_errors_total', 'Failed model calls', ['model', 'operation', 'error'])
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class LLMCall:
+    """Measurements for one model call, filled in by the caller while it runs"""
+
+    def __init__(self, operation: str, model: str, user_id=None):
+        self.operation = operation
+        self.model = model
+        self.user_id = user_id
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.status = 'ok'
+
+    def first_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def record_usage(self, usage) -> None:
+        """usage: the SDK's CompletionUsage (None when the provider didn't send it)"""
+        if usage is not None:
+            self.prompt_tokens = usage.prompt_tokens or 0
+            self.completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+
+    @property
+    def ttft(self) -> Optional[float]:
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+    @property
+    def cost(self) -> float:
+        return estimate_cost(self.model, self.prompt_tokens, self.completion_tokens)
+
+    def finish(self, active_span) -> None:
+        labels = {"model": self.model, "operation": self.operation}
+        LLM_LATENCY.observe(time.perf_counter() - self.started, status=self.status, **labels)
+        if self.ttft is not None:
+            LLM_TTFT.observe(self.ttft, **labels)
+        if self.prompt_tokens or self.completion_tokens:
+            LLM_PROMPT_TOKENS.inc(self.prompt_tokens, **labels)
+            LLM_COMPLETION_TOKENS.inc(self.completion_tokens, **labels)
+            LLM_COST.inc(self.cost, **labels)
+        active_span.set(status=self.status, prompt_tokens=self.prompt_tokens,
+                        completion_tokens=self.completion_tokens,
+                        **({"ttft_ms": round(self.ttft * 1000, 1)} if self.ttft is not None else {}))
+        if self.user_id is not None and (self.prompt_tokens or self.completion_tokens):
+            record_daily_usage(self.user_id, self.prompt_tokens, self.completion_tokens, self.cost)
+
+
+@contextmanager
+def track_llm_call(operation: str, model: str, user_id=None):
+    """Wrap one upstream call (including consuming its stream)"""
+    call = LLMCall(operation, model, user_id)
+    with span(f'llm.{operation}', model=model) as active:
+        try:
+            yield call
+        except GeneratorExit:
+            call.status = 'cancelled'  # client went away mid-stream
+            raise
+        except Exception as e:
+            call.status = 'error'
+            LLM_ERRORS.inc(model=model, operation=operation, error=type(e).__name__)
+            raise
+        finally:
+            call.finish(active)
+
+
+def usage_day() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _upsert_usage(db, user_id, prompt_tokens, completion_tokens, cost):
+    insert = postgresql.insert if db.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    stmt = insert(LLMUsageDaily).values(
+        user_id=int(user_id), day=usage_day(), requests=1,
+        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cost_usd=cost,
+    )
+    table = LLMUsageDaily.__table__.c
+    return stmt.on_conflict_do_update(
+        index_elements=[table.user_id, table.day],
+        set_={
+            "requests": table.requests + 1,
+            "prompt_tokens": table.prompt_tokens + stmt.excluded.prompt_tokens,
+            "completion_tokens": table.completion_tokens + stmt.excluded.completion_tokens,
+            "cost_usd": table.cost_usd + stmt.excluded.cost_usd,
+            "updated_at": func.now(),
+        },
+    )
+
+
+def record_daily_usage(user_id, prompt_tokens: int, completion_tokens: int, cost: float) -> None:
+    """
+    One atomic upsert per call; accounting must never fail the chat turn. Called
+    after the model answered, when the turn holds no open session block.
+    """
+    try:
+        with get_db_session() as db:
+            db.execute(_upsert_usage(db, user_id, prompt_tokens, completion_tokens, cost))
+            db.commit()
+    except Exception as e:
+        if has_app_context():
+            current_app.logger.warning(f"Failed to record LLM usage for user {user_id}: {str(e)}")
+
+
+def daily_usage(db, user_id, day=None) -> Optional[LLMUsageDaily]:
+    return db.query(LLMUsageDaily).filter(
+        LLMUsageDaily.user_id == user_id, LLMUsageDaily.day == (day or usage_day())).first()
+
+
+def check_daily_quota(db, user_id, quota: int = None) -> None:
+    """Raise LLMSaturated (429 until UTC midnight) once the user's tokens for today exceed the quota"""
+    quota = LLM_DAILY_TOKEN_QUOTA if quota is None else quota
+    if not quota:
+        return
+    usage = daily_usage(db, user_id)
+    if usage and usage.prompt_tokens + usage.completion_tokens >= quota:
+        now = datetime.now(timezone.utc)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+        raise LLMSaturated("Daily chat limit reached, try again tomorrow", status_code=429,
+                           retry_after=int((midnight - now).total_seconds()) + 1)
@@ -0,0 +1,236 @@
+"""
+Conversation Post-Processing
+
+Work that improves conversations but shouldn't delay a reply runs in a
+background worker after the assistant answers:
+- Replace the default "New Conversation N" title with a generated one
+- Fold older turns into the rolling summary ahead of time, so the request path
+  (build_context_window) rarely has to summarize synchronously
+
+Features:
+- Jobs are deduplicated per conversation and batched: one JSON-mode model call
+  covers up to POST_PROCESS_BATCH_SIZE conversations
+- Optimistic updates (a title the user set, or a summary that moved on
+  meanwhile, is never overwritten)
+- conversation_updated SocketIO event pushed to the conversation room
+"""
+
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import update
+
+from .. import socketio
+from ..database import get_db_session
+from ..metrics import registry
+from ..models import Conversations
+from .ai_instructions import dev_system_instr
+from .context_window import background_fold_plan, count_tokens, load_conversation_turns
+from .llm_client import get_client, llm_limiter
+from .llm_usage import track_llm_call
+from .sockets import conversation_room
+
+
+POST_PROCESS_MODEL = os.getenv('POST_PROCESS_MODEL', 'gpt-4o-mini')
+POST_PROCESS_BATCH_SIZE = int(os.getenv('POST_PROCESS_BATCH_SIZE', 8))
+POST_PROCESS_BATCH_WINDOW = float(os.getenv('POST_PROCESS_BATCH_WINDOW', 2.0))  # seconds to gather a batch
+# Room left in the chat budget for the system prompt, user context and new message
+RESERVED_PROMPT_TOKENS = count_tokens(dev_system_instr) + 800
+TITLE_EXCERPT_CHARS = 400
+
+DEFAULT_TITLE = re.compile(r"^New Conversation \d+$")
+
+POST_PROCESS_BATCHES = registry.counter(
+    'chat_post_process_batches_total', 'Batched title/summary model calls', ['status'])
+POST_PROCESS_UPDATES = registry.counter(
+    'chat_post_process_updates_total', 'Conversation fields updated in the background', ['field'])
+
+
+def _plan(db, convo_id):
+    """What a conversation needs, as plain data (None when nothing to do)"""
+    convo = db.query(Conversations.id, Conversations.title, Conversations.summary,
+                     Conversations.summary_message_id).filter(Conversations.id == convo_id).first()
+    if not convo:
+        return None
+    rows = load_conversation_turns(db, convo_id)
+    job = {"id": convo.id, "title": convo.title, "summary": convo.summary,
+           "summary_message_id": convo.summary_message_id}
+
+    if convo.title and DEFAULT_TITLE.match(convo.title) and any(sender != 'user' for _, sender, _ in rows):
+        job["excerpt"] = [f"{sender}: {content[:TITLE_EXCERPT_CHARS]}" for _, sender, content in rows[:2]]
+
+    fold = background_fold_plan(rows, convo.summary_message_id, RESERVED_PROMPT_TOKENS)
+    if fold:
+        start, keep_from = fold
+        job["fold"] = [f"{sender}: {content}" for _, sender, content in rows[start:keep_from]]
+        job["fold_until"] = rows[keep_from - 1][0]
+
+    return job if ("excerpt" in job or "fold" in job) else None
+
+
+def _prompt(jobs):
+    tasks = []
+    for job in jobs:
+        task = {"id": job["id"]}
+        if "excerpt" in job:
+            task["title_from"] = job["excerpt"]
+        if "fold" in job:
+            task["previous_summary"] = job["summary"] or ""
+            task["summarize"] = job["fold"]
+        tasks.append(task)
+    return (
+        "You maintain conversations in a budgeting app. For each task return an object "
+        "with its id, plus:\n"
+        "- \"title\" (max 6 words, no quotes) when the task has title_from\n"
+        "- \"summary\" when the task has summarize: previous_summary updated with the new "
+        "messages, keeping every figure, goal and decision, at most 150 words\n"
+        "Respond with JSON: {\"conversations\": [...]}\n\n"
+        + json.dumps(tasks)
+    )
+
+
+def generate_updates(jobs):
+    """One model call for the whole batch -> {convo_id: {"title": ..., "summary": ...}}"""
+    # Spans several users, so it isn't charged to anyone's daily usage
+    with llm_limiter.slot(), track_llm_call('post_process', POST_PROCESS_MODEL) as call:
+        completion = get_client().chat.completions.create(
+            model=POST_PROCESS_MODEL,
+            messages=[{"role": "user", "content": _prompt(jobs)}],
+            response_format={"type": "json_object"},
+        )
+        call.record_usage(completion.usage)
+    payload = json.loads(completion.choices[0].message.content or '{}')
+    return {int(item["id"]): item for item in payload.get("conversations", []) if "id" in item}
+
+
+def apply_updates(jobs, results):
+    """Write generated fields unless the conversation changed meanwhile; returns pushed events"""
+    events = []
+    with get_db_session() as db:
+        for job in jobs:
+            result = results.get(job["id"]) or {}
+            changed = {}
+            title = (result.get("title") or "").strip().strip('"')[:100]
+            if "excerpt" in job and title:
+                updated = db.execute(update(Conversations).where(
+                    Conversations.id == job["id"], Conversations.title == job["title"]
+                ).values(title=title)).rowcount
+                if updated:
+                    changed["title"] = title
+                    POST_PROCESS_UPDATES.inc(field='title')
+            summary = (result.get("summary") or "").strip()
+            if "fold" in job and summary:
+                current = Conversations.summary_message_id
+                unchanged = current.is_(None) if job["summary_message_id"] is None else current == job["summary_message_id"]
+                updated = db.execute(update(Conversations).where(
+                    Conversations.id == job["id"], unchanged
+                ).values(summary=summary, summary_message_id=job["fold_until"])).rowcount
+                if updated:
+                    changed["summary"] = summary
+                    POST_PROCESS_UPDATES.inc(field='summary')
+            if changed:
+                events.append({"conversation_id": job["id"], **changed})
+        db.commit()
+    for event in events:
+        socketio.emit('conversation_updated', event, to=conversation_room(event["conversation_id"]))
+    return events
+
+
+class ConversationPostProcessor:
+    def __init__(self, batch_size=POST_PROCESS_BATCH_SIZE, batch_window=POST_PROCESS_BATCH_WINDOW):
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def enqueue(self, convo_id):
+        """Called after an assistant reply; cheap enough for the request path"""
+        app = self._worker_app()
+        if app is None:
+            return  # nothing would ever drain the queue
+        with self._lock:
+            if convo_id in self._pending:
+                return
+            self._pending.add(convo_id)
+        self._queue.put(convo_id)
+        if not app.testing:  # tests drain the queue with process_pending()
+            self._ensure_worker(app)
+
+    def _worker_app(self):
+        """The app that drains the queue, None when post-processing is disabled"""
+        if os.getenv('CHAT_POST_PROCESSING', 'True').lower() != 'true':
+            return None
+        try:
+            return current_app._get_current_object()
+        except RuntimeError:
+            return None
+
+    def _ensure_worker(self, app):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        socketio.start_background_task(self._run, app)
+
+    def _next_batch(self, block=True):
+        """Wait for one job, then gather more for up to batch_window seconds"""
+        try:
+            batch = [self._queue.get(block=block)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if block and remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get(block=False))
+            except queue.Empty:
+                break
+        with self._lock:
+            self._pending.difference_update(batch)
+        return batch
+
+    def process_batch(self, convo_ids):
+        # Primary, not the replica: the reply that triggered the job was just written
+        with get_db_session() as db:
+            jobs = [job for job in (_plan(db, convo_id) for convo_id in convo_ids) if job]
+        if not jobs:
+            return []
+        try:
+            results = generate_updates(jobs)
+        except Exception:
+            POST_PROCESS_BATCHES.inc(status='error')
+            raise
+        POST_PROCESS_BATCHES.inc(status='ok')
+        return apply_updates(jobs, results)
+
+    def process_pending(self):
+        """Drain the queue synchronously (tests, CLI)"""
+        events = []
+        while True:
+            batch = self._next_batch(block=False)
+            if not batch:
+                return events
+            events.extend(self.process_batch(batch))
+
+    def _run(self, app):
+        with app.app_context():
+            while True:
+                batch = self._next_batch()
+                try:
+                    self.process_batch(batch)
+                except Exception as e:
+                    # Dropped, the conversation is enqueued again after its next reply
+                    app.logger.error(f"Conversation post-processing failed for {batch}: {str(e)}")
+
+
+post_processor = ConversationPostProcessor()
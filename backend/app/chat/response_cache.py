@@ -0,0 +1,144 @@
+"""
+Chat Response Cache
+
+Many Spark prompts are near-identical ("Can I afford to go out this weekend?").
+Answers to an opening question only depend on the question, the user's financial
+context, the model and the system prompt, so they can be reused for a while.
+
+Features:
+- Key: (user + data generation, model, system prompt version, context hash,
+  normalized question); a sync/profile write retires the user's entries
+- TTL (CHAT_RESPONSE_CACHE_TTL, 0 disables the cache)
+- Optional near-duplicate matching on hashed question embeddings
+  (CHAT_CACHE_NEAR_DUPLICATES, off by default; CHAT_CACHE_NEAR_THRESHOLD cosine
+  similarity). A near match only counts when both questions carry the same
+  numbers and negations: "$50" vs "$500" or "can" vs "can't" embed almost
+  identically but need different answers
+- Hit ratio and model latency saved exported on /metrics
+"""
+
+import hashlib
+import os
+import re
+import threading
+from typing import Optional
+
+import numpy as np
+
+from ..cache import TTLCache, user_key
+from ..metrics import registry
+from .ai_instructions import dev_system_instr
+from .retrieval import HashingEmbedder
+
+
+CHAT_RESPONSE_CACHE_TTL = int(os.getenv('CHAT_RESPONSE_CACHE_TTL', 900))
+CHAT_CACHE_NEAR_DUPLICATES = os.getenv('CHAT_CACHE_NEAR_DUPLICATES', 'False').lower() == 'true'
+CHAT_CACHE_NEAR_THRESHOLD = float(os.getenv('CHAT_CACHE_NEAR_THRESHOLD', 0.9))
+NEAR_CANDIDATES = 50  # recent questions compared per user/context
+
+# Changes whenever the system prompt does, so stale answers are never served
+SYSTEM_PROMPT_VERSION = hashlib.sha256(dev_system_instr.encode()).hexdigest()[:12]
+
+CACHE_LOOKUPS = registry.counter(
+    'chat_response_cache_lookups_total', 'Chat response cache lookups', ['result'])
+CACHE_HIT_RATIO = registry.gauge(
+    'chat_response_cache_hit_ratio', 'Share of cacheable chat turns answered from cache')
+CACHE_SAVED_SECONDS = registry.counter(
+    'chat_response_cache_saved_seconds_total', 'Model latency avoided by cache hits')
+
+_PUNCTUATION = re.compile(r"[^\w\s$%]")
+_WHITESPACE = re.compile(r"\s+")
+_NUMBERS = re.compile(r"\d+(?:[.,]\d+)*")
+_NEGATIONS = re.compile(r"\b(?:not|no|never|none|nothing|cannot|\w+n't)\b")
+
+
+def normalize_question(question: str) -> str:
+    return _WHITESPACE.sub(' ', _PUNCTUATION.sub(' ', question.lower())).strip()
+
+
+def meaning_guard(question: str) -> tuple:
+    """Numbers and negation words in order; near matches must agree on these exactly"""
+    lowered = question.lower().replace('\u2019', "'")
+    return tuple(_NUMBERS.findall(lowered)), tuple(_NEGATIONS.findall(lowered))
+
+
+def context_hash(context: Optional[str]) -> str:
+    return hashlib.sha256((context or '').encode()).hexdigest()[:16]
+
+
+class ChatResponseCache:
+    def __init__(self, ttl: int = CHAT_RESPONSE_CACHE_TTL, near_duplicates: bool = CHAT_CACHE_NEAR_DUPLICATES,
+                 near_threshold: float = CHAT_CACHE_NEAR_THRESHOLD, maxsize: int = 10000):
+        self.ttl = ttl
+        self.near_duplicates = near_duplicates
+        self.near_threshold = near_threshold
+        self._exact = TTLCache('chat_response', maxsize=maxsize, ttl=ttl or 1)
+        self._recent = TTLCache('chat_response_near', maxsize=maxsize // 10 or 1, ttl=ttl or 1)
+        self._embedder = HashingEmbedder(dim=256)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._lookups = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _scope(self, user_id, model, context):
+        return user_key(user_id, model, SYSTEM_PROMPT_VERSION, context_hash(context))
+
+    def _record(self, result: str, saved_seconds: float = 0.0) -> None:
+        CACHE_LOOKUPS.inc(result=result)
+        with self._lock:
+            self._lookups += 1
+            if result != 'miss':
+                self._hits += 1
+            CACHE_HIT_RATIO.set(self._hits / self._lookups)
+        if saved_seconds:
+            CACHE_SAVED_SECONDS.inc(saved_seconds)
+
+    def hit_ratio(self) -> float:
+        return self._hits / self._lookups if self._lookups else 0.0
+
+    def lookup(self, user_id, question: str, model: str, context: Optional[str]) -> Optional[str]:
+        if not self.enabled:
+            return None
+        scope = self._scope(user_id, model, context)
+        normalized = normalize_question(question)
+
+        entry = self._exact.get(scope + (normalized,))
+        if entry is not None:
+            self._record('hit', entry['latency'])
+            return entry['response']
+
+        if self.near_duplicates:
+            guard = meaning_guard(question)
+            candidates = [c for c in (self._recent.get(scope) or []) if c[2] == guard]
+            if candidates:
+                vector = self._embedder.embed([normalized])[0]
+                scores = np.stack([c[1] for c in candidates]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.near_threshold:
+                    entry = self._exact.get(scope + (candidates[best][0],))
+                    if entry is not None:
+                        self._record('near_hit', entry['latency'])
+                        return entry['response']
+
+        self._record('miss')
+        return None
+
+    def store(self, user_id, question: str, model: str, context: Optional[str],
+              response: str, latency: float) -> None:
+        if not self.enabled or not response:
+            return
+        scope = self._scope(user_id, model, context)
+        normalized = normalize_question(question)
+        self._exact.set(scope + (normalized,), {"response": response, "latency": latency})
+        if self.near_duplicates:
+            vector = self._embedder.embed([normalized])[0]
+            with self._lock:
+                candidates = [c for c in (self._recent.get(scope) or []) if c[0] != normalized]
+                candidates.append((normalized, vector, meaning_guard(question)))
+                self._recent.set(scope, candidates[-NEAR_CANDIDATES:])
+
+
+chat_response_cache = ChatResponseCache()
@@ -0,0 +1,319 @@
+"""
+Retrieval Index for Chat Grounding
+
+Lets Spark answer "how much did I spend at Starbucks in June" by retrieving the
+user's most relevant transactions and past messages for each chat turn.
+
+Features:
+- Pluggable embedding backends (RETRIEVAL_EMBEDDER); the default hashing embedder
+  is deterministic and runs offline, "openai" uses the embeddings API
+- Per-user index kept as a compact float32 matrix (rows L2-normalized, so search
+  is a single matrix-vector product)
+- Incremental updates: each lookup only embeds rows newer than the index
+  watermark, and Plaid sync upserts changed transactions
+- Newest rows first, with separate caps for transactions (RETRIEVAL_MAX_ROWS)
+  and messages (RETRIEVAL_MAX_MESSAGES), so a long history keeps the recent
+  rows and can't crowd messages out
+- Latency budget per lookup; a cold index is built in batches and finished on
+  later turns if the budget runs out
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from ..cache import TTLCache
+from ..metrics import registry
+from ..models import Messages, Conversations, Transaction
+from .context_window import count_tokens
+
+
+RETRIEVAL_EMBEDDER = os.getenv('RETRIEVAL_EMBEDDER', 'hashing')
+RETRIEVAL_DIM = int(os.getenv('RETRIEVAL_DIM', 256))
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', 8))
+RETRIEVAL_BUDGET_MS = float(os.getenv('RETRIEVAL_BUDGET_MS', 150))
+RETRIEVAL_MAX_ROWS = int(os.getenv('RETRIEVAL_MAX_ROWS', 5000))  # transactions per user
+RETRIEVAL_MAX_MESSAGES = int(os.getenv('RETRIEVAL_MAX_MESSAGES', 2000))  # messages per user
+RETRIEVAL_MAX_USERS = int(os.getenv('RETRIEVAL_MAX_USERS', 128))  # indexes kept per process
+RETRIEVAL_MAX_TOKENS = int(os.getenv('RETRIEVAL_MAX_TOKENS', 300))
+RETRIEVAL_MIN_SCORE = 0.1
+LOAD_BATCH = 500
+
+RETRIEVAL_LATENCY = registry.histogram(
+    'chat_retrieval_seconds', 'Time spent retrieving grounding rows for a chat turn')
+RETRIEVAL_BUDGET_EXCEEDED = registry.counter(
+    'chat_retrieval_budget_exceeded_total', 'Lookups that ran out of latency budget')
+
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Feature-hashed bag of words + word bigrams + character trigrams with sublinear
+    tf. No model or network needed; identical text always maps to the same vector.
+    """
+    name = 'hashing'
+
+    def __init__(self, dim: int = RETRIEVAL_DIM):
+        self.dim = dim
+
+    def _features(self, text: str):
+        words = _TOKEN.findall(text.lower())
+        features = list(words)
+        features += [f"{a}_{b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts: Dict[int, float] = {}
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'little')
+                index = digest % self.dim
+                sign = 1.0 if (digest >> 63) & 1 else -1.0
+                counts[index] = counts.get(index, 0.0) + sign
+            for index, value in counts.items():
+                matrix[row, index] = np.sign(value) * np.log1p(abs(value))
+        return _normalize(matrix)
+
+
+class OpenAIEmbedder:
+    """OpenAI embeddings (needs network + API key); dimensions shortened to RETRIEVAL_DIM"""
+    name = 'openai'
+
+    def __init__(self, dim: int = RETRIEVAL_DIM, model: str = 'text-embedding-3-small'):
+        self.dim = dim
+        self.model = model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        from .llm_client import get_client, llm_limiter
+        from .llm_usage import track_llm_call
+        with llm_limiter.slot(), track_llm_call('embedding', self.model) as call:
+            response = get_client().embeddings.create(model=self.model, input=texts, dimensions=self.dim)
+            call.record_usage(response.usage)
+        matrix = np.array([item.embedding for item in response.data], dtype=np.float32)
+        return _normalize(matrix)
+
+
+EMBEDDERS: Dict[str, Callable] = {
+    'hashing': HashingEmbedder,
+    'openai': OpenAIEmbedder,
+}
+
+
+def register_embedder(name: str, factory: Callable) -> None:
+    EMBEDDERS[name] = factory
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+@dataclass
+class RetrievedRow:
+    kind: str  # 'transaction' | 'message'
+    id: int
+    text: str
+    score: float
+    convo_id: Optional[int] = None
+
+
+def transaction_text(t) -> str:
+    category = t.user_category or t.plaid_category or 'Uncategorized'
+    return (f"{t.date_posted:%Y-%m-%d} ({t.date_posted:%B %Y}) {t.name} ${float(t.amount):,.2f} "
+            f"{t.type} {category}{' recurring' if t.is_recurring else ''}")
+
+
+def message_text(m) -> str:
+    return f"{m.sender}: {m.content[:500]}"
+
+
+@dataclass
+class LoadState:
+    """How far one kind of row has been loaded into a user's index"""
+    newest: int = 0  # highest id indexed; rows above it are new since the last refresh
+    oldest: Optional[int] = None  # lowest id indexed; older rows are loaded while under the cap
+    count: int = 0
+    exhausted: bool = False  # no older rows left
+
+
+class UserIndex:
+    """Rows for one user; the matrix grows by doubling so appends stay cheap"""
+
+    def __init__(self, dim: int):
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self.size = 0
+        self.keys: List[tuple] = []  # (kind, id)
+        self.texts: List[str] = []
+        self.convo_ids: List[Optional[int]] = []
+        self.positions: Dict[tuple, int] = {}
+        self.loaded = {'transaction': LoadState(), 'message': LoadState()}
+        self.lock = threading.Lock()
+
+    def upsert(self, keys, texts, vectors, convo_ids) -> None:
+        for key, text, vector, convo_id in zip(keys, texts, vectors, convo_ids):
+            position = self.positions.get(key)
+            if position is None:
+                if self.size == self.matrix.shape[0]:
+                    grown = np.zeros((max(64, self.size * 2), self.matrix.shape[1]), dtype=np.float32)
+                    grown[:self.size] = self.matrix[:self.size]
+                    self.matrix = grown
+                position = self.size
+                self.size += 1
+                self.positions[key] = position
+                self.keys.append(key)
+                self.texts.append(text)
+                self.convo_ids.append(convo_id)
+            else:
+                self.texts[position] = text
+            self.matrix[position] = vector
+
+    def search(self, query: np.ndarray, k: int, exclude_convo_id=None) -> List[RetrievedRow]:
+        if not self.size:
+            return []
+        scores = self.matrix[:self.size] @ query
+        if exclude_convo_id is not None:
+            # The conversation's own turns are already in the prompt
+            scores = scores.copy()
+            scores[np.array([c == exclude_convo_id for c in self.convo_ids])] = -1.0
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            RetrievedRow(kind=self.keys[i][0], id=self.keys[i][1], text=self.texts[i],
+                         score=float(scores[i]), convo_id=self.convo_ids[i])
+            for i in top if scores[i] >= RETRIEVAL_MIN_SCORE
+        ]
+
+
+class RetrievalIndex:
+    def __init__(self, embedder=None, max_users: int = RETRIEVAL_MAX_USERS):
+        self.embedder = embedder or EMBEDDERS[RETRIEVAL_EMBEDDER]()
+        self._indexes = TTLCache('retrieval_index', maxsize=max_users, ttl=24 * 60 * 60)
+        self._lock = threading.Lock()
+
+    def _user_index(self, user_id) -> UserIndex:
+        key = str(user_id)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = UserIndex(self.embedder.dim)
+                self._indexes.set(key, index)
+            return index
+
+    def _add_transactions(self, index: UserIndex, transactions) -> None:
+        if transactions:
+            texts = [transaction_text(t) for t in transactions]
+            index.upsert([('transaction', t.id) for t in transactions], texts,
+                         self.embedder.embed(texts), [None] * len(texts))
+
+    def _add_messages(self, index: UserIndex, messages) -> None:
+        if messages:
+            texts = [message_text(m) for m in messages]
+            index.upsert([('message', m.id) for m in messages], texts,
+                         self.embedder.embed(texts), [m.convo_id for m in messages])
+
+    def _load(self, index: UserIndex, kind: str, query, id_column, add, cap: int, deadline) -> bool:
+        """
+        New rows (above the newest indexed id) first, then older rows newest-first
+        until the cap. Rows arriving after the cap is reached are still indexed;
+        the index itself expires within a day and is rebuilt from the newest rows.
+        """
+        state = index.loaded[kind]
+        if state.oldest is not None or state.exhausted:
+            while True:
+                batch = query.filter(id_column > state.newest).order_by(id_column).limit(LOAD_BATCH).all()
+                if not batch:
+                    break
+                add(index, batch)
+                state.newest = batch[-1].id
+                state.count += len(batch)
+                if deadline is not None and time.perf_counter() > deadline:
+                    return False
+
+        while not state.exhausted and state.count < cap:
+            older = query if state.oldest is None else query.filter(id_column < state.oldest)
+            batch = older.order_by(id_column.desc()).limit(min(LOAD_BATCH, cap - state.count)).all()
+            if not batch:
+                state.exhausted = True
+                break
+            add(index, batch)
+            state.newest = max(state.newest, batch[0].id)
+            state.oldest = batch[-1].id
+            state.count += len(batch)
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+        return True
+
+    def refresh(self, db, user_id, deadline: Optional[float] = None) -> bool:
+        """Embed new rows and fill up to the caps. Returns False if the deadline cut it short."""
+        index = self._user_index(user_id)
+        transactions = db.query(Transaction).filter(Transaction.user_id == user_id)
+        messages = db.query(Messages.id, Messages.convo_id, Messages.sender, Messages.content).join(
+            Conversations, Messages.convo_id == Conversations.id
+        ).filter(Conversations.user_id == user_id)
+        with index.lock:
+            return (
+                self._load(index, 'transaction', transactions, Transaction.id, self._add_transactions,
+                           RETRIEVAL_MAX_ROWS, deadline)
+                and self._load(index, 'message', messages, Messages.id, self._add_messages,
+                               RETRIEVAL_MAX_MESSAGES, deadline)
+            )
+
+    def sync_transactions(self, user_id, transactions) -> None:
+        """Plaid sync hook: re-embed changed rows if this user's index is loaded"""
+        index = self._indexes.get(str(user_id))
+        if index is None:
+            return  # built from the DB on first lookup
+        with index.lock:
+            known = [t for t in transactions if ('transaction', t.id) in index.positions]
+            self._add_transactions(index, known)
+
+    def search(self, db, user_id, query: str, k: int = RETRIEVAL_TOP_K,
+               budget_ms: float = RETRIEVAL_BUDGET_MS, exclude_convo_id=None) -> List[RetrievedRow]:
+        start = time.perf_counter()
+        deadline = start + budget_ms / 1000
+        try:
+            complete = self.refresh(db, user_id, deadline)
+            if not complete or time.perf_counter() > deadline:
+                RETRIEVAL_BUDGET_EXCEEDED.inc()
+            query_vector = self.embedder.embed([query])[0]
+            index = self._user_index(user_id)
+            with index.lock:
+                return index.search(query_vector, k, exclude_convo_id=exclude_convo_id)
+        finally:
+            RETRIEVAL_LATENCY.observe(time.perf_counter() - start)
+
+    def forget(self, user_id) -> None:
+        self._indexes.pop(str(user_id))
+
+
+def render_retrieved(rows: List[RetrievedRow], max_tokens: int = RETRIEVAL_MAX_TOKENS) -> Optional[str]:
+    """System-prompt block with the retrieved rows, trimmed to max_tokens"""
+    if not rows:
+        return None
+    lines = ["Records from the user's history that may be relevant to their question:"]
+    used = count_tokens(lines[0])
+    for row in rows:
+        line = f"- [{row.kind}] {row.text}"
+        tokens = count_tokens(line)
+        if used + tokens > max_tokens:
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(lines) if len(lines) > 1 else None
+
+
+retrieval_index = RetrievalIndex()
@@ -1,13 +1,42 @@
-from flask import Blueprint, request, jsonify, current_app, make_response
+from flask import Blueprint, request, jsonify, current_app, make_response, Response, stream_with_context
 from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt, jwt_required, get_jwt_identity
 from datetime import datetime
-from .ai_service import get_ai_response
+from functools import partial
+from sqlalchemy import func, update
+from .ai_service import get_ai_response, stream_ai_response, summarize_conversation, CHAT_MODEL
+from .ai_instructions import dev_system_instr
+from .context_window import build_context_window, load_conversation_turns
+from .financial_context import get_financial_context
+from .retrieval import retrieval_index, render_retrieved
+from .response_cache import chat_response_cache
+from .llm_client import llm_limiter, LLMSaturated
+from .llm_usage import check_daily_quota
+from .post_processing import post_processor
+from .sockets import conversation_room
+from .. import socketio, tracing
 from ..database import get_db_session
 from ..models import Conversations, Messages, User
-import re
+from ..pagination import newest_first, parse_limit, InvalidCursor
+from ..prepared import prepare_as, warmup
+from ..rate_limit import rate_limit, jwt_identity
+from ..user_snapshot import get_user_snapshot
+import json
+import time
 
 chat_bp = Blueprint('chat', __name__, url_prefix='/chat')
 
+DEFAULT_CONVERSATION_PAGE = 50
+DEFAULT_MESSAGE_PAGE = 50
+MAX_PAGE_SIZE = 200
+
+
+def paginated(items, next_cursor):
+    """JSON list body (unchanged shape for the frontend); the next page cursor goes in a header"""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
+
 @chat_bp.route('/conversations', methods=["POST"])
 @jwt_required()
 def create_conversation(): 
@@ -18,24 +47,24 @@ def create_conversation():
     user_id = get_jwt_identity() 
     try: 
         with get_db_session() as db:
-            user = db.query(User).get(user_id) 
+            data = request.get_json() or {}
+            title = data.get('title')
+            if title:
+                user = get_user_snapshot(user_id, db)
+            else:
+                # Allocate the next number atomically: the row lock taken by the UPDATE
+                # serializes concurrent creates, so two tabs can't get the same title
+                user = db.execute(
+                    update(User)
+                    .where(User.id == user_id)
+                    .values(conversation_counter=User.conversation_counter + 1)
+                    .returning(User.conversation_counter)
+                ).first()
+                if user:
+                    title = f"New Conversation {user.conversation_counter}"
 
             if not user: 
                 return jsonify({"message": "User not found"}), 404
-
-            data = request.get_json() or {}
-            title = data.get('title')
-            if not title:
-                # Get all titles for this user that match the pattern
-                existing_titles = db.query(Conversations.title).filter_by(user_id=user_id).all()
-                max_num = 0
-                for (title_str,) in existing_titles:
-                    match = re.match(r"New Conversation (\d+)", title_str)
-                    if match:
-                        num = int(match.group(1))
-                        if num > max_num:
-                            max_num = num
-                title = f"New Conversation {max_num + 1}"
             
             #user is found, we have conversations.user_id as a FK referencing users.id. We want to create new convo tied to user
             new_convo = Conversations(
@@ -56,23 +85,34 @@ def create_conversation():
     except Exception as e:
         return jsonify({"error": "Failed to create conversation"}), 500
 
+@warmup
+def conversations_page(db, user_id=0, cursor=None, limit=DEFAULT_CONVERSATION_PAGE):
+    """One page of a user's conversations, newest first (columns only, served by ix_conversations_user_id_last_modified)"""
+    query = prepare_as(db.query(
+        Conversations.id, Conversations.title, Conversations.created_at, Conversations.last_modified
+    ), 'conversations_by_user').filter(Conversations.user_id == user_id)
+    return newest_first(query, Conversations.last_modified, Conversations.id, cursor, limit)
+
 @chat_bp.route('/conversations', methods=["GET"])
 @jwt_required()
 def get_conversations():
     """
     Upon spark.jsx loading, we should be able to get all conversations that a user has.
+
+    Most recently modified first, one page at a time: ?limit= (default 50) and
+    ?cursor= taken from the X-Next-Cursor header of the previous page.
     """
     user_id = get_jwt_identity()
+    limit = parse_limit(request.args.get('limit'), DEFAULT_CONVERSATION_PAGE, MAX_PAGE_SIZE)
     try:
-        with get_db_session() as db:
+        with get_db_session(readonly=True) as db:
             #we want to get the user, and then get all conversations tied to user 
-            user = db.query(User).get(user_id)
+            user = get_user_snapshot(user_id, db)
             if not user:
                 return jsonify({"error": "User not found"}), 404
             
-            #if the user is found, find all conversations with that user
-            #search conversations with the same user_id --> 
-            conversations = user.conversations #lists all conversation objects in DB associated with user (where conversations.user_id == user.id)
+            #if the user is found, find the user's conversations
+            conversations, next_cursor = conversations_page(db, user.id, request.args.get('cursor'), limit)
 
             convo_list = [
                 {
@@ -83,7 +123,9 @@ def get_conversations():
                 }
                 for convo in conversations
             ]
-            return jsonify(convo_list), 200
+            return paginated(convo_list, next_cursor)
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
     except Exception as e:
         return jsonify({"error": "Failed to fetch conversations"}), 500
 
@@ -92,7 +134,7 @@ def get_conversations():
 def get_specific_conversation(id):
     user_id = get_jwt_identity()
     try:
-        with get_db_session() as db:
+        with get_db_session(readonly=True) as db:
             convo = db.query(Conversations).filter_by(id=id, user_id=user_id).first() #find matching convo with id and correct user
             if not convo:
                 return jsonify({"error": "Conversation not found"}), 404
@@ -114,80 +156,274 @@ def delete_conversation(id):
                 return jsonify({"error": "Conversation not found"}), 404
             db.delete(convo)
             db.commit()
+            retrieval_index.forget(user_id)  # rebuilt without the deleted messages on next use
             return jsonify({"message": "Conversation deleted"}), 200
             
     except Exception as e:
         return jsonify({"error": "Failed to delete conversation"}), 500
 
 
+@chat_bp.errorhandler(LLMSaturated)
+def llm_saturated(error):
+    response = jsonify({"error": str(error)})
+    response.status_code = error.status_code
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def start_turn(db, convo_id, user_id, user_message):
+    """
+    Save the user's message and snapshot what the model call needs as plain data,
+    so the session (and its pooled connection) is released before calling the model.
+    Returns None when the conversation doesn't belong to the user.
+    """
+    convo = db.query(Conversations).filter_by(id=convo_id, user_id=user_id).first()
+    if not convo:
+        return None
+    check_daily_quota(db, user_id)
+    turn = {
+        "user_id": user_id,
+        "rows": load_conversation_turns(db, convo.id),
+        "summary": convo.summary,
+        "summary_message_id": convo.summary_message_id,
+        "financial_context": None,
+        "retrieved": None,
+    }
+    # Personalization is best effort, chat still works without it
+    try:
+        turn["financial_context"] = get_financial_context(user_id, db)
+    except Exception as e:
+        current_app.logger.warning(f"Financial context unavailable for user {user_id}: {str(e)}")
+    try:
+        rows = retrieval_index.search(db, user_id, user_message, exclude_convo_id=convo.id)
+        turn["retrieved"] = render_retrieved(rows)
+    except Exception as e:
+        current_app.logger.warning(f"Retrieval unavailable for user {user_id}: {str(e)}")
+    db.add(Messages(convo_id=convo.id, sender="user", content=user_message))
+    db.commit()
+    return turn
+
+
+def build_window(convo_id, user_message, turn):
+    """Token-budgeted history (rolling summary + recent turns). May call the summarizer."""
+    turn["context"] = "\n\n".join(part for part in (turn["financial_context"], turn["retrieved"]) if part) or None
+    window = build_context_window(
+        turn["rows"], user_message, dev_system_instr,
+        summary=turn["summary"], summary_message_id=turn["summary_message_id"],
+        summarize=partial(summarize_conversation, user_id=turn["user_id"]), context=turn["context"])
+    current_app.logger.info(json.dumps({"conversation_id": convo_id, **window.report()}))
+    return window
+
+
+def cached_reply(user_id, user_message, turn):
+    """
+    Opening questions only: later answers depend on the conversation so far. Keyed
+    on the financial snapshot; retrieved rows come from the same user data (whose
+    changes retire the entry) plus past chats, which shouldn't defeat reuse.
+    """
+    if turn["rows"]:
+        return None
+    return chat_response_cache.lookup(user_id, user_message, CHAT_MODEL, turn["financial_context"])
+
+
+def cache_reply(user_id, user_message, turn, ai_response, latency):
+    if not turn["rows"]:
+        chat_response_cache.store(user_id, user_message, CHAT_MODEL, turn["financial_context"], ai_response, latency)
+
+
+def finish_turn(convo_id, ai_response, window):
+    """Persist the assistant reply (and a refreshed summary) in one short session"""
+    with get_db_session() as db:
+        ai_msg_obj = Messages(
+            convo_id=convo_id,
+            sender="assistant",
+            content=ai_response
+        )
+        db.add(ai_msg_obj)
+        updates = {"last_modified": func.now()}
+        if window.summarized:
+            updates.update(summary=window.summary, summary_message_id=window.summary_message_id)
+        db.query(Conversations).filter_by(id=convo_id).update(updates)
+        db.commit()
+        message_id = ai_msg_obj.id
+    # Title / summary upkeep happens in the background worker
+    post_processor.enqueue(convo_id)
+    return message_id
+
+
 @chat_bp.route('/conversations/<int:id>/messages', methods=["POST"])
 @jwt_required()
+@rate_limit('chat_message_user', '30/minute', key=jwt_identity)
 def send_user_message(id):
     user_id = get_jwt_identity()
-    data = request.get_json()
+    data = request.get_json() or {}
+    user_message = data.get('message')
+    if not user_message:
+        return jsonify({"error": "No message content found"}), 400
     try:
         with get_db_session() as db:
-            convo = db.query(Conversations).filter_by(id=id, user_id=user_id).first()
-            if not convo:
-                return jsonify({"error": "Conversation not found"}), 404
-            user_message = data.get('message')
-            if not user_message:
-                return jsonify({"error": "No message content found"}), 400
-
-            # Save user message
-            user_msg_obj = Messages(
-                convo_id=convo.id,
-                sender="user",
-                content=user_message
-            )
-            db.add(user_msg_obj)
-            db.commit()
-            db.refresh(user_msg_obj)
-
-            # Build history for LLM
-            messages = db.query(Messages).filter_by(convo_id=convo.id).order_by(Messages.created_at).all()
-            history = []
-            for msg in messages:
-                role = "user" if msg.sender == "user" else "assistant"
-                history.append({"role": role, "content": msg.content})
-
-            # Get LLM response
-            ai_response = get_ai_response(user_message, conversation_history=history)
-
-            # Save AI response
-            ai_msg_obj = Messages(
-                convo_id=convo.id,
-                sender="assistant",
-                content=ai_response
-            )
-            db.add(ai_msg_obj)
-            db.commit()
-            db.refresh(ai_msg_obj)
+            turn = start_turn(db, id, user_id, user_message)
+        if turn is None:
+            return jsonify({"error": "Conversation not found"}), 404
 
-            # Update conversation's last_modified
-            convo.last_modified = ai_msg_obj.created_at
-            db.commit()
+        # No DB session is held while waiting on the model
+        window = build_window(id, user_message, turn)
+        ai_response = cached_reply(user_id, user_message, turn)
+        if ai_response is None:
+            started = time.perf_counter()
+            ai_response = get_ai_response(user_message, conversation_history=window.history, user_id=user_id)
+            cache_reply(user_id, user_message, turn, ai_response, time.perf_counter() - started)
 
-            return jsonify({"response": ai_response}), 200
+        finish_turn(id, ai_response, window)
+        return jsonify({"response": ai_response}), 200
+    except LLMSaturated:
+        raise
     except Exception as e:
         print("Error in send_user_message:", e)
         return jsonify({"error": "Failed to process message"}), 500
 
 
+def stream_assistant_reply(convo_id, user_id, user_message, turn, window, cached=None):
+    """
+    Yield ("token", text) while the model streams, pushing each token to the
+    conversation's SocketIO room too. The assembled reply is persisted once at the
+    end and announced with a final ("done", payload). A cached reply is sent as a
+    single token.
+    """
+    room = conversation_room(convo_id)
+    started = time.perf_counter()
+    tokens = iter([cached]) if cached is not None else stream_ai_response(
+        user_message, conversation_history=window.history, user_id=user_id)
+    chunks = []
+    for token in tokens:
+        chunks.append(token)
+        socketio.emit('chat_token', {"conversation_id": convo_id, "content": token}, to=room)
+        yield "token", token
+
+    ai_response = "".join(chunks)
+    if cached is None:
+        cache_reply(user_id, user_message, turn, ai_response, time.perf_counter() - started)
+    payload = {
+        "conversation_id": convo_id,
+        "message_id": finish_turn(convo_id, ai_response, window),
+        "response": ai_response,
+    }
+    socketio.emit('chat_done', payload, to=room)
+    yield "done", payload
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@chat_bp.route('/conversations/<int:id>/messages/stream', methods=["POST"])
+@jwt_required()
+@rate_limit('chat_message_user', '30/minute', key=jwt_identity)
+def stream_user_message(id):
+    """
+    Streaming version of send_user_message.
+
+    Default transport is Server-Sent Events on this response. With
+    ?transport=socketio the request returns 202 right away and tokens are pushed to
+    the conversation room (join it first with the join_conversation socket event).
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    user_message = data.get('message')
+    if not user_message:
+        return jsonify({"error": "No message content found"}), 400
+
+    try:
+        with get_db_session() as db:
+            turn = start_turn(db, id, user_id, user_message)
+        if turn is None:
+            return jsonify({"error": "Conversation not found"}), 404
+        window = build_window(id, user_message, turn)
+    except LLMSaturated:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"Error starting message stream: {str(e)}")
+        return jsonify({"error": "Failed to process message"}), 500
+
+    cached = cached_reply(user_id, user_message, turn)
+    # Held for the whole stream; saturation is answered before any output is sent.
+    # Cached replies never reach the model and skip the limiter.
+    released = [cached is not None]
+    if cached is None:
+        llm_limiter.acquire()
+
+    def release_slot():
+        if not released[0]:
+            released[0] = True
+            llm_limiter.release()
+
+    if request.args.get('transport') == 'socketio':
+        app = current_app._get_current_object()
+        trace = tracing.current_trace()
+        traceparent = trace.traceparent() if trace else None
+
+        def run_in_background():
+            with app.app_context(), tracing.trace('chat.stream_background', traceparent, conversation_id=id):
+                try:
+                    for _ in stream_assistant_reply(id, user_id, user_message, turn, window, cached):
+                        pass
+                except Exception as e:
+                    app.logger.error(f"Error streaming message: {str(e)}")
+                    socketio.emit('chat_error', {"conversation_id": id, "error": "Failed to process message"},
+                                  to=conversation_room(id))
+                finally:
+                    release_slot()
+
+        try:
+            socketio.start_background_task(run_in_background)
+        except Exception:
+            release_slot()
+            raise
+        return jsonify({"status": "streaming", "room": conversation_room(id)}), 202
+
+    def generate():
+        try:
+            for event, payload in stream_assistant_reply(id, user_id, user_message, turn, window, cached):
+                yield sse_event(event, {"content": payload} if event == "token" else payload)
+        except Exception as e:
+            current_app.logger.error(f"Error streaming message: {str(e)}")
+            yield sse_event("error", {"error": "Failed to process message"})
+        finally:
+            release_slot()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # Covers clients that disconnect before the stream starts
+    response.call_on_close(release_slot)
+    return response
+
+
 @chat_bp.route('/conversations/<int:id>/messages', methods=["GET"])
 @jwt_required()
 def get_all_conversation_messages(id):
     """
-    When user clicks on conversation, we need to get all messages that are part of that conversation so we can load them in.
+    When user clicks on conversation, we need to get the messages that are part of that conversation so we can load them in.
+
+    Pages walk backwards from the newest message (?limit=, default 50, and ?cursor=
+    from X-Next-Cursor); each page is returned oldest-first so it renders as is.
     """
     user_id = get_jwt_identity()  # JWT token created upon login + identity of it is tied to user_id from db
+    limit = parse_limit(request.args.get('limit'), DEFAULT_MESSAGE_PAGE, MAX_PAGE_SIZE)
     try:
-        with get_db_session() as db:
-            convo = db.query(Conversations).filter_by(id=id, user_id=user_id).first()
+        with get_db_session(readonly=True) as db:
+            convo = db.query(Conversations.id).filter_by(id=id, user_id=user_id).first()
             if not convo:
                 return jsonify({"error": "Conversation not found"}), 404
 
-            messages_in_convo = db.query(Messages).filter_by(convo_id=convo.id).order_by(Messages.created_at).all()
+            query = db.query(
+                Messages.id, Messages.sender, Messages.content, Messages.created_at
+            ).filter(Messages.convo_id == convo.id)
+            page, next_cursor = newest_first(
+                query, Messages.created_at, Messages.id, request.args.get('cursor'), limit)
+            messages_in_convo = reversed(page)
 
             messages_list = [
                 {
@@ -200,7 +436,9 @@ def get_all_conversation_messages(id):
                 for msg in messages_in_convo
             ]
 
-            return jsonify(messages_list), 200 #messages_list = {{...}, {...}, {....}}
+            return paginated(messages_list, next_cursor) #messages_list = {{...}, {...}, {....}}
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
     except Exception as e:
         return jsonify({"error": "Failed to fetch messages"}), 500
 
@@ -0,0 +1,45 @@
+"""
+SocketIO handlers for chat.
+
+Clients join one room per conversation to receive streamed tokens
+(chat_token / chat_done / chat_error events).
+"""
+
+from flask_jwt_extended import decode_token
+from flask_socketio import join_room, leave_room, emit
+
+from .. import socketio
+from ..database import get_db_session
+from ..models import Conversations
+
+
+def conversation_room(convo_id):
+    return f"conversation_{convo_id}"
+
+
+@socketio.on('join_conversation')
+def join_conversation(data):
+    """data = {"conversation_id": int, "token": access JWT}"""
+    try:
+        user_id = decode_token(data.get('token'))['sub']
+        convo_id = int(data.get('conversation_id'))
+    except Exception:
+        emit('chat_error', {"error": "Invalid token or conversation"})
+        return
+
+    with get_db_session(readonly=True, user_id=user_id) as db:
+        convo = db.query(Conversations.id).filter_by(id=convo_id, user_id=user_id).first()
+    if not convo:
+        emit('chat_error', {"error": "Conversation not found"})
+        return
+
+    join_room(conversation_room(convo_id))
+    emit('joined_conversation', {"conversation_id": convo_id})
+
+
+@socketio.on('leave_conversation')
+def leave_conversation(data):
+    try:
+        leave_room(conversation_room(int(data.get('conversation_id'))))
+    except (TypeError, ValueError):
+        pass
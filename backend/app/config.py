@@ -29,6 +29,11 @@ class Config:
 
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+    # SQL instrumentation (app/query_stats.py). Budget enforcement is opt-in, meant for tests.
+    QUERY_BUDGET_ENFORCE = os.getenv('QUERY_BUDGET_ENFORCE', 'False').lower() == 'true'
+    QUERY_BUDGET_MAX_QUERIES = int(os.getenv('QUERY_BUDGET_MAX_QUERIES', 25))
+    QUERY_BUDGET_MAX_REPEATS = int(os.getenv('QUERY_BUDGET_MAX_REPEATS', 5))
+
     PLAID_CLIENT_ID = os.getenv('PLAID_CLIENT_ID')
     PLAID_SECRET = os.getenv('PLAID_SECRET')
     PLAID_ENV = os.getenv('PLAID_ENV', 'sandbox')
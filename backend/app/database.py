@@ -1,49 +1,536 @@
+import io
 import os
+import re
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Iterable, Optional, Sequence
 
-import psycopg2
 from dotenv import load_dotenv
 from contextlib import contextmanager
-from sqlalchemy import create_engine, text #engine = starting point for SQLAlchemy app
+from sqlalchemy import create_engine, event, exc, insert, table, column #engine = starting point for SQLAlchemy app
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 
-load_dotenv()
+from . import prepared
+from .metrics import registry
 
-SQLALCHEMY_DATABASE_URL = os.getenv('DATABASE_URL')
-# print(f"Database URL: {SQLALCHEMY_DATABASE_URL}") #DEBUG LINE - Commented out for security
+load_dotenv()
 
-# Add SSL mode for production database connections
-if os.getenv('FLASK_ENV') == 'production':
-    # Ensure SSL is required for production database connections
+def _require_ssl(url):
+    """Ensure SSL is required for production database connections"""
+    if not url or os.getenv('FLASK_ENV') != 'production':
+        return url
     # Only add sslmode if it's not already present
-    if 'sslmode=' not in SQLALCHEMY_DATABASE_URL:
-        if '?' in SQLALCHEMY_DATABASE_URL:
-            SQLALCHEMY_DATABASE_URL += '&sslmode=require'
+    if 'sslmode=' not in url:
+        if '?' in url:
+            url += '&sslmode=require'
         else:
-            SQLALCHEMY_DATABASE_URL += '?sslmode=require'
+            url += '?sslmode=require'
+    return url
+
+SQLALCHEMY_DATABASE_URL = _require_ssl(os.getenv('DATABASE_URL'))
+# print(f"Database URL: {SQLALCHEMY_DATABASE_URL}") #DEBUG LINE - Commented out for security
+
+# Optional read replica for GET traffic. Falls back to the primary when unset.
+SQLALCHEMY_REPLICA_URL = _require_ssl(os.getenv('DATABASE_REPLICA_URL'))
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+@dataclass
+class PoolSettings:
+    """
+    Connection pool configuration (all values can be overridden through env vars).
+
+    gunicorn runs gevent workers that can hold hundreds of greenlets, so the defaults
+    are larger than SQLAlchemy's and connections are pinged/recycled to survive Neon
+    closing idle connections. Set DB_USE_NULLPOOL when an external pooler
+    (PgBouncer / Neon pooler) sits in front of Postgres. DB_DRIVER=psycopg switches
+    postgres URLs to psycopg 3 (pipeline mode, binary COPY, no green callback needed).
+    """
+    driver: str = 'psycopg2'  # 'psycopg2' | 'psycopg' (psycopg 3)
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: float = 10.0
+    pool_recycle: int = 300  # seconds, Neon drops idle connections after ~5 minutes
+    pool_pre_ping: bool = True
+    use_null_pool: bool = False
+    gevent_wait_callback: str = 'auto'  # 'auto' | 'true' | 'false'
+    prepared_statements: bool = False  # psycopg2: PREPARE hot queries (app/prepared.py); psycopg: auto-prepare
+    prepare_threshold: int = 5  # psycopg: executions before a statement is prepared
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            driver=os.getenv('DB_DRIVER', cls.driver).strip().lower(),
+            pool_size=int(os.getenv('DB_POOL_SIZE', cls.pool_size)),
+            max_overflow=int(os.getenv('DB_MAX_OVERFLOW', cls.max_overflow)),
+            pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', cls.pool_timeout)),
+            pool_recycle=int(os.getenv('DB_POOL_RECYCLE', cls.pool_recycle)),
+            pool_pre_ping=_env_bool('DB_POOL_PRE_PING', cls.pool_pre_ping),
+            use_null_pool=_env_bool('DB_USE_NULLPOOL', cls.use_null_pool),
+            gevent_wait_callback=os.getenv('DB_GEVENT_WAIT_CALLBACK', cls.gevent_wait_callback).strip().lower(),
+            prepared_statements=_env_bool('DB_PREPARED_STATEMENTS', cls.prepared_statements),
+            prepare_threshold=int(os.getenv('DB_PREPARE_THRESHOLD', cls.prepare_threshold)),
+        )
+
+
+# Pool metrics (exposed on /metrics)
+POOL_CHECKOUT_WAIT = registry.histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection', ['engine'])
+POOL_CHECKOUT_TIMEOUTS = registry.counter(
+    'db_pool_checkout_timeouts_total', 'Pool checkouts that timed out waiting for a connection', ['engine'])
+POOL_CHECKED_OUT = registry.gauge(
+    'db_pool_checked_out', 'Connections currently checked out of the pool', ['engine'])
+POOL_SATURATION = registry.gauge(
+    'db_pool_saturation_ratio', 'Checked out connections / (pool_size + max_overflow)', ['engine'])
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+    metrics_name = 'primary'
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc(engine=self.metrics_name)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, engine=self.metrics_name)
+
+
+def _gevent_is_patched():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+_wait_callback_installed = False
+
+def install_gevent_wait_callback():
+    """
+    Make psycopg2 yield to the gevent hub while waiting on the server instead of
+    blocking the whole worker (same approach as psycogreen).
+    """
+    global _wait_callback_installed
+    if _wait_callback_installed:
+        return
+    from psycopg2 import extensions, OperationalError
+    from gevent.socket import wait_read, wait_write
+
+    def gevent_wait_callback(conn, timeout=None):
+        while True:
+            state = conn.poll()
+            if state == extensions.POLL_OK:
+                break
+            elif state == extensions.POLL_READ:
+                wait_read(conn.fileno(), timeout=timeout)
+            elif state == extensions.POLL_WRITE:
+                wait_write(conn.fileno(), timeout=timeout)
+            else:
+                raise OperationalError(f"Bad result from poll: {state!r}")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    extensions.set_wait_callback(gevent_wait_callback)
+    _wait_callback_installed = True
+
+
+DB_DRIVERS = {
+    'psycopg2': 'postgresql+psycopg2',
+    'psycopg': 'postgresql+psycopg',
+}
+
+
+def driver_url(url, driver):
+    """Point a postgres:// / postgresql[+driver]:// URL at the configured DBAPI driver"""
+    scheme, sep, rest = url.partition('://')
+    if not sep or scheme.split('+')[0] not in ('postgres', 'postgresql'):
+        return url
+    return f"{DB_DRIVERS[driver]}://{rest}"
+
+
+def _attach_pool_metrics(engine, name):
+    def update_gauges(*_args):
+        current = engine.pool  # pool may have been recreated by dispose()
+        if not isinstance(current, QueuePool):
+            return
+        checked_out = current.checkedout()
+        POOL_CHECKED_OUT.set(checked_out, engine=name)
+        capacity = current.size() + max(current._max_overflow, 0)
+        if capacity:
+            POOL_SATURATION.set(checked_out / capacity, engine=name)
+
+    # Listening on the engine keeps the hooks across pool recreation
+    event.listen(engine, 'checkout', update_gauges)
+    event.listen(engine, 'checkin', update_gauges)
+
+
+def create_db_engine(url, name='primary', settings: Optional[PoolSettings] = None):
+    """
+    Engine factory driven by PoolSettings.
+
+    SQLite (used by the test-suite) keeps SQLAlchemy's defaults since its pools
+    don't accept sizing arguments.
+    """
+    settings = settings or PoolSettings.from_env()
+
+    if url.startswith('sqlite'):
+        return create_engine(url)
+
+    url = driver_url(url, settings.driver)
+    connect_args = {}
+    if settings.driver == 'psycopg':
+        # psycopg 3 waits cooperatively once gevent has patched select; it prepares
+        # statements itself after prepare_threshold executions (None = never, required
+        # behind transaction-mode poolers)
+        use_auto_prepare = settings.prepared_statements and not settings.use_null_pool
+        connect_args['prepare_threshold'] = settings.prepare_threshold if use_auto_prepare else None
+    elif settings.gevent_wait_callback == 'true' or (
+        settings.gevent_wait_callback == 'auto' and _gevent_is_patched()
+    ):
+        install_gevent_wait_callback()
+
+    if settings.use_null_pool:
+        # External pooler owns connection reuse; we just open/close per checkout
+        return create_engine(url, poolclass=NullPool, pool_pre_ping=settings.pool_pre_ping,
+                             connect_args=connect_args)
+
+    pool_class = type(f'{name.title()}QueuePool', (InstrumentedQueuePool,), {'metrics_name': name})
+    engine = create_engine(
+        url,
+        poolclass=pool_class,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+        connect_args=connect_args,
+    )
+    _attach_pool_metrics(engine, name)
+    if settings.prepared_statements and settings.driver == 'psycopg2':
+        prepared.install(engine)
+    return engine
+
+
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine) #allows the Session factory to be used by multiple functions
 
+replica_engine = create_db_engine(SQLALCHEMY_REPLICA_URL, name='replica') if SQLALCHEMY_REPLICA_URL else engine
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
 Base = declarative_base() #set up blueprint for building --> every model needs to extend from it so SQLAlchemy knows how to wire up walls
 #Base holds metadata needed for SQLAlchemy to map python classes to actual sql tables
 
-def test_db_connection(): #testing connection via sqlalchemy
+# Read-your-writes: after a user writes (profile update, Plaid sync, ...) their reads
+# stay on the primary for a short window so replica lag never shows stale data.
+PRIMARY_PIN_SECONDS = float(os.getenv('DB_PRIMARY_PIN_SECONDS', 15))
+_primary_pins = {}  # user_id -> monotonic expiry
+
+
+def pin_user_to_primary(user_id, seconds=None):
+    """Route this user's readonly sessions to the primary for the next few seconds"""
+    if user_id is None:
+        return
+    now = time.monotonic()
+    if len(_primary_pins) > 10000:
+        for key in [k for k, expiry in _primary_pins.items() if expiry <= now]:
+            _primary_pins.pop(key, None)
+    _primary_pins[str(user_id)] = now + (PRIMARY_PIN_SECONDS if seconds is None else seconds)
+
+
+def is_pinned_to_primary(user_id):
+    if user_id is None:
+        return False
+    expires_at = _primary_pins.get(str(user_id))
+    if expires_at is None:
+        return False
+    if expires_at <= time.monotonic():
+        _primary_pins.pop(str(user_id), None)
+        return False
+    return True
+
+
+def _current_user_id():
+    """JWT identity of the current request, if any"""
+    try:
+        from flask import has_request_context
+        from flask_jwt_extended import get_jwt_identity
+        if has_request_context():
+            return get_jwt_identity()
+    except Exception:
+        pass
+    return None
+
+
+@event.listens_for(Session, 'after_flush')  # the class: tests swap in their own session factories
+def _mark_session_dirty(session, flush_context):
+    session.info['has_writes'] = True
+
+
+def after_commit(db, callback, *args):
+    """
+    Run callback(*args) once db's transaction commits, drop it if it rolls back.
+
+    For side effects that must not get ahead of the data (cache invalidation,
+    primary pinning): inside an inner block the commit is the outermost block's,
+    and until then other requests still read the old rows.
+    """
+    db.info.setdefault('after_commit', []).append((callback, args))
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_after_commit(session):
+    if session.in_nested_transaction():
+        return  # a SAVEPOINT was released, nothing is committed yet
+    if session.info.get('has_writes'):
+        session.info['committed_writes'] = True
+    for callback, args in session.info.pop('after_commit', []):
+        callback(*args)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_after_commit(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('after_commit', None)
+        session.info.pop('has_writes', None)
+
+
+def _has_writes(entry) -> bool:
+    """Request session entry with flushed or pending writes in its open transaction"""
+    if entry is None:
+        return False
+    db = entry[0]
+    return bool(db.info.get('has_writes') or db.new or db.dirty or db.deleted)
+
+
+def _request_sessions():
+    """
+    Sessions bound to the current Flask request (None outside a request).
+
+    Maps 'primary'/'replica' -> [session, depth]. depth counts the get_db_session
+    blocks currently using the session so only the outermost one commits.
+    """
+    try:
+        from flask import g, has_request_context
+    except ImportError:
+        return None
+    if not has_request_context():
+        return None
+    if '_db_sessions' not in g:
+        g._db_sessions = {}
+    return g._db_sessions
+
+
+def close_request_sessions(exception=None):
+    """teardown_appcontext hook: release every session the request opened"""
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT version()"))
-            print("DB Version:", result.fetchone())
-    except Exception as e:
-        print("SQLAlchemy DB connection failed:", e)
+        from flask import g
+        sessions = g.pop('_db_sessions', None)
+    except RuntimeError:
+        return
+    for db, _depth in (sessions or {}).values():
+        try:
+            if exception is not None:
+                db.rollback()
+        finally:
+            db.close()
+
+
+def init_app(app):
+    app.teardown_appcontext(close_request_sessions)
+
 
 @contextmanager #set up/tear down resources automatically (used with the "with" statement in our routes)
-def get_db_session():
-    db = SessionLocal()
+def get_db_session(readonly=False, user_id=None, nested=False):
+    """
+    readonly=True routes the session to the replica engine (when configured) unless
+    the user recently wrote and is pinned to the primary. Readonly sessions are
+    never committed, unless a write block ran inside one on the same session; its
+    writes are committed rather than silently rolled back.
+
+    Inside a request the session is request-scoped: blocks opened while another
+    block is active (helpers called from routes) reuse the same session, so one
+    request checks out one pooled connection. Only the outermost block commits or
+    rolls back; an inner block just flushes on success and leaves an error to its
+    caller. nested=True wraps an inner block in a SAVEPOINT so its failure is
+    rolled back on its own without touching the caller's writes.
+
+    Readonly blocks go to the replica even while a primary session is open, unless
+    that session holds writes this request hasn't committed yet.
+
+    Side effects that depend on the commit are registered with after_commit().
+    """
+    if readonly and user_id is None:
+        user_id = _current_user_id()
+    use_replica = readonly and replica_engine is not engine and not is_pinned_to_primary(user_id)
+    key = 'replica' if use_replica else 'primary'
+
+    scope = _request_sessions()
+    entry = None
+    if scope is not None:
+        entry = scope.get('primary')
+        if use_replica and not _has_writes(entry):
+            # A primary session that only read (e.g. the token revocation sync)
+            # doesn't need to serve this block; one holding writes does, so they're visible
+            entry = scope.get('replica')
+
+    if entry is not None and entry[1] > 0:
+        db = entry[0]
+        entry[1] += 1
+        if not readonly:
+            db.info['write_blocks'] = True  # a readonly outermost block must commit, not roll back
+        try:
+            if nested:
+                pending = len(db.info.get('after_commit', ()))
+                try:
+                    with db.begin_nested():
+                        yield db
+                except Exception:
+                    # Callbacks for the writes the SAVEPOINT just undid
+                    del db.info.get('after_commit', [])[pending:]
+                    raise
+            else:
+                yield db
+                if not readonly:
+                    # The outermost block owns the transaction: commit/rollback is its call
+                    db.flush()
+        finally:
+            entry[1] -= 1
+        return
+
+    if entry is not None:
+        db = entry[0]  # request session left over from an earlier, finished block
+    else:
+        db = ReplicaSessionLocal() if use_replica else SessionLocal()
+        if scope is not None:
+            entry = scope.setdefault(key, [db, 0])
+    if entry is not None:
+        entry[1] += 1
     try:
-        yield db 
-        db.commit() 
+        yield db
+        if readonly and not db.info.get('write_blocks'):
+            db.rollback()
+        else:
+            db.commit()
     except Exception:
         db.rollback()
         raise
     finally:
-        db.close()
\ No newline at end of file
+        if entry is not None:
+            entry[1] -= 1
+        db.info.pop('write_blocks', None)
+        db.info.pop('has_writes', None)
+        if db.info.pop('committed_writes', False):
+            pin_user_to_primary(user_id if user_id is not None else _current_user_id())
+        if scope is None:
+            db.close()  # request sessions are closed by close_request_sessions
+
+
+def _dbapi_connection(db):
+    return db.connection().connection.dbapi_connection
+
+
+@contextmanager
+def pipeline(db):
+    """
+    psycopg 3 pipeline mode on the session's connection: statements issued inside
+    are sent without waiting for each result. A no-op with psycopg2 / SQLite.
+
+    Meant for runs of Core statements whose results aren't read until the end.
+    (psycopg 3 already pipelines executemany(), e.g. the ORM's batched UPDATEs.)
+    """
+    dbapi_connection = _dbapi_connection(db)
+    if not hasattr(dbapi_connection, 'pipeline'):
+        yield db
+        return
+    with dbapi_connection.pipeline():
+        yield db
+
+
+_TYPE_MODIFIERS = re.compile(r'\(.*?\)')
+
+
+def _csv_field(value) -> str:
+    # CSV COPY reads a bare empty field as NULL and a quoted one as an empty string
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class _LineReader(io.TextIOBase):
+    """Read-only file over an iterator of lines: copy_expert pulls it a block at a time"""
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+        self._buffer = ''
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            parts.append(line)
+            length += len(line)
+        data = ''.join(parts)
+        if size < 0:
+            size = len(data)
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def copy_rows(db, source_table, columns: Sequence[str], rows: Iterable[Sequence], target: Optional[str] = None) -> int:
+    """
+    Bulk load rows (tuples in `columns` order) with COPY on the session's connection.
+
+    psycopg 3 uses binary COPY (column types taken from source_table), psycopg2 CSV
+    COPY; other dialects (SQLite in tests) fall back to an executemany INSERT.
+    target loads into another table with the same columns, e.g. a temp staging table.
+    """
+    target = target or source_table.name
+    if db.get_bind().dialect.name != 'postgresql':
+        rows = [dict(zip(columns, row)) for row in rows]
+        if rows:
+            db.execute(insert(table(target, *(column(name, source_table.c[name].type) for name in columns))), rows)
+        return len(rows)
+
+    column_list = ', '.join(columns)
+    cursor = _dbapi_connection(db).cursor()
+    try:
+        if hasattr(cursor, 'copy'):  # psycopg 3
+            types = [_TYPE_MODIFIERS.sub('', source_table.c[name].type.compile(dialect=postgresql.dialect())).lower()
+                     for name in columns]
+            # Binary numeric only takes Decimal
+            numeric = [i for i, name in enumerate(types) if name == 'numeric']
+            count = 0
+            with cursor.copy(f"COPY {target} ({column_list}) FROM STDIN (FORMAT BINARY)") as copy:
+                copy.set_types(types)
+                for row in rows:
+                    if numeric:
+                        row = list(row)
+                        for i in numeric:
+                            if isinstance(row[i], float):
+                                row[i] = Decimal(str(row[i]))
+                    copy.write_row(row)
+                    count += 1
+            return count
+        lines = (','.join(_csv_field(value) for value in row) + '\n' for row in rows)
+        cursor.copy_expert(f"COPY {target} ({column_list}) FROM STDIN WITH (FORMAT CSV)", _LineReader(lines))
+        return cursor.rowcount
+    finally:
+        cursor.close()
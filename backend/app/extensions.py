@@ -1 +0,0 @@
-blacklist = set()
\ No newline at end of file
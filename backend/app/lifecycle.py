@@ -0,0 +1,113 @@
+"""
+Startup Lifecycle + Health Probes
+
+Worker boot does no network I/O: the database is first touched by the first
+request, the readiness probe or the optional pool warm-up, so a cold start on an
+autoscaled instance is import time only.
+
+Features:
+- Liveness (/healthz): the process is serving, no dependencies checked
+- Readiness (/readyz): SELECT 1 against the primary (and replica when configured),
+  cached for READINESS_CACHE_SECONDS so frequent probes don't load the database
+- Optional background warm-up (DB_POOL_WARMUP connections per engine) so the
+  first requests after a deploy don't pay the TLS + auth handshakes; with
+  DB_PREPARED_STATEMENTS the hot queries are also prepared on each of them
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from . import database, prepared
+from .metrics import registry
+
+
+READINESS_CACHE_SECONDS = float(os.getenv('READINESS_CACHE_SECONDS', 5))
+DB_POOL_WARMUP = int(os.getenv('DB_POOL_WARMUP', 0))
+
+READINESS_CHECKS = registry.counter(
+    'readiness_checks_total', 'Database readiness checks actually run (not served from cache)', ['result'])
+POOL_WARMUP_SECONDS = registry.gauge(
+    'db_pool_warmup_seconds', 'Time the last pool warm-up took', ['engine'])
+
+
+def _engines() -> Dict[str, object]:
+    # Looked up at call time: tests repoint the engines after import
+    engines = {'primary': database.engine}
+    if database.replica_engine is not database.engine:
+        engines['replica'] = database.replica_engine
+    return engines
+
+
+class ReadinessCheck:
+    """Runs the database check at most once per ttl; concurrent probes share the result"""
+
+    def __init__(self, ttl: float = READINESS_CACHE_SECONDS):
+        self.ttl = ttl
+        self._result: Optional[Tuple[bool, Dict[str, str]]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _run(self) -> Tuple[bool, Dict[str, str]]:
+        checks = {}
+        for name, engine in _engines().items():
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                checks[name] = 'ok'
+            except Exception as e:
+                checks[name] = f"unavailable: {type(e).__name__}"
+        ready = all(status == 'ok' for status in checks.values())
+        READINESS_CHECKS.inc(result='ready' if ready else 'unavailable')
+        return ready, checks
+
+    def __call__(self) -> Tuple[bool, Dict[str, str]]:
+        if self._result is not None and time.monotonic() - self._checked_at < self.ttl:
+            return self._result
+        with self._lock:
+            if self._result is None or time.monotonic() - self._checked_at >= self.ttl:
+                self._result = self._run()
+                self._checked_at = time.monotonic()
+            return self._result
+
+    def reset(self) -> None:
+        self._result = None
+
+
+readiness = ReadinessCheck()
+
+
+def warm_pool(engine, connections: int) -> int:
+    """Open up to `connections` pooled connections, prepare hot queries on them, hand them back"""
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            opened.append(conn)
+            conn.execute(text("SELECT 1"))
+            prepared.warm_connection(conn)
+    finally:
+        for conn in opened:
+            conn.close()
+    return len(opened)
+
+
+def _warm_up(app, connections: int) -> None:
+    for name, engine in _engines().items():
+        start = time.perf_counter()
+        try:
+            opened = warm_pool(engine, connections)
+            POOL_WARMUP_SECONDS.set(time.perf_counter() - start, engine=name)
+            app.logger.info(f"Warmed {opened} {name} database connections")
+        except Exception as e:
+            app.logger.warning(f"Database pool warm-up failed ({name}): {str(e)}")
+
+
+def init_app(app, connections: int = DB_POOL_WARMUP) -> None:
+    if connections <= 0:
+        return
+    from . import socketio
+    socketio.start_background_task(_warm_up, app, connections)
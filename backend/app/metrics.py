@@ -0,0 +1,187 @@
+"""
+Metrics Module
+
+Small in-process metrics registry used to expose operational numbers
+(connection pool usage, request timings, ...) in Prometheus text format.
+
+Features:
+- Counters, gauges and histograms with optional label sets
+- Thread/greenlet safe updates
+- Prometheus text exposition via render_prometheus()
+
+We intentionally avoid pulling in prometheus_client: the surface we need is tiny
+and every gunicorn worker exposes its own numbers on /metrics.
+"""
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(label_names: Sequence[str], labels: Dict[str, str]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, '')) for name in label_names)
+
+
+def _format_labels(label_names: Sequence[str], key: Tuple[str, ...], extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(zip(label_names, key))
+    if extra:
+        pairs.extend(extra.items())
+    if not pairs:
+        return ''
+    body = ','.join(f'{name}="{value}"' for name, value in pairs)
+    return '{' + body + '}'
+
+
+class _Metric:
+    type_name = 'untyped'
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} {self.type_name}',
+        ]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+    type_name = 'counter'
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        super().__init__(name, description, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(self.label_names, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.label_names, labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f'{self.name}{_format_labels(self.label_names, key)} {value}')
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    type_name = 'gauge'
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        super().__init__(name, description, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = _label_key(self.label_names, labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.label_names, labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f'{self.name}{_format_labels(self.label_names, key)} {value}')
+        return lines
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values (e.g. latencies in seconds)"""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(self.label_names, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels) -> float:
+        state = self._values.get(_label_key(self.label_names, labels))
+        return state[-1] if state else 0.0
+
+    def sum(self, **labels) -> float:
+        state = self._values.get(_label_key(self.label_names, labels))
+        return state[-2] if state else 0.0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, state in self._values.items():
+                for i, bound in enumerate(self.buckets):
+                    lines.append(f'{self.name}_bucket{_format_labels(self.label_names, key, {"le": str(bound)})} {state[i]}')
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, key, {"le": "+Inf"})} {state[-1]}')
+                lines.append(f'{self.name}_sum{_format_labels(self.label_names, key)} {state[-2]}')
+                lines.append(f'{self.name}_count{_format_labels(self.label_names, key)} {state[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric of the process, keyed by name"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, description: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, description, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.type_name}")
+            return metric
+
+    def counter(self, name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, description, label_names=label_names)
+
+    def gauge(self, name: str, description: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, description, label_names=label_names)
+
+    def histogram(self, name: str, description: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, description, label_names=label_names, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry used by the rest of the app
+registry = MetricsRegistry()
+
+
+def render_prometheus() -> str:
+    """Render all registered metrics in Prometheus text exposition format"""
+    return registry.render_prometheus()
@@ -1,5 +1,5 @@
 from .database import Base
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, Boolean, Numeric, Date
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, Boolean, Numeric, Date, Index, Sequence, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -31,6 +31,9 @@ class User(Base):
     plaid_access_token = Column(String, nullable=True)
     plaid_item_id = Column(String, nullable=True)  # Store Plaid item ID for webhook matching
 
+    # Last "New Conversation N" number handed out (incremented with UPDATE ... RETURNING)
+    conversation_counter = Column(Integer, nullable=False, default=0, server_default="0")
+
     conversations = relationship("Conversations", back_populates="user", cascade="all, delete-orphan") #for each user, access all conversations as a list
     transactions = relationship("Transaction", back_populates="user", cascade="all, delete-orphan")
 
@@ -44,18 +47,29 @@ class Conversations(Base):
     relationship() used --> SQLAlchemy uses FK to understand table with FK (messages) is the "many" table, table being referenced (conversations) is the "one" side
     """
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Conversation list: newest-first keyset pagination per user
+        Index("ix_conversations_user_id_last_modified", "user_id", "last_modified"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_modified = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
     title = Column(String, nullable=True)
+    # Rolling summary of turns dropped from the prompt (see chat/context_window.py)
+    summary = Column(Text, nullable=True)
+    summary_message_id = Column(Integer, nullable=True)  # last message folded into summary
 
     messages = relationship("Messages", back_populates="conversation", cascade="all, delete-orphan")
     user = relationship("User", back_populates="conversations")
 
 class Messages(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Message history: newest-first keyset pagination per conversation
+        Index("ix_messages_convo_id_created_at", "convo_id", "created_at"),
+    )
 
     # id, convo_id (FK to conversations), sender, content, created_at, metadata
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -69,14 +83,55 @@ class Messages(Base):
     user = relationship("User")
 
 
+
+class RevokedToken(Base):
+    """
+    JWTs revoked before their expiry (logout), see auth/revocation.py. Rows are
+    purged once expires_at passes. No FK to users: a revocation must outlive
+    whatever happens to the account.
+    """
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)
+    user_id = Column(Integer, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+
+
+class LLMUsageDaily(Base):
+    """
+    Model usage per user per day (UTC), incremented after every chat model call
+    with an upsert. Backs the daily quota (LLM_DAILY_TOKEN_QUOTA) and cost reports.
+    """
+    __tablename__ = "llm_usage_daily"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    requests = Column(Integer, nullable=False, default=0, server_default="0")
+    prompt_tokens = Column(Integer, nullable=False, default=0, server_default="0")
+    completion_tokens = Column(Integer, nullable=False, default=0, server_default="0")
+    cost_usd = Column(Numeric(12, 6), nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 #need new transactions table in our app. 
 
 class Transaction(Base):
+    """
+    Range-partitioned by month on date_posted in Postgres (see app/partitions.py).
+
+    The primary key has to include the partition key, so it is (id, date_posted).
+    Global plaid_transaction_id uniqueness is enforced through TransactionKey.
+    """
     __tablename__ = "transactions"
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    __table_args__ = (
+        Index("ix_transactions_user_id_date_posted", "user_id", "date_posted"),
+        {"postgresql_partition_by": "RANGE (date_posted)"},
+    )
+    id = Column(Integer, Sequence("transactions_id_seq"), primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
-    plaid_transaction_id = Column(String, unique=True, nullable=False)
-    date_posted = Column(Date, nullable=False)
+    plaid_transaction_id = Column(String, index=True, nullable=False)
+    date_posted = Column(Date, primary_key=True, nullable=False)
     name = Column(String, nullable=False)
     amount = Column(Numeric(10, 2), nullable=False)
     type = Column(String, nullable=False)  # 'expense' or 'income'
@@ -91,6 +146,26 @@ class Transaction(Base):
     user = relationship("User", back_populates="transactions") 
 
 
+class TransactionKey(Base):
+    """
+    One row per Plaid transaction id across all partitions (maintained by trigger).
+    Also tells us which partition a Plaid id lives in.
+    """
+    __tablename__ = "transaction_keys"
+
+    plaid_transaction_id = Column(String, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    date_posted = Column(Date, nullable=False)
+
+
+@event.listens_for(Transaction.__table__, "after_create")
+def _install_transaction_partitioning(target, connection, **kw):
+    if connection.dialect.name == "postgresql":
+        from .partitions import install_partitioning_ddl, ensure_transaction_partitions
+        install_partitioning_ddl(connection)
+        ensure_transaction_partitions(connection)
+
+
 class Waitlist(Base):
     __tablename__ = "waitlist"
     
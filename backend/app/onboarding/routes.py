@@ -2,7 +2,9 @@
 import json
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..database import get_db_session
+from ..cache import invalidate_user
+from ..user_snapshot import get_user_snapshot
+from ..database import after_commit, get_db_session
 from ..models import User
 
 onboarding_bp = Blueprint('onboarding', __name__, url_prefix='/onboarding')
@@ -59,7 +61,7 @@ def trigger_onboarding_completion_check(user_id):
     This is called whenever financial data is updated.
     """
     try:
-        with get_db_session() as db:
+        with get_db_session(nested=True) as db:
             user = db.query(User).get(user_id)
             if not user:
                 return False, "User not found"
@@ -85,7 +87,8 @@ def trigger_onboarding_completion_check(user_id):
                 # Mark onboarding as completed
                 user.onboarding_completed = True
                 user.onboarding_step = 6
-                db.commit()
+                db.flush()  # savepoint only; the outermost get_db_session block commits
+                after_commit(db, invalidate_user, user_id)
                 
                 current_app.logger.info(f"Onboarding completed via webhook for user {user_id}")
                 return True, "Onboarding completed successfully"
@@ -102,26 +105,25 @@ def get_onboarding_status():
     try: 
         user_id = get_jwt_identity()
 
-        with get_db_session() as db:
-            user = db.query(User).get(user_id)
-            if not user:
-                return jsonify({"error": "User not found"}), 404
-            
-            return jsonify({
-                "onboarding_completed": user.onboarding_completed,
-                "current_step": user.onboarding_step,
-                "user_data": {
-                    "name": user.name,
-                    "age": user.age,
-                    "is_student": user.is_student,
-                    "college_name": user.college_name,
-                    "financial_goals": json.loads(user.financial_goals) if user.financial_goals else [],
-                    "salary_monthly": user.salary_monthly,
-                    "monthly_spending_goal": user.monthly_spending_goal,
-                    "total_balance": user.total_balance,
-                    "bank_connected": user.plaid_access_token is not None
-                }
-            }), 200
+        user = get_user_snapshot(user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+
+        return jsonify({
+            "onboarding_completed": user.onboarding_completed,
+            "current_step": user.onboarding_step,
+            "user_data": {
+                "name": user.name,
+                "age": user.age,
+                "is_student": user.is_student,
+                "college_name": user.college_name,
+                "financial_goals": user.financial_goals,
+                "salary_monthly": user.salary_monthly,
+                "monthly_spending_goal": user.monthly_spending_goal,
+                "total_balance": user.total_balance,
+                "bank_connected": user.bank_connected
+            }
+        }), 200
 
     except Exception as e:
         current_app.logger.error(f"Get onboarding status error: {str(e)}")
@@ -207,6 +209,7 @@ def update_onboarding_step(step):
             if step > user.onboarding_step:
                 user.onboarding_step = step
                 
+            after_commit(db, invalidate_user, user_id)
             db.commit()
             
             # Return response with completion status
@@ -267,6 +270,7 @@ def complete_onboarding():
             if required_fields_complete and not user.onboarding_completed:
                 user.onboarding_completed = True
                 user.onboarding_step = 6
+                after_commit(db, invalidate_user, user_id)
                 db.commit()
                 
             return jsonify({
@@ -308,6 +312,7 @@ def reset_onboarding():
             # user.total_balance = 0
             # user.plaid_access_token = None
             
+            after_commit(db, invalidate_user, user_id)
             db.commit()
             
             return jsonify({
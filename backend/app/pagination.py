@@ -0,0 +1,64 @@
+"""
+Cursor (Keyset) Pagination
+
+Newest-first paging on a (timestamp, id) pair. Unlike OFFSET, each page is a
+single index range scan no matter how deep the user scrolls, and rows inserted
+while paging don't shift the next page.
+
+Features:
+- Opaque URL-safe cursors encoding the last row's (timestamp, id)
+- Keyset predicate + ordering helpers for SQLAlchemy queries
+- limit parsing with defaults/caps shared by list endpoints
+"""
+
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    """Cursor could not be decoded (tampered with or from another endpoint)"""
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded.encode()).decode().rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def parse_limit(value: Optional[str], default: int, maximum: int) -> int:
+    try:
+        limit = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def newest_first(query, timestamp_column, id_column, cursor: Optional[str], limit: int):
+    """
+    Apply keyset filter + ordering and fetch one page (limit + 1 rows to detect a
+    next page). Returns (rows, next_cursor).
+    """
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            timestamp_column < timestamp,
+            and_(timestamp_column == timestamp, id_column < row_id),
+        ))
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
@@ -0,0 +1,176 @@
+"""
+Transaction Partition Management
+
+The transactions table is range-partitioned by month on date_posted (Postgres
+declarative partitioning). Nearly every query is "this user, last 30/90 days", so
+filtering on date ranges lets the planner prune to the 1-3 relevant partitions.
+
+Features:
+- Monthly partition naming/bounds helpers shared by routes and migrations
+- Creation of upcoming partitions ahead of time (manage_partitions.py, daily from
+  cron), moving rows out of the DEFAULT partition; request paths never run DDL and
+  rows for a month without a partition land in the DEFAULT partition
+- Retention hook that detaches old partitions and hands them to an archiver
+- Global plaid_transaction_id uniqueness through the transaction_keys table,
+  maintained by a trigger (partitioned tables can only enforce uniqueness that
+  includes the partition key)
+"""
+
+from datetime import date
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import text
+
+
+PARENT_TABLE = 'transactions'
+DEFAULT_PARTITION = 'transactions_default'
+MONTHS_AHEAD = 3
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + (day.month - 1) + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def month_bounds(day: date) -> Tuple[date, date]:
+    """[start, end) of the month containing day - use instead of extract('month') filters"""
+    start = month_start(day)
+    return start, add_months(start, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_y{month.year}m{month.month:02d}"
+
+
+# Trigger keeping transaction_keys in sync with the partitioned table
+KEYS_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION transactions_maintain_keys() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO transaction_keys (plaid_transaction_id, user_id, date_posted)
+        VALUES (NEW.plaid_transaction_id, NEW.user_id, NEW.date_posted);
+        RETURN NEW;
+    ELSIF TG_OP = 'UPDATE' THEN
+        IF NEW.plaid_transaction_id IS DISTINCT FROM OLD.plaid_transaction_id
+           OR NEW.date_posted IS DISTINCT FROM OLD.date_posted THEN
+            UPDATE transaction_keys
+               SET plaid_transaction_id = NEW.plaid_transaction_id,
+                   date_posted = NEW.date_posted
+             WHERE plaid_transaction_id = OLD.plaid_transaction_id;
+        END IF;
+        RETURN NEW;
+    ELSE
+        DELETE FROM transaction_keys WHERE plaid_transaction_id = OLD.plaid_transaction_id;
+        RETURN OLD;
+    END IF;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+KEYS_TRIGGER = """
+CREATE TRIGGER transactions_maintain_keys
+AFTER INSERT OR UPDATE OR DELETE ON transactions
+FOR EACH ROW EXECUTE FUNCTION transactions_maintain_keys()
+"""
+
+
+def install_partitioning_ddl(conn) -> None:
+    """Trigger, id sequence default and DEFAULT partition for a freshly created table"""
+    conn.execute(text("CREATE SEQUENCE IF NOT EXISTS transactions_id_seq"))
+    conn.execute(text("ALTER TABLE transactions ALTER COLUMN id SET DEFAULT nextval('transactions_id_seq')"))
+    conn.execute(text(KEYS_TRIGGER_FUNCTION))
+    conn.execute(text("DROP TRIGGER IF EXISTS transactions_maintain_keys ON transactions"))
+    conn.execute(text(KEYS_TRIGGER))
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF transactions DEFAULT"))
+
+
+def existing_partitions(conn) -> List[str]:
+    rows = conn.execute(text("""
+        SELECT child.relname
+          FROM pg_inherits
+          JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+          JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+         WHERE parent.relname = :parent
+    """), {"parent": PARENT_TABLE}).fetchall()
+    return [row[0] for row in rows]
+
+
+def create_month_partition(conn, month: date) -> bool:
+    """
+    Create the partition for month if missing. Rows that already landed in the
+    DEFAULT partition for that range are moved into it. Returns True if created.
+    """
+    name = partition_name(month)
+    if name in existing_partitions(conn):
+        return False
+
+    start, end = month_bounds(month)
+    params = {"start": start, "end": end}
+    # Attaching fails if the DEFAULT partition holds rows of the new range, so move them first
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)"))
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+             WHERE date_posted >= :start AND date_posted < :end
+         RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), params)
+    conn.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+    # Deleting from the DEFAULT partition fired the key trigger; restore keys for moved rows
+    conn.execute(text(f"""
+        INSERT INTO transaction_keys (plaid_transaction_id, user_id, date_posted)
+        SELECT plaid_transaction_id, user_id, date_posted FROM {name}
+        ON CONFLICT (plaid_transaction_id) DO NOTHING
+    """))
+    return True
+
+
+def ensure_transaction_partitions(conn, months_ahead: int = MONTHS_AHEAD, since: Optional[date] = None,
+                                  today: Optional[date] = None) -> List[str]:
+    """Create monthly partitions from since (default: this month) through months_ahead"""
+    today = today or date.today()
+    month = month_start(since or today)
+    last = add_months(month_start(today), months_ahead)
+    created = []
+    while month <= last:
+        if create_month_partition(conn, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def archive_transaction_partitions(conn, retain_months: int,
+                                   archiver: Optional[Callable] = None,
+                                   today: Optional[date] = None) -> List[str]:
+    """
+    Detach partitions entirely older than the retention window.
+
+    archiver(conn, table_name, month) receives each detached table (e.g. to copy
+    it to cold storage) and owns it afterwards; without an archiver the table is
+    dropped. Their plaid ids are released from transaction_keys either way.
+    """
+    cutoff = add_months(month_start(today or date.today()), -retain_months)
+    archived = []
+    for name in sorted(existing_partitions(conn)):
+        if name == DEFAULT_PARTITION:
+            continue
+        month = date(int(name[-7:-3]), int(name[-2:]), 1)
+        if add_months(month, 1) > cutoff:
+            continue
+        start, end = month_bounds(month)
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        conn.execute(text(
+            "DELETE FROM transaction_keys WHERE date_posted >= :start AND date_posted < :end"),
+            {"start": start, "end": end})
+        if archiver is not None:
+            archiver(conn, name, month)
+        else:
+            conn.execute(text(f"DROP TABLE {name}"))
+        archived.append(name)
+    return archived
@@ -0,0 +1,41 @@
+"""
+Plaid API Client
+
+The plaid SDK is large (hundreds of generated model modules), so it's imported
+when the first Plaid call is made instead of when the app boots. Routes build
+request models with the plaid.model imports inside their own bodies.
+
+Features:
+- Lazily created, shared PlaidApi client (PLAID_ENV selects production or sandbox)
+- Credentials from PLAID_CLIENT_ID / PLAID_SECRET
+"""
+
+import os
+import threading
+
+
+PLAID_ENV = os.getenv('PLAID_ENV', 'sandbox').lower()
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_plaid_client():
+    """PlaidApi client built on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import plaid
+                from plaid.api import plaid_api
+
+                configuration = plaid.Configuration(
+                    host=plaid.Environment.Production if PLAID_ENV == 'production' else plaid.Environment.Sandbox,
+                    api_key={
+                        'clientId': os.getenv('PLAID_CLIENT_ID'),
+                        'secret': os.getenv('PLAID_SECRET'),
+                    }
+                )
+                # Plaid SDK handles SSL/TLS itself - no custom configuration needed
+                _client = plaid_api.PlaidApi(plaid.ApiClient(configuration))
+    return _client
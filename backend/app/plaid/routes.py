@@ -1,24 +1,19 @@
 import os
 import ssl
 import sys
-import plaid
-from plaid.api import plaid_api
-from plaid.model.link_token_create_request import LinkTokenCreateRequest
-from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
-from plaid.model.products import Products
-from plaid.model.country_code import CountryCode
-from plaid.model.accounts_balance_get_request import AccountsBalanceGetRequest
-from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
-from plaid.model.transactions_get_request import TransactionsGetRequest
-from plaid.model.webhook_verification_key_get_request import WebhookVerificationKeyGetRequest
+# plaid.model request types are imported inside the routes that use them: the SDK is
+# only loaded once a Plaid call is made (see client.py).
 # Note: For transactions days_requested, we'll pass it as a dict in the request
 
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import get_jwt, jwt_required, get_jwt_identity
 from flask_socketio import SocketIO, emit
 
-from ..database import get_db_session
+from ..cache import invalidate_user
+from ..chat.retrieval import retrieval_index
+from ..database import after_commit, get_db_session, pin_user_to_primary
 from ..models import User, Transaction
+from .client import PLAID_ENV, get_plaid_client
 import json
 from datetime import datetime, date
 import hashlib
@@ -31,31 +26,13 @@ plaid_bp = Blueprint('plaid', __name__, url_prefix='/plaid')
 # Initialize SocketIO (assuming you have it set up in your main app)
 # socketio = SocketIO(cors_allowed_origins="*")
 
-#Set up Plaid API client
-# Use production environment if PLAID_ENV is set to 'production', otherwise use sandbox
-plaid_env = os.getenv('PLAID_ENV', 'sandbox').lower()
-plaid_host = plaid.Environment.Production if plaid_env == 'production' else plaid.Environment.Sandbox
-
-configuration = plaid.Configuration(
-    host=plaid_host,
-    api_key={
-        'clientId': os.getenv('PLAID_CLIENT_ID'), #client id and secret pulled from .env file
-        'secret': os.getenv('PLAID_SECRET'),
-    }
-)
-
-# Note: Plaid SDK handles SSL/TLS automatically - no custom configuration needed
-
-api_client = plaid.ApiClient(configuration) #handle HTTP requests and responses
-client = plaid_api.PlaidApi(api_client) #Call methods on our client.
-
 def check_and_complete_onboarding(user_id):
     """
     Check if all onboarding requirements are met and complete onboarding if so.
     This function acts as our webhook trigger.
     """
     try:
-        with get_db_session() as db:
+        with get_db_session(nested=True) as db:
             user = db.query(User).get(user_id)
             if not user:
                 return False, "User not found"
@@ -81,7 +58,8 @@ def check_and_complete_onboarding(user_id):
                 # Mark onboarding as completed
                 user.onboarding_completed = True
                 user.onboarding_step = 6
-                db.commit()
+                db.flush()  # savepoint only; the outermost get_db_session block commits
+                after_commit(db, invalidate_user, user_id)
             
                 
                 current_app.logger.info(f"Onboarding completed for user {user_id}")
@@ -109,6 +87,7 @@ def verify_plaid_webhook_signature(raw_body, headers):
     Verify that the webhook came from Plaid using signature verification
     """
     try:
+        from plaid.model.webhook_verification_key_get_request import WebhookVerificationKeyGetRequest
         # Get the signature from headers
         plaid_signature = headers.get('Plaid-Webhook-Signature')
         if not plaid_signature:
@@ -118,7 +97,7 @@ def verify_plaid_webhook_signature(raw_body, headers):
         verification_request = WebhookVerificationKeyGetRequest(
             key_id=headers.get('Plaid-Webhook-Key-Id')
         )
-        verification_response = client.webhook_verification_key_get(verification_request)
+        verification_response = get_plaid_client().webhook_verification_key_get(verification_request)
         
         # Verify the signature using the key
         verification_key = verification_response['key']
@@ -140,6 +119,10 @@ def verify_plaid_webhook_signature(raw_body, headers):
 @jwt_required()
 def create_link_token():
     try:
+        from plaid.model.country_code import CountryCode
+        from plaid.model.link_token_create_request import LinkTokenCreateRequest
+        from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
+        from plaid.model.products import Products
         user_id = get_jwt_identity() #get user id from jwt token from frontend
         
         # Log the attempt
@@ -149,7 +132,7 @@ def create_link_token():
         webhook_url = current_app.config.get('PLAID_WEBHOOK_URL', 'http://localhost:5001/plaid/webhook')
         
         # Log configuration details (without sensitive data)
-        current_app.logger.info(f"Plaid environment: {plaid_env}, Webhook URL: {webhook_url}")
+        current_app.logger.info(f"Plaid environment: {PLAID_ENV}, Webhook URL: {webhook_url}")
         
         request_obj = LinkTokenCreateRequest( #make request to plaid api to create link token
             products=[Products('transactions')],
@@ -166,7 +149,7 @@ def create_link_token():
         )
         
         current_app.logger.info("Making Plaid API call to create link token...")
-        response = client.link_token_create(request_obj)
+        response = get_plaid_client().link_token_create(request_obj)
         
         # Log successful response
         current_app.logger.info(f"Plaid link token created successfully for user {user_id}")
@@ -206,9 +189,11 @@ def exchange_public_token():
         return jsonify({"error": "Missing public_token"}), 400
 
     try:
+        from plaid.model.accounts_balance_get_request import AccountsBalanceGetRequest
+        from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
         # Exchange the public_token for an access_token
         exchange_request = ItemPublicTokenExchangeRequest(public_token=public_token)
-        exchange_response = client.item_public_token_exchange(exchange_request)
+        exchange_response = get_plaid_client().item_public_token_exchange(exchange_request)
         access_token = exchange_response['access_token']
         item_id = exchange_response['item_id']  # Capture the item_id, unique identifier for the user's Plaid account
 
@@ -224,7 +209,7 @@ def exchange_public_token():
             # Fetch and update balance immediately
             try:
                 balance_request = AccountsBalanceGetRequest(access_token=access_token)
-                balance_response = client.accounts_balance_get(balance_request)
+                balance_response = get_plaid_client().accounts_balance_get(balance_request)
                 accounts = balance_response['accounts']
                 
                 total_balance = 0
@@ -236,6 +221,7 @@ def exchange_public_token():
                         total_balance += float(bal['current'])
                 
                 user.total_balance = total_balance
+                after_commit(db, invalidate_user, user_id)
                 db.commit()
                 
                 # INITIAL TRANSACTION SYNC: Fetch transactions immediately after connecting
@@ -256,6 +242,7 @@ def exchange_public_token():
                 
             except Exception as balance_error:
                 current_app.logger.error(f"Error fetching balance: {str(balance_error)}")
+                after_commit(db, invalidate_user, user_id)
                 db.commit()  # Still save the access token
                 
                 return jsonify({
@@ -279,8 +266,9 @@ def update_balance():
         return jsonify({"error": "Missing access_token"}), 400
 
     try:
+        from plaid.model.accounts_balance_get_request import AccountsBalanceGetRequest
         request_obj = AccountsBalanceGetRequest(access_token=access_token)
-        response = client.accounts_balance_get(request_obj)
+        response = get_plaid_client().accounts_balance_get(request_obj)
         accounts = response['accounts']
 
         total_balance = 0
@@ -297,6 +285,7 @@ def update_balance():
                 return jsonify({"error": "User not found"}), 404
             
             user.total_balance = total_balance
+            after_commit(db, invalidate_user, user_id)
             db.commit()
             
             # WEBHOOK TRIGGER: Check if onboarding can be completed
@@ -317,6 +306,7 @@ def sync_user_transactions(user_id, access_token):
     Fetch and store transactions from Plaid with automatic gambling detection and intelligent categorization
     """
     try:
+        from plaid.model.transactions_get_request import TransactionsGetRequest
         from datetime import datetime, timedelta
         from ..gambling_detection import get_gambling_detection_details, categorize_gambling_transaction
         from ..transaction_categorization import categorize_transaction
@@ -331,7 +321,7 @@ def sync_user_transactions(user_id, access_token):
             end_date=end_date
         )
         
-        response = client.transactions_get(request_obj) #use client to call Plaid API in right format
+        response = get_plaid_client().transactions_get(request_obj) #use client to call Plaid API in right format
         transactions = response['transactions'] 
         total_transactions = response['total_transactions']
         
@@ -344,11 +334,15 @@ def sync_user_transactions(user_id, access_token):
         
         new_transactions = 0
         updated_transactions = 0
+        updated_existing = []
         gambling_transactions_detected = 0
         
-        with get_db_session() as db:
+        # Savepoint when called from a route that already holds the request session
+        with get_db_session(nested=True) as db:
             # Get user's existing transactions for recurring detection
             existing_user_transactions = db.query(Transaction).filter_by(user_id=user_id).all()
+            # Index by Plaid id so the loop below doesn't issue one SELECT per transaction
+            existing_by_plaid_id = {tx.plaid_transaction_id: tx for tx in existing_user_transactions}
             user_transactions_for_categorization = []
             for tx in existing_user_transactions:
                 user_transactions_for_categorization.append({
@@ -359,9 +353,7 @@ def sync_user_transactions(user_id, access_token):
             
             for plaid_transaction in transactions: #**BUG** Batching or Celery to reduce load times. Syncing 1000+ transactions at once.
                 # Check if transaction already exists
-                existing = db.query(Transaction).filter_by(
-                    plaid_transaction_id=plaid_transaction['transaction_id']
-                ).first()
+                existing = existing_by_plaid_id.get(plaid_transaction['transaction_id'])
                 
                 if not existing:
                     # Create new transaction with gambling detection and intelligent categorization
@@ -431,8 +423,15 @@ def sync_user_transactions(user_id, access_token):
                             current_app.logger.info(f"Updated existing transaction: {plaid_transaction['name']} -> {new_category} (recurring: {new_is_recurring})")
                     
                     updated_transactions += 1
+                    updated_existing.append(existing)
             
-            db.commit()
+            # Re-embed changed rows while they're loaded (new rows are picked up by the
+            # index watermark on the next chat lookup)
+            retrieval_index.sync_transactions(user_id, updated_existing)
+            db.flush()  # savepoint only; the outermost get_db_session block commits
+            # Webhook-triggered syncs have no JWT, so pin explicitly for read-your-writes
+            after_commit(db, pin_user_to_primary, user_id)
+            after_commit(db, invalidate_user, user_id)  # cached chat context was built from the old transactions
             current_app.logger.info(f"Transaction sync completed for user {user_id}: {new_transactions} new, {updated_transactions} updated, {gambling_transactions_detected} gambling transactions detected")
             
     except Exception as e:
@@ -452,10 +451,11 @@ def handle_transactions_webhook(webhook_data):
         if not user:
             current_app.logger.error(f"No user found for item_id: {item_id}")
             return
+        user_id, access_token = user.id, user.plaid_access_token
     
     if webhook_code in ['INITIAL_UPDATE', 'HISTORICAL_UPDATE', 'DEFAULT_UPDATE']:
         # Sync transactions for this user
-        sync_user_transactions(user.id, user.plaid_access_token)
+        sync_user_transactions(user_id, access_token)
     # elif webhook_code == 'TRANSACTIONS_REMOVED':
     #     # Handle removed transactions
     #     removed_transactions = webhook_data.get('removed_transactions', [])
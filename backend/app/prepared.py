@@ -0,0 +1,184 @@
+"""
+Server-side Prepared Statements for Hot Queries
+
+A handful of statements dominate traffic (user snapshot by id, this month's
+income for a user, a user's first page of conversations). Postgres plans every
+one of them from scratch on each execution; a prepared statement is planned
+once per connection and then reuses its plan.
+
+Call sites tag a query with prepare_as(query, name). On a Postgres engine with
+DB_PREPARED_STATEMENTS enabled, the statement SQLAlchemy renders is PREPAREd on
+the connection the first time it runs there and executed with EXECUTE after
+that; untagged statements are untouched.
+
+Features:
+- Per-connection bookkeeping in the pool's connection info (cleared when a
+  connection is invalidated), so a reconnect simply prepares again
+- Statements seen by this worker are prepared on every new pooled connection
+  as it connects; warm_connection() also runs the registered warm-up queries so
+  pre-opened connections start with the hot plans in place
+- Variants of a tagged query (e.g. with a pagination cursor) get their own
+  statement, keyed by a hash of the SQL
+- planning_time() measures what a prepared execution saves (see
+  bench_prepared_statements.py)
+
+Off by default: SQL-level PREPARE doesn't survive transaction-mode poolers
+(PgBouncer / the Neon -pooler endpoint), so only enable it on direct connections.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import weakref
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .metrics import registry
+
+
+PREPARED_OPTION = 'prepared_statement'
+
+PREPARED_STATEMENTS = registry.counter(
+    'db_prepared_statements_total', 'Prepared statement activity', ['statement', 'event'])
+
+_PYFORMAT = re.compile(r'%\((\w+)\)s')
+
+# name -> (PREPARE body with $n placeholders, pyformat parameter names in $n order)
+_statements: Dict[str, Tuple[str, List[str]]] = {}
+# statement text -> name (avoids re-hashing on every execution)
+_names: Dict[str, str] = {}
+_statements_lock = threading.Lock()
+_warmups: List[Callable[[Session], None]] = []
+_enabled_engines = weakref.WeakSet()
+
+
+def prepare_as(query, name: str):
+    """Tag a Query / Select so it runs as a prepared statement where enabled"""
+    return query.execution_options(**{PREPARED_OPTION: name})
+
+
+def warmup(fn: Callable[[Session], None]) -> Callable[[Session], None]:
+    """Register fn(session, user_id=0) that runs a tagged hot query; warm-up calls it for no real user"""
+    _warmups.append(fn)
+    return fn
+
+
+def to_positional(statement: str) -> Tuple[str, List[str]]:
+    """psycopg2 pyformat SQL -> ($n SQL for PREPARE, parameter names in $n order)"""
+    order: List[str] = []
+
+    def placeholder(match):
+        name = match.group(1)
+        if name not in order:
+            order.append(name)
+        return f"${order.index(name) + 1}"
+
+    return _PYFORMAT.sub(placeholder, statement).replace('%%', '%'), order
+
+
+def _statement_for(tag: str, statement: str) -> str:
+    name = _names.get(statement)
+    if name is None:
+        digest = hashlib.blake2b(statement.encode(), digest_size=4).hexdigest()
+        name = f"{tag}_{digest}"
+        with _statements_lock:
+            _statements[name] = to_positional(statement)
+            _names[statement] = name
+    return name
+
+
+def _execute_sql(name: str, params: List[str]) -> str:
+    if not params:
+        return f"EXECUTE {name}"
+    return f"EXECUTE {name}({', '.join(f'%({param})s' for param in params)})"
+
+
+def _prepare(cursor, name: str) -> None:
+    cursor.execute(f"PREPARE {name} AS {_statements[name][0]}")
+    PREPARED_STATEMENTS.inc(statement=name, event='prepared')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    tag = context.execution_options.get(PREPARED_OPTION) if context is not None else None
+    if tag is None or executemany or not isinstance(parameters, dict):
+        return statement, parameters
+    name = _statement_for(tag, statement)
+    prepared = conn.connection.info.setdefault('prepared_statements', set())
+    if name not in prepared:
+        # Not transactional: survives a rollback for as long as the connection lives
+        _prepare(cursor, name)
+        prepared.add(name)
+    PREPARED_STATEMENTS.inc(statement=name, event='executed')
+    return _execute_sql(name, _statements[name][1]), parameters
+
+
+def _on_connect(dbapi_connection, connection_record):
+    """New pooled connection: prepare everything this worker has seen so far"""
+    with _statements_lock:
+        names = list(_statements)
+    if not names:
+        return
+    prepared = set()
+    cursor = dbapi_connection.cursor()
+    try:
+        for name in names:
+            try:
+                _prepare(cursor, name)
+                dbapi_connection.commit()
+                prepared.add(name)
+            except Exception:
+                dbapi_connection.rollback()  # left to the lazy path (and its error) on first use
+    finally:
+        cursor.close()
+    connection_record.info['prepared_statements'] = prepared
+
+
+def install(engine) -> None:
+    """Enable prepared hot statements on a Postgres engine"""
+    if engine.dialect.name != 'postgresql':
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute, retval=True)
+    event.listen(engine, 'connect', _on_connect)
+    _enabled_engines.add(engine)
+
+
+def warm_connection(connection) -> int:
+    """Run the registered warm-up queries on a connection (prepares them there)"""
+    if connection.engine not in _enabled_engines:
+        return 0
+    with Session(bind=connection) as session:
+        for fn in _warmups:
+            fn(session)
+        session.rollback()
+    return len(_warmups)
+
+
+def _planning_ms(cursor, sql: str, parameters) -> float:
+    cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", parameters)
+    plan = cursor.fetchone()[0]
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return plan[0]['Planning Time']
+
+
+def planning_time(dbapi_connection, statement: str, parameters: dict, runs: int = 20) -> Tuple[float, float]:
+    """
+    Mean planning time in ms: (plain statement, prepared EXECUTE), over `runs`
+    executions each. Postgres uses custom plans for a prepared statement's first
+    five executions, so keep runs well above that.
+    """
+    body, params = to_positional(statement)
+    name = f"bench_{hashlib.blake2b(statement.encode(), digest_size=4).hexdigest()}"
+    cursor = dbapi_connection.cursor()
+    try:
+        plain = sum(_planning_ms(cursor, statement, parameters) for _ in range(runs)) / runs
+        cursor.execute(f"PREPARE {name} AS {body}")
+        execute = _execute_sql(name, params)
+        prepared = sum(_planning_ms(cursor, execute, parameters) for _ in range(runs)) / runs
+        cursor.execute(f"DEALLOCATE {name}")
+    finally:
+        dbapi_connection.rollback()
+        cursor.close()
+    return plain, prepared
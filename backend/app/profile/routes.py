@@ -1,11 +1,13 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import bcrypt
 import json
 from sqlalchemy.exc import IntegrityError
 
+from ..auth.passwords import password_hasher, PasswordHasherBusy
+from ..cache import invalidate_user
 from ..database import get_db_session
 from ..models import User
+from ..user_snapshot import get_user_snapshot
 
 profile_bp = Blueprint('profile', __name__, url_prefix='/profile')
 
@@ -39,15 +41,20 @@ def update_email():
         if not validate_email(new_email):
             return jsonify({"error": "Invalid email format"}), 400
         
+        with get_db_session() as db:
+            user = db.query(User.password).filter(User.id == user_id).first()
+            if not user:
+                return jsonify({"error": "User not found"}), 404
+
+        # Verify current password (hashing thread pool, no session held)
+        if not password_hasher.verify(current_password, user.password):
+            return jsonify({"error": "Current password is incorrect"}), 401
+
         with get_db_session() as db:
             user = db.query(User).get(user_id)
             if not user:
                 return jsonify({"error": "User not found"}), 404
-                
-            # Verify current password
-            if not bcrypt.checkpw(current_password.encode('utf-8'), user.password.encode('utf-8')):
-                return jsonify({"error": "Current password is incorrect"}), 401
-                
+
             # Check if email is already taken by another user
             existing_user = db.query(User).filter(
                 User.email == new_email, 
@@ -60,12 +67,15 @@ def update_email():
             # Update email
             user.email = new_email
             db.commit()
+            invalidate_user(user_id)
             
             return jsonify({
                 "message": "Email updated successfully",
                 "email": new_email
             }), 200
             
+    except PasswordHasherBusy:
+        raise
     except IntegrityError:
         if 'db' in locals():
             db.rollback()
@@ -97,26 +107,30 @@ def update_password():
             return jsonify({"error": "Password must be at least 6 characters long"}), 400
         
         with get_db_session() as db:
-            user = db.query(User).get(user_id)
+            user = db.query(User.password).filter(User.id == user_id).first()
             if not user:
                 return jsonify({"error": "User not found"}), 404
-                
-            # Verify current password
-            if not bcrypt.checkpw(current_password.encode('utf-8'), user.password.encode('utf-8')):
-                return jsonify({"error": "Current password is incorrect"}), 401
-                
-            # Hash new password
-            salt = bcrypt.gensalt()
-            hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), salt)
-            
-            # Update password
-            user.password = hashed_password.decode('utf-8')
+
+        # Verify current password and hash the new one in the hashing thread pool,
+        # without holding a session
+        if not password_hasher.verify(current_password, user.password):
+            return jsonify({"error": "Current password is incorrect"}), 401
+        hashed_password = password_hasher.hash(new_password)
+
+        with get_db_session() as db:
+            # Update password (unless it was changed concurrently)
+            updated = db.query(User).filter(User.id == user_id, User.password == user.password).update(
+                {"password": hashed_password}, synchronize_session=False)
+            if not updated:
+                return jsonify({"error": "Password was changed, please try again"}), 409
             db.commit()
             
             return jsonify({
                 "message": "Password updated successfully"
             }), 200
             
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         if 'db' in locals():
             db.rollback()
@@ -166,6 +180,7 @@ def update_financial_info():
                     return jsonify({"error": "Financial goals must be a list"}), 400
                     
             db.commit()
+            invalidate_user(user_id)
             
             # Return updated financial info
             try:
@@ -196,34 +211,28 @@ def get_profile_data():
     try:
         user_id = get_jwt_identity()
         
-        with get_db_session() as db:
-            user = db.query(User).get(user_id)
-            if not user:
-                return jsonify({"error": "User not found"}), 404
-                
-            try:
-                financial_goals = json.loads(user.financial_goals) if user.financial_goals not in (None, '', 'null') else []
-            except Exception:
-                financial_goals = []
-                
-            return jsonify({
-                "user_id": user.id,
-                "name": user.name,
-                "username": user.username,
-                "email": user.email,
-                "budget_profile": {
-                    "salary_monthly": user.salary_monthly,
-                    "monthly_spending_goal": user.monthly_spending_goal,
-                    "total_balance": user.total_balance,
-                },
-                "profile_info": {
-                    "age": user.age,
-                    "is_student": user.is_student,
-                    "college_name": user.college_name,
-                    "financial_goals": financial_goals
-                },
-                "has_bank_connection": user.plaid_access_token is not None
-            }), 200
+        user = get_user_snapshot(user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+
+        return jsonify({
+            "user_id": user.id,
+            "name": user.name,
+            "username": user.username,
+            "email": user.email,
+            "budget_profile": {
+                "salary_monthly": user.salary_monthly,
+                "monthly_spending_goal": user.monthly_spending_goal,
+                "total_balance": user.total_balance,
+            },
+            "profile_info": {
+                "age": user.age,
+                "is_student": user.is_student,
+                "college_name": user.college_name,
+                "financial_goals": user.financial_goals
+            },
+            "has_bank_connection": user.bank_connected
+        }), 200
             
     except Exception as e:
         current_app.logger.error(f"Get profile data error: {str(e)}")
@@ -0,0 +1,197 @@
+"""
+SQL Query Instrumentation
+
+Records every statement executed through SQLAlchemy (before/after_cursor_execute)
+and aggregates them per Flask request.
+
+Features:
+- Query count, total DB time and slowest statement per request
+- Server-Timing response header + one structured log line per request
+- N+1 detection by grouping statements by "shape" (literals/IN lists collapsed)
+- Opt-in budget enforcement for tests (QUERY_BUDGET_ENFORCE) that fails requests
+  exceeding a query budget or repeating a statement shape too often
+- Each statement is also recorded as a db.query span on the request trace
+"""
+
+import json
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Optional
+
+from flask import g, has_request_context, request, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .metrics import registry
+from .tracing import record_span
+
+
+QUERIES_PER_REQUEST = registry.histogram(
+    'db_queries_per_request', 'SQL statements issued per request', ['endpoint'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250))
+DB_TIME_PER_REQUEST = registry.histogram(
+    'db_time_per_request_seconds', 'Time spent in SQL per request', ['endpoint'])
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in enforcement mode when a request issues too many statements"""
+
+
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\(\s*(?:\?|%\(\w+\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+))*\s*\)')
+_NUMBERS = re.compile(r'\b\d+\b')
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+
+
+def statement_shape(statement: str) -> str:
+    """Collapse parameters, literals and IN lists so repeated queries group together"""
+    shape = _STRINGS.sub('?', statement)
+    shape = _NUMBERS.sub('?', shape)
+    shape = _IN_LIST.sub('(?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+@dataclass
+class QueryStats:
+    """Per-request aggregate of executed statements"""
+    count: int = 0
+    total_time: float = 0.0
+    slowest_time: float = 0.0
+    slowest_statement: Optional[str] = None
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.total_time += duration
+        self.shapes[statement_shape(statement)] += 1
+        if duration >= self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_statement = statement
+
+    def most_repeated(self):
+        if not self.shapes:
+            return None, 0
+        return self.shapes.most_common(1)[0]
+
+    def check_budget(self, max_queries: Optional[int] = None, max_repeats: Optional[int] = None) -> None:
+        if max_queries is not None and self.count > max_queries:
+            raise QueryBudgetExceeded(f"{self.count} queries issued, budget is {max_queries}")
+        shape, repeats = self.most_repeated()
+        if max_repeats is not None and repeats > max_repeats:
+            raise QueryBudgetExceeded(
+                f"Statement repeated {repeats} times (limit {max_repeats}), likely N+1: {shape}")
+
+
+# Stats collected outside requests (tests using assert_query_budget)
+_active_collectors = []
+
+
+def _current_collectors():
+    collectors = list(_active_collectors)
+    if has_request_context():
+        stats = g.get('_query_stats')
+        if stats is not None:
+            collectors.append(stats)
+    return collectors
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, not the connection: a statement that raises never
+    # reaches after_cursor_execute and must not leave a start time behind
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_start', None)
+    if start is None:
+        return
+    duration = time.perf_counter() - start
+    for stats in _current_collectors():
+        stats.record(statement, duration)
+    record_span('db.query', start, duration, statement=statement_shape(statement)[:200])
+
+
+_installed = False
+
+def install():
+    """Listen on every Engine (primary, replica and any engine created later)"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    _installed = True
+
+
+def query_budget(max_queries: Optional[int] = None, max_repeats: Optional[int] = None):
+    """Per-view budget override used when QUERY_BUDGET_ENFORCE is on"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return view(*args, **kwargs)
+        wrapper._query_budget = (max_queries, max_repeats)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def assert_query_budget(max_queries: Optional[int] = None, max_repeats: Optional[int] = None):
+    """Test helper: fail if the wrapped block exceeds the given budget"""
+    install()
+    stats = QueryStats()
+    _active_collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _active_collectors.remove(stats)
+    stats.check_budget(max_queries, max_repeats)
+
+
+def _start_request():
+    g._query_stats = QueryStats()
+
+
+def _finish_request(response):
+    stats = g.pop('_query_stats', None)
+    if stats is None:
+        return response
+
+    endpoint = request.endpoint or 'unknown'
+    if stats.count:
+        QUERIES_PER_REQUEST.observe(stats.count, endpoint=endpoint)
+        DB_TIME_PER_REQUEST.observe(stats.total_time, endpoint=endpoint)
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats.total_time * 1000:.1f};desc="{stats.count} queries"')
+        shape, repeats = stats.most_repeated()
+        current_app.logger.info(json.dumps({
+            "event": "request_queries",
+            "endpoint": endpoint,
+            "method": request.method,
+            "status": response.status_code,
+            "query_count": stats.count,
+            "db_time_ms": round(stats.total_time * 1000, 2),
+            "slowest_ms": round(stats.slowest_time * 1000, 2),
+            "slowest_statement": _WHITESPACE.sub(' ', stats.slowest_statement or '')[:500],
+            "max_repeats": repeats,
+        }))
+
+    if current_app.config.get('QUERY_BUDGET_ENFORCE'):
+        view = current_app.view_functions.get(request.endpoint)
+        max_queries, max_repeats = getattr(view, '_query_budget', (None, None))
+        stats.check_budget(
+            max_queries if max_queries is not None else current_app.config.get('QUERY_BUDGET_MAX_QUERIES'),
+            max_repeats if max_repeats is not None else current_app.config.get('QUERY_BUDGET_MAX_REPEATS'),
+        )
+    return response
+
+
+def init_app(app):
+    install()
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
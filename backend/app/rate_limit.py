@@ -0,0 +1,198 @@
+"""
+Rate Limiting
+
+Throttles abusive traffic (credential stuffing on /auth/login, signup floods,
+chat spam) before a route does any DB or bcrypt work.
+
+Features:
+- Sliding-window counters: the previous window's count is weighted by how much
+  of it still overlaps the sliding window, so there is no burst at window edges
+- @rate_limit(name, "N/period", key=...) decorator, stackable; keys by client
+  IP, by a request body field (email/username) or by JWT identity
+- Backends (RATE_LIMIT_STORAGE): "memory" (per worker, the default and the
+  local stand-in) or "redis" (RATE_LIMIT_REDIS_URL, shared by every worker;
+  any client with pipeline/incr/expire/get works, e.g. Valkey or a test fake)
+- Limits overridable per rule via RATE_LIMIT_<NAME> (e.g. RATE_LIMIT_LOGIN_IP=50/minute)
+- 429 + Retry-After on rejection; backend errors fail open
+"""
+
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import wraps
+from typing import Callable, Optional, Tuple
+
+from flask import current_app, jsonify, request
+
+from .cache import TTLCache
+from .metrics import registry
+
+
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+RATE_LIMIT_STORAGE = os.getenv('RATE_LIMIT_STORAGE', 'memory')
+RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL')
+# Behind a proxy (Render, nginx) the client address is the first X-Forwarded-For hop
+RATE_LIMIT_TRUST_PROXY = os.getenv('RATE_LIMIT_TRUST_PROXY', 'False').lower() == 'true'
+
+RATE_LIMIT_CHECKS = registry.counter(
+    'rate_limit_checks_total', 'Rate limit decisions per rule', ['rule', 'result'])
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, rule: str, retry_after: int):
+        super().__init__(f"Rate limit exceeded for {rule}")
+        self.rule = rule
+        self.retry_after = retry_after
+
+
+def parse_limit(spec: str) -> Tuple[int, int]:
+    """'10/minute' or '100/15minutes' -> (10, 60) / (100, 900)"""
+    count, _, period = spec.partition('/')
+    digits = ''.join(ch for ch in period if ch.isdigit())
+    unit = period[len(digits):].strip().rstrip('s')
+    if unit not in _PERIODS:
+        raise ValueError(f"Invalid rate limit: {spec}")
+    return int(count), int(digits or 1) * _PERIODS[unit]
+
+
+class MemoryRateLimitBackend:
+    """Counters in this worker only (limits are per worker with several workers)"""
+
+    def __init__(self):
+        self._counters = TTLCache('rate_limit', maxsize=100000, ttl=3600)
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, window: int, period: int) -> Tuple[int, int]:
+        """Count a hit in window; returns (current window count, previous window count)"""
+        with self._lock:
+            current = self._counters.get((key, window), 0) + 1
+            self._counters.set((key, window), current, ttl=period * 2)
+            previous = self._counters.get((key, window - 1), 0)
+        return current, previous
+
+
+class RedisRateLimitBackend:
+    """INCR + EXPIRE per window key, one round trip"""
+
+    def __init__(self, client=None, url: Optional[str] = None, prefix: str = 'rl'):
+        if client is None:
+            import redis  # optional dependency, only needed for this backend
+            client = redis.Redis.from_url(url or RATE_LIMIT_REDIS_URL)
+        self.client = client
+        self.prefix = prefix
+
+    def hit(self, key: str, window: int, period: int) -> Tuple[int, int]:
+        current_key = f"{self.prefix}:{key}:{window}"
+        pipe = self.client.pipeline()
+        pipe.incr(current_key)
+        pipe.expire(current_key, period * 2)
+        pipe.get(f"{self.prefix}:{key}:{window - 1}")
+        current, _, previous = pipe.execute()
+        return int(current), int(previous or 0)
+
+
+RATE_LIMIT_BACKENDS = {
+    'memory': MemoryRateLimitBackend,
+    'redis': RedisRateLimitBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = RATE_LIMIT_BACKENDS[RATE_LIMIT_STORAGE]()
+    return _backend
+
+
+def set_backend(backend) -> None:
+    global _backend
+    _backend = backend
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    estimated: float
+    retry_after: int
+
+
+def check(rule: str, key: str, limit: int, period: int, backend=None, now: Optional[float] = None) -> Decision:
+    now = time.time() if now is None else now
+    window = int(now // period)
+    into_window = (now % period) / period
+    current, previous = (backend or get_backend()).hit(f"{rule}:{key}", window, period)
+    estimated = previous * (1 - into_window) + current
+    if estimated <= limit:
+        return Decision(True, estimated, 0)
+    # Wait until the previous window's weight has decayed enough (at most the rest of this window)
+    retry_after = period * (1 - into_window)
+    if previous and current <= limit:
+        retry_after = min(retry_after, period * ((previous + current - limit) / previous - into_window))
+    return Decision(False, estimated, max(1, math.ceil(retry_after)))
+
+
+# Key functions: return None to skip the rule for this request
+
+def client_ip() -> str:
+    if RATE_LIMIT_TRUST_PROXY and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or 'unknown'
+
+
+def body_field(*fields: str) -> Callable[[], Optional[str]]:
+    """Key on the first present JSON body field (lower-cased), e.g. the login identifier"""
+    def key():
+        data = request.get_json(silent=True) or {}
+        for field in fields:
+            value = data.get(field)
+            if isinstance(value, str) and value.strip():
+                return value.strip().lower()
+        return None
+    return key
+
+
+def jwt_identity() -> Optional[str]:
+    """Use under @jwt_required() so the identity is verified first"""
+    from flask_jwt_extended import get_jwt_identity
+    return get_jwt_identity()
+
+
+def rate_limit(name: str, limit: str, key: Callable[[], Optional[str]] = client_ip):
+    """Reject the request with 429 before the view runs once key() exceeds the limit"""
+    count, period = parse_limit(os.getenv(f'RATE_LIMIT_{name.upper()}', limit))
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if RATE_LIMIT_ENABLED and not current_app.config.get('RATE_LIMIT_DISABLED'):
+                subject = key()
+                if subject is not None:
+                    try:
+                        decision = check(name, subject, count, period)
+                    except Exception as e:
+                        decision = None  # a broken backend must not take login down
+                        current_app.logger.warning(f"Rate limit backend error ({name}): {str(e)}")
+                    if decision is not None:
+                        RATE_LIMIT_CHECKS.inc(rule=name, result='allowed' if decision.allowed else 'rejected')
+                        if not decision.allowed:
+                            raise RateLimitExceeded(name, decision.retry_after)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def rate_limit_exceeded(error: RateLimitExceeded):
+    response = jsonify({"error": "Too many requests, please slow down"})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def init_app(app):
+    app.register_error_handler(RateLimitExceeded, rate_limit_exceeded)
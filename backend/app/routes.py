@@ -1,5 +1,8 @@
-from flask import Blueprint
-# from app.database import engine, test_db_connection
+import hmac
+import os
+from flask import Blueprint, Response, jsonify, request
+from .lifecycle import readiness
+from .metrics import render_prometheus
 
 
 main_bp = Blueprint('main', __name__) #blueprint for the main app 
@@ -8,4 +11,28 @@ main_bp = Blueprint('main', __name__) #blueprint for the main app
 def index():
     return "Hello World"
 
+@main_bp.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint (per worker). Protected by METRICS_TOKEN, required in production."""
+    token = os.getenv('METRICS_TOKEN')
+    if not token and os.getenv('FLASK_ENV') == 'production':
+        return Response("Not Found", status=404)
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return Response("Unauthorized", status=401)
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
 
+@main_bp.route('/healthz')
+def healthz():
+    """Liveness: the worker is up and serving requests"""
+    return jsonify({"status": "ok"}), 200
+
+@main_bp.route('/readyz')
+def readyz():
+    """Readiness: the database answers (result cached for READINESS_CACHE_SECONDS)"""
+    ready, checks = readiness()
+    if not ready:
+        response = jsonify({"status": "unavailable", "checks": checks})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    return jsonify({"status": "ready", "checks": checks}), 200
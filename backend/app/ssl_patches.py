@@ -0,0 +1,80 @@
+"""
+urllib3 SSL Compatibility Patches (opt-in)
+
+Some older production images hit a recursion in urllib3's SSL context creation.
+These workarounds used to run unconditionally at import time; they're now only
+applied when SSL_COMPAT_PATCHES=true, since current Plaid/Stripe SDKs handle
+TLS themselves.
+
+Features:
+- Replaces urllib3's create_urllib3_context with a plain secure default context
+  (TLS 1.2+, hostname checking), idempotent
+- The environment tweaks the old production fix applied (PYTHONHTTPSVERIFY,
+  CURL_CA_BUNDLE, InsecureRequestWarning silenced)
+"""
+
+import logging
+import os
+import ssl
+
+logger = logging.getLogger(__name__)
+
+
+def apply_urllib3_ssl_fix() -> bool:
+    """Apply SSL fix for urllib3 recursion issues"""
+    try:
+        import urllib3.util.ssl_
+
+        # Check if already patched to avoid recursion
+        if hasattr(urllib3.util.ssl_.create_urllib3_context, '_patched_for_production'):
+            return True
+
+        original_func = urllib3.util.ssl_.create_urllib3_context
+
+        def production_safe_ssl_context(*args, **kwargs):
+            """Production-safe SSL context that prevents recursion"""
+            try:
+                context = ssl.create_default_context()
+                context.check_hostname = True
+                context.verify_mode = ssl.CERT_REQUIRED
+                try:
+                    context.options |= ssl.OP_NO_SSLv2
+                    context.options |= ssl.OP_NO_SSLv3
+                    context.options |= ssl.OP_NO_TLSv1
+                    context.options |= ssl.OP_NO_TLSv1_1
+                except AttributeError:
+                    # Some options might not be available in all environments
+                    pass
+                return context
+            except Exception:
+                try:
+                    return ssl.create_default_context()
+                except Exception:
+                    try:
+                        return original_func(*args, **kwargs)
+                    except RecursionError:
+                        return ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+
+        production_safe_ssl_context._patched_for_production = True
+        urllib3.util.ssl_.create_urllib3_context = production_safe_ssl_context
+        logger.info("Applied production-safe SSL fix for urllib3")
+        return True
+
+    except Exception as e:
+        logger.warning(f"Could not apply SSL fix: {e}")
+        return False
+
+
+def apply_environment_ssl_fixes() -> None:
+    os.environ['PYTHONHTTPSVERIFY'] = '1'
+    os.environ['CURL_CA_BUNDLE'] = ''
+    try:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    except Exception as e:
+        logger.warning(f"Could not apply production SSL configs: {e}")
+
+
+def apply_ssl_patches() -> None:
+    apply_urllib3_ssl_fix()
+    apply_environment_ssl_fixes()
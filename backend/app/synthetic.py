@@ -0,0 +1,297 @@
+"""
+Synthetic Dataset Generator
+
+Builds production-shaped data for load testing the transaction, summary,
+gambling and chat endpoints locally (see seed.py).
+
+Features:
+- Deterministic: user i is generated from its own Random(f"{seed}:{i}"), so the
+  same seed gives the same dataset whatever the batch size
+- Merchant mix drawn from TransactionCategorizer.MERCHANT_CATEGORIES and
+  GamblingDetector.GAMBLING_MERCHANTS (a share of users bet regularly)
+- Income on a biweekly or semi-monthly cadence, monthly recurring subscriptions
+  and bills, a few conversations per user, optional waitlist rows
+- Written in batches with COPY (database.copy_rows); ids are assigned here so
+  children can reference their parents without a round trip, and the id
+  sequences are moved past them afterwards
+- Roughly 1,000 transactions per user-year: --users 10000 --days 365 is ~10M
+"""
+
+import json
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, text
+
+from .database import copy_rows
+from .models import Conversations, Messages, Transaction, User, Waitlist
+
+
+EMAIL_DOMAIN = 'seed.polarity.test'
+GAMBLER_SHARE = 0.15
+
+USER_COLUMNS = ('id', 'name', 'email', 'username', 'password', 'age', 'created_at', 'total_balance',
+                'salary_monthly', 'monthly_spending_goal', 'onboarding_completed', 'onboarding_step',
+                'college_name', 'is_student', 'financial_goals', 'conversation_counter')
+TRANSACTION_COLUMNS = ('id', 'user_id', 'plaid_transaction_id', 'date_posted', 'name', 'amount', 'type',
+                       'payment_source', 'plaid_category', 'user_category', 'is_recurring')
+CONVERSATION_COLUMNS = ('id', 'user_id', 'created_at', 'last_modified', 'title')
+MESSAGE_COLUMNS = ('id', 'convo_id', 'user_id', 'sender', 'content', 'created_at')
+WAITLIST_COLUMNS = ('id', 'email', 'paid', 'payment_plan', 'created_at', 'paid_at')
+
+# (low, high) amount per purchase; categories not listed use DEFAULT_AMOUNT
+CATEGORY_AMOUNTS = {
+    'Food & Dining': (4, 65),
+    'Transportation': (3, 70),
+    'Shopping': (8, 220),
+    'Entertainment': (5, 90),
+    'Healthcare': (10, 250),
+    'Travel': (40, 600),
+    'Personal Care': (10, 120),
+}
+DEFAULT_AMOUNT = (5, 150)
+# Relative purchase frequency per category
+CATEGORY_WEIGHTS = {
+    'Food & Dining': 40, 'Transportation': 18, 'Shopping': 20, 'Entertainment': 8, 'Healthcare': 3,
+    'Utilities': 1, 'Insurance': 1, 'Education': 2, 'Personal Care': 4, 'Travel': 2, 'Financial Services': 1,
+}
+# Purchases per day: 0-5, about 2.4 on average
+DAILY_PURCHASES = ((0, 1, 2, 3, 4, 5), (12, 18, 22, 20, 16, 12))
+
+SUBSCRIPTIONS = [
+    ('Netflix', 15.49, 'Entertainment'), ('Spotify', 11.99, 'Entertainment'), ('Hulu', 17.99, 'Entertainment'),
+    ('Disney Plus', 13.99, 'Entertainment'), ('YouTube Premium', 13.99, 'Entertainment'),
+    ('Planet Fitness Gym', 24.99, 'Personal Care'), ('Coursera Plus', 59.00, 'Education'),
+    ('Verizon Wireless', 70.00, 'Utilities'), ('Comcast Xfinity Internet', 80.00, 'Utilities'),
+    ('GEICO Auto Insurance', 128.00, 'Insurance'), ('State Farm Renters Insurance', 18.00, 'Insurance'),
+]
+EMPLOYERS = ['Acme Corp', 'Globex', 'Initech', 'Umbrella Health', 'Stark Industries', 'Wayne Enterprises',
+             'Campus Dining Services', 'City of Springfield']
+FIRST_NAMES = ['Alex', 'Jordan', 'Taylor', 'Sam', 'Riley', 'Casey', 'Morgan', 'Jamie', 'Avery', 'Quinn',
+               'Priya', 'Diego', 'Mei', 'Kwame', 'Sofia', 'Omar']
+COLLEGES = ['State University', 'City College', 'Tech Institute', 'Community College']
+GOALS = ['Build an emergency fund', 'Pay off credit cards', 'Save for a car', 'Cut back on betting',
+         'Save for travel', 'Start investing']
+QUESTIONS = [
+    "How much did I spend on {category} last month?",
+    "Am I on track with my spending goal?",
+    "What are my recurring subscriptions?",
+    "How much have I spent on betting this month?",
+    "Can I afford a ${amount} purchase this week?",
+    "Where can I cut back?",
+]
+ANSWERS = [
+    "You spent ${amount} on {category} over the last 30 days, about {percent}% of your spending.",
+    "So far this month you're at ${amount}, which leaves room within your goal if you keep a similar pace.",
+    "I found {count} recurring charges totalling about ${amount} a month.",
+    "Your biggest category is {category}. Trimming it by {percent}% would save roughly ${amount} a month.",
+]
+
+
+@lru_cache(maxsize=1)
+def merchants_by_category() -> Dict[str, List[str]]:
+    """Display names built from the categorizer's merchant patterns (so they categorize back)"""
+    from .transaction_categorization import TransactionCategorizer
+
+    return {
+        category: [pattern.replace('\\', '').title() for pattern in patterns]
+        for category, patterns in TransactionCategorizer.MERCHANT_CATEGORIES.items()
+        if category in CATEGORY_WEIGHTS
+    }
+
+
+@lru_cache(maxsize=1)
+def gambling_merchants() -> List[Tuple[str, str]]:
+    """(merchant, user category) pairs, categorized once with the detector"""
+    from .gambling_detection import GamblingDetector, categorize_gambling_transaction
+
+    unique = dict.fromkeys(GamblingDetector.GAMBLING_MERCHANTS)
+    return [(name, categorize_gambling_transaction({'name': name, 'amount': 25}) or 'Gambling') for name in unique]
+
+
+@dataclass
+class SyntheticUser:
+    """One user's rows without ids for transactions, conversations and messages"""
+    row: Dict
+    transactions: List[Tuple] = field(default_factory=list)  # TRANSACTION_COLUMNS[2:]
+    conversations: List[Tuple[Tuple, List[Tuple]]] = field(default_factory=list)  # (row, messages)
+
+
+def _money(value: float) -> float:
+    return round(value, 2)
+
+
+def _at(day: date, rng: random.Random) -> datetime:
+    return datetime.combine(day, time(rng.randint(7, 22), rng.randint(0, 59)), tzinfo=timezone.utc)
+
+
+def generate_user(seed: int, index: int, user_id: int, today: date, days: int = 365,
+                  max_conversations: int = 3, password_hash: str = '') -> SyntheticUser:
+    rng = random.Random(f"{seed}:{index}")
+    start = today - timedelta(days=days - 1)
+    salary = rng.randrange(1500, 9000, 100)
+    is_student = rng.random() < 0.4
+    gambler = rng.random() < GAMBLER_SHARE
+    user = SyntheticUser(row={
+        'id': user_id,
+        'name': rng.choice(FIRST_NAMES),
+        'email': f"user{user_id}@{EMAIL_DOMAIN}",
+        'username': f"seed_{user_id}",
+        'password': password_hash,
+        'age': rng.randint(18, 30) if is_student else rng.randint(22, 65),
+        'created_at': _at(start, rng),
+        'total_balance': _money(rng.uniform(-500, 4 * salary)),
+        'salary_monthly': salary,
+        'monthly_spending_goal': int(salary * rng.uniform(0.5, 0.9)),
+        'onboarding_completed': True,
+        'onboarding_step': 6,
+        'college_name': rng.choice(COLLEGES) if is_student else None,
+        'is_student': is_student,
+        'financial_goals': json.dumps(rng.sample(GOALS, 2) + (['Cut back on betting'] if gambler else [])),
+        'conversation_counter': 0,
+    })
+    account = f"acct-{user_id}-checking"
+    sequence = 0
+
+    def add(day, name, amount, kind, plaid_category, category, recurring=False):
+        nonlocal sequence
+        sequence += 1
+        user.transactions.append((user_id, f"seed-{user_id}-{sequence}", day, name, _money(amount), kind,
+                                  account, plaid_category, category, recurring))
+
+    # Income: biweekly Fridays or the 1st and 15th
+    employer = rng.choice(EMPLOYERS)
+    biweekly = rng.random() < 0.6
+    paycheck = salary * 12 / 26 if biweekly else salary / 2
+    payday_offset = rng.randrange(14)
+    # Subscriptions and bills on a fixed day of the month
+    subscriptions = [(name, amount, category, rng.randint(1, 28))
+                     for name, amount, category in rng.sample(SUBSCRIPTIONS, rng.randint(2, 6))]
+
+    merchants = merchants_by_category()
+    categories = list(CATEGORY_WEIGHTS)
+    weights = list(CATEGORY_WEIGHTS.values())
+    bets_per_week = rng.randint(1, 10) if gambler else 0
+    books = rng.sample(gambling_merchants(), 3) if gambler else []
+
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        if (biweekly and day.weekday() == 4 and (offset + payday_offset) // 7 % 2 == 0) or (
+                not biweekly and day.day in (1, 15)):
+            add(day, f"{employer} Payroll Direct Deposit", paycheck, 'income', 'Transfer, Payroll', 'Income', True)
+        for name, amount, category, billing_day in subscriptions:
+            if day.day == billing_day:
+                add(day, name, amount, 'expense', category, category, True)
+        for _ in range(rng.choices(*DAILY_PURCHASES)[0]):
+            category = rng.choices(categories, weights)[0]
+            low, high = CATEGORY_AMOUNTS.get(category, DEFAULT_AMOUNT)
+            add(day, rng.choice(merchants[category]), rng.uniform(low, high), 'expense', category, category)
+        if bets_per_week and rng.random() < bets_per_week / 7:
+            book, category = rng.choice(books)
+            add(day, book, rng.choice([10, 20, 25, 50, 100, 200]), 'expense', 'Recreation, Gambling', category)
+            if rng.random() < 0.2:  # the occasional payout
+                add(day, book, rng.uniform(20, 400), 'income', 'Recreation, Gambling', category)
+
+    for _ in range(rng.randint(0, max_conversations)):
+        opened = _at(start + timedelta(days=rng.randrange(days)), rng)
+        messages = []
+        stamp = opened
+        for _ in range(rng.randint(1, 6)):
+            values = {'category': rng.choice(categories).lower(), 'amount': rng.randint(20, 900),
+                      'percent': rng.randint(5, 40), 'count': len(subscriptions)}
+            stamp += timedelta(seconds=rng.randint(20, 300))
+            messages.append(('user', rng.choice(QUESTIONS).format(**values), stamp))
+            stamp += timedelta(seconds=rng.randint(2, 15))
+            messages.append(('assistant', rng.choice(ANSWERS).format(**values), stamp))
+        user.conversations.append(((opened, stamp, messages[0][1][:60]), messages))
+    user.row['conversation_counter'] = len(user.conversations)
+    return user
+
+
+def generate_waitlist(seed: int, index: int, waitlist_id: int, today: date) -> Tuple:
+    rng = random.Random(f"{seed}:waitlist:{index}")
+    joined = _at(today - timedelta(days=rng.randrange(180)), rng)
+    paid = rng.random() < 0.3
+    return (waitlist_id, f"waitlist{waitlist_id}@{EMAIL_DOMAIN}", paid,
+            rng.choice(['lifetime', 'monthly']) if paid else None, joined,
+            joined + timedelta(minutes=rng.randint(1, 600)) if paid else None)
+
+
+@dataclass
+class SeedCounts:
+    users: int = 0
+    transactions: int = 0
+    conversations: int = 0
+    messages: int = 0
+    waitlist: int = 0
+
+
+def _next_id(db, model) -> int:
+    return (db.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _advance_sequences(db) -> None:
+    """Move Postgres id sequences past the ids assigned here"""
+    for table in ('users', 'conversations', 'messages', 'waitlist'):
+        db.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"))
+    db.execute(text("SELECT setval('transactions_id_seq', (SELECT COALESCE(MAX(id), 1) FROM transactions))"))
+
+
+def seed_dataset(db, users: int, days: int = 365, waitlist: int = 0, seed: int = 42,
+                 max_conversations: int = 3, batch_size: int = 200, today: Optional[date] = None,
+                 password_hash: str = '', progress: Optional[Callable[[SeedCounts], None]] = None) -> SeedCounts:
+    """
+    Generate and COPY `users` users (with history) and `waitlist` waitlist rows,
+    committing every batch_size users. Returns what was written.
+    """
+    today = today or date.today()
+    postgres = db.get_bind().dialect.name == 'postgresql'
+    if postgres:
+        from .partitions import ensure_transaction_partitions
+
+        ensure_transaction_partitions(db.connection(), since=today - timedelta(days=days - 1))
+        db.commit()
+
+    counts = SeedCounts()
+    user_id, transaction_id = _next_id(db, User), _next_id(db, Transaction)
+    convo_id, message_id = _next_id(db, Conversations), _next_id(db, Messages)
+
+    for batch_start in range(0, users, batch_size):
+        batch = []
+        for index in range(batch_start, min(batch_start + batch_size, users)):
+            batch.append(generate_user(seed, index, user_id, today, days, max_conversations, password_hash))
+            user_id += 1
+
+        transactions, conversations, messages = [], [], []
+        for user in batch:
+            for row in user.transactions:
+                transactions.append((transaction_id,) + row)
+                transaction_id += 1
+            for (opened, last_modified, title), convo_messages in user.conversations:
+                conversations.append((convo_id, user.row['id'], opened, last_modified, title))
+                for sender, content, created_at in convo_messages:
+                    messages.append((message_id, convo_id, user.row['id'], sender, content, created_at))
+                    message_id += 1
+                convo_id += 1
+
+        counts.users += copy_rows(db, User.__table__, USER_COLUMNS,
+                                  [tuple(user.row[name] for name in USER_COLUMNS) for user in batch])
+        counts.transactions += copy_rows(db, Transaction.__table__, TRANSACTION_COLUMNS, transactions)
+        counts.conversations += copy_rows(db, Conversations.__table__, CONVERSATION_COLUMNS, conversations)
+        counts.messages += copy_rows(db, Messages.__table__, MESSAGE_COLUMNS, messages)
+        db.commit()
+        if progress is not None:
+            progress(counts)
+
+    if waitlist:
+        first = _next_id(db, Waitlist)
+        counts.waitlist = copy_rows(db, Waitlist.__table__, WAITLIST_COLUMNS,
+                                    [generate_waitlist(seed, i, first + i, today) for i in range(waitlist)])
+    if postgres:
+        _advance_sequences(db)
+    db.commit()
+    return counts
@@ -0,0 +1,206 @@
+"""
+Request Tracing
+
+Minimal span tracing that ties one HTTP request to the work done on its behalf
+(SQL statements, upstream model calls, ...), so a slow chat turn can be broken
+down without attaching a profiler.
+
+Features:
+- One trace per request; W3C traceparent is honoured on the way in and returned
+  on the way out, so spans line up with the frontend / load balancer logs
+- span() context manager for nested spans with attributes
+- SQL statements recorded as db.query spans (capped per trace)
+- Span durations exported on /metrics as trace_span_seconds{span}; each finished
+  trace is logged as one structured JSON line
+- Traces can be resumed in background tasks (SocketIO streaming) via traceparent
+
+Like metrics.py, this deliberately avoids an OpenTelemetry dependency; the log
+line carries the same trace/span ids an OTLP exporter would.
+"""
+
+import json
+import os
+import re
+import secrets
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from flask import g, has_app_context, request, current_app
+
+from .metrics import registry
+
+
+TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', 200))
+TRACE_LOG = os.getenv('TRACE_LOG', 'True').lower() == 'true'
+
+SPAN_SECONDS = registry.histogram(
+    'trace_span_seconds', 'Duration of traced spans', ['span'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    duration: Optional[float] = None
+    attributes: Dict = field(default_factory=dict)
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def as_dict(self, origin: float) -> Dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ms": round((self.start - origin) * 1000, 2),
+            "duration_ms": round((self.duration or 0) * 1000, 2),
+            **({"attributes": self.attributes} if self.attributes else {}),
+        }
+
+
+class Trace:
+    def __init__(self, trace_id: Optional[str] = None, parent_id: Optional[str] = None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.remote_parent_id = parent_id
+        self.spans: List[Span] = []
+        self.stack: List[Span] = []
+        self.dropped = 0
+
+    @property
+    def root(self) -> Optional[Span]:
+        return self.spans[0] if self.spans else None
+
+    def start_span(self, name: str, **attributes) -> Span:
+        parent = self.stack[-1].span_id if self.stack else self.remote_parent_id
+        span = Span(name, secrets.token_hex(8), parent, time.perf_counter(), attributes=attributes)
+        if len(self.spans) < TRACE_MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+        self.stack.append(span)
+        return span
+
+    def end_span(self, span: Span) -> None:
+        span.duration = time.perf_counter() - span.start
+        if span in self.stack:
+            self.stack.remove(span)
+        SPAN_SECONDS.observe(span.duration, span=span.name)
+
+    def add_span(self, name: str, start: float, duration: float, **attributes) -> None:
+        """Record an already finished child of the current span"""
+        SPAN_SECONDS.observe(duration, span=name)
+        if len(self.spans) >= TRACE_MAX_SPANS:
+            self.dropped += 1
+            return
+        parent = self.stack[-1].span_id if self.stack else self.remote_parent_id
+        self.spans.append(Span(name, secrets.token_hex(8), parent, start, duration, attributes))
+
+    def traceparent(self) -> str:
+        current = self.stack[-1] if self.stack else self.root
+        return f"00-{self.trace_id}-{current.span_id if current else '0' * 16}-01"
+
+    def as_dict(self) -> Dict:
+        origin = self.root.start if self.root else 0.0
+        return {
+            "event": "trace",
+            "trace_id": self.trace_id,
+            "spans": [span.as_dict(origin) for span in self.spans],
+            **({"dropped_spans": self.dropped} if self.dropped else {}),
+        }
+
+
+def parse_traceparent(header: Optional[str]):
+    match = _TRACEPARENT.match((header or '').strip().lower())
+    if not match or match.group(1) == '0' * 32:
+        return None, None
+    return match.group(1), match.group(2)
+
+
+def current_trace() -> Optional[Trace]:
+    if not has_app_context():
+        return None
+    return g.get('_trace')
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span; a no-op span outside a trace"""
+    trace = current_trace()
+    if trace is None:
+        detached = Span(name, '', None, time.perf_counter(), attributes=attributes)
+        try:
+            yield detached
+        finally:
+            SPAN_SECONDS.observe(time.perf_counter() - detached.start, span=name)
+        return
+    active = trace.start_span(name, **attributes)
+    try:
+        yield active
+    except Exception as e:
+        active.set(error=type(e).__name__)
+        raise
+    finally:
+        trace.end_span(active)
+
+
+def record_span(name: str, start: float, duration: float, **attributes) -> None:
+    trace = current_trace()
+    if trace is not None:
+        trace.add_span(name, start, duration, **attributes)
+
+
+@contextmanager
+def trace(name: str, traceparent: Optional[str] = None, **attributes):
+    """Root span for work outside a request (background tasks); joins traceparent if given"""
+    trace_id, parent_id = parse_traceparent(traceparent)
+    previous = g.get('_trace')
+    g._trace = Trace(trace_id, parent_id)
+    try:
+        with span(name, **attributes) as root:
+            yield root
+    finally:
+        _log_trace(g._trace)
+        g._trace = previous
+
+
+def _log_trace(finished: Trace) -> None:
+    if TRACE_LOG and finished.spans:
+        current_app.logger.info(json.dumps(finished.as_dict()))
+
+
+def _start_request():
+    trace_id, parent_id = parse_traceparent(request.headers.get('traceparent'))
+    g._trace = Trace(trace_id, parent_id)
+    g._trace.start_span('http.request', method=request.method, path=request.path)
+
+
+def _add_trace_header(response):
+    trace = g.get('_trace')
+    if trace is not None and trace.root is not None:
+        trace.root.set(endpoint=request.endpoint or 'unknown', status=response.status_code)
+        response.headers['traceparent'] = f"00-{trace.trace_id}-{trace.root.span_id}-01"
+    return response
+
+
+def _finish_request(error=None):
+    # teardown_request: runs after a streamed body is fully sent, so stream spans are included
+    trace = g.pop('_trace', None)
+    if trace is None or trace.root is None:
+        return
+    if error is not None:
+        trace.root.set(error=type(error).__name__)
+    trace.end_span(trace.root)
+    _log_trace(trace)
+
+
+def init_app(app):
+    app.before_request(_start_request)
+    app.after_request(_add_trace_header)
+    app.teardown_request(_finish_request)
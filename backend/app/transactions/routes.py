@@ -11,7 +11,10 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import User, Transaction
+from app.bulk_load import recategorize_user
+from app.cache import invalidate_user
 from app.database import get_db_session
+from app.partitions import month_bounds
 from datetime import datetime, date
 from sqlalchemy import desc, asc
 
@@ -51,7 +54,7 @@ def get_transactions():
     end_date = request.args.get('end_date')
     
     try:
-        with get_db_session() as db:
+        with get_db_session(readonly=True) as db:
             # Base query for user's transactions
             query = db.query(Transaction).filter_by(user_id=user_id)
             
@@ -157,7 +160,7 @@ def get_transaction_categories():
     user_id = get_jwt_identity()
     
     try:
-        with get_db_session() as db:
+        with get_db_session(readonly=True) as db:
             # Get distinct user_categories for this user
             categories = db.query(Transaction.user_category).filter_by(user_id=user_id).distinct().all()
             
@@ -182,7 +185,7 @@ def get_transaction_summary():
     user_id = get_jwt_identity()
     
     try:
-        with get_db_session() as db:
+        with get_db_session(readonly=True) as db:
             # Get all transactions for user
             transactions = db.query(Transaction).filter_by(user_id=user_id).all()
             
@@ -273,6 +276,7 @@ def update_transaction_details(transaction_id):
                 transaction.is_recurring = bool(data['is_recurring'])
             
             db.commit()
+            invalidate_user(user_id)
             
             return jsonify({
                 "message": "Transaction updated successfully",
@@ -298,7 +302,7 @@ def get_monthly_income():
     user_id = get_jwt_identity()
     
     try:
-        with get_db_session() as db:
+        with get_db_session(readonly=True) as db:
             from datetime import datetime
             from sqlalchemy import func, extract
             
@@ -306,6 +310,8 @@ def get_monthly_income():
             current_date = datetime.now()
             current_month = current_date.month
             current_year = current_date.year
+            # Date-range filters (unlike extract()) let Postgres prune to the month's partition
+            month_start, next_month_start = month_bounds(current_date.date())
             
             # Get all income transactions for current month
             current_month_income = db.query(
@@ -313,8 +319,8 @@ def get_monthly_income():
             ).filter(
                 Transaction.user_id == user_id,
                 Transaction.type == 'income',
-                extract('month', Transaction.date_posted) == current_month,
-                extract('year', Transaction.date_posted) == current_year
+                Transaction.date_posted >= month_start,
+                Transaction.date_posted < next_month_start
             ).scalar()
             
             monthly_income = float(current_month_income) if current_month_income else 0
@@ -323,16 +329,16 @@ def get_monthly_income():
             income_count = db.query(Transaction).filter(
                 Transaction.user_id == user_id,
                 Transaction.type == 'income',
-                extract('month', Transaction.date_posted) == current_month,
-                extract('year', Transaction.date_posted) == current_year
+                Transaction.date_posted >= month_start,
+                Transaction.date_posted < next_month_start
             ).count()
             
             # Get sample income transactions for debugging
             sample_transactions = db.query(Transaction).filter(
                 Transaction.user_id == user_id,
                 Transaction.type == 'income',
-                extract('month', Transaction.date_posted) == current_month,
-                extract('year', Transaction.date_posted) == current_year
+                Transaction.date_posted >= month_start,
+                Transaction.date_posted < next_month_start
             ).limit(5).all()
             
             sample_data = []
@@ -366,7 +372,7 @@ def get_gambling_spend():
     user_id = get_jwt_identity()
     
     try:
-        with get_db_session() as db:
+        with get_db_session(readonly=True) as db:
             from datetime import datetime, timedelta
             from sqlalchemy import func, or_
             from ..gambling_detection import GamblingDetector
@@ -379,14 +385,16 @@ def get_gambling_spend():
             current_date = datetime.now()
             current_month = current_date.month
             current_year = current_date.year
+            # Date-range filters (unlike extract()) let Postgres prune to the month's partition
+            month_start, next_month_start = month_bounds(current_date.date())
             
             # Query for gambling transactions in current month using user_category
             # (which is now automatically set by our gambling detection during sync)
             gambling_query = db.query(Transaction).filter(
                 Transaction.user_id == user_id, 
                 Transaction.type == 'expense',
-                func.extract('month', Transaction.date_posted) == current_month,
-                func.extract('year', Transaction.date_posted) == current_year
+                Transaction.date_posted >= month_start,
+                Transaction.date_posted < next_month_start
             ).filter(
                 or_(
                     # Match by user_category (set by gambling detection)
@@ -400,7 +408,7 @@ def get_gambling_spend():
             current_month_gambling = sum(float(t.amount) for t in gambling_transactions)
             
             # Get last 90 days gambling spending for trend analysis
-            ninety_days_ago = current_date - timedelta(days=90)
+            ninety_days_ago = (current_date - timedelta(days=90)).date()  # date, not timestamp, keeps partition pruning
             gambling_90_days = db.query(Transaction).filter(
                 Transaction.user_id == user_id,
                 Transaction.type == 'expense',
@@ -470,7 +478,7 @@ def get_spending_over_time():
     user_id = get_jwt_identity()
     
     try:
-        with get_db_session() as db:
+        with get_db_session(readonly=True) as db:
             from datetime import datetime, timedelta
             from sqlalchemy import func, or_, and_
             from collections import defaultdict
@@ -585,7 +593,7 @@ def get_gambling_alerts():
     user_id = get_jwt_identity()
     
     try:
-        with get_db_session() as db:
+        with get_db_session(readonly=True) as db:
             from datetime import datetime, timedelta
             from sqlalchemy import func, or_
             from ..gambling_detection import GamblingDetector
@@ -597,6 +605,8 @@ def get_gambling_alerts():
             current_date = datetime.now()
             current_month = current_date.month
             current_year = current_date.year
+            # Date-range filters (unlike extract()) let Postgres prune to the month's partition
+            month_start, next_month_start = month_bounds(current_date.date())
             
             # Get current month gambling spending
             current_month_gambling = db.query(
@@ -604,8 +614,8 @@ def get_gambling_alerts():
             ).filter(
                 Transaction.user_id == user_id,
                 Transaction.type == 'expense',
-                func.extract('month', Transaction.date_posted) == current_month,
-                func.extract('year', Transaction.date_posted) == current_year,
+                Transaction.date_posted >= month_start,
+                Transaction.date_posted < next_month_start,
                 or_(
                     Transaction.user_category.in_(gambling_categories),
                     Transaction.plaid_category.in_(gambling_categories)
@@ -615,7 +625,7 @@ def get_gambling_alerts():
             current_month_gambling = float(current_month_gambling) if current_month_gambling else 0
             
             # Get last 3 months for trend analysis
-            three_months_ago = current_date - timedelta(days=90)
+            three_months_ago = (current_date - timedelta(days=90)).date()
             last_3_months_gambling = db.query(
                 func.sum(Transaction.amount).label('total_gambling')
             ).filter(
@@ -707,8 +717,8 @@ def get_gambling_alerts():
             gambling_transaction_count = db.query(Transaction).filter(
                 Transaction.user_id == user_id,
                 Transaction.type == 'expense',
-                func.extract('month', Transaction.date_posted) == current_month,
-                func.extract('year', Transaction.date_posted) == current_year,
+                Transaction.date_posted >= month_start,
+                Transaction.date_posted < next_month_start,
                 or_(
                     Transaction.user_category.in_(gambling_categories),
                     Transaction.plaid_category.in_(gambling_categories)
@@ -734,8 +744,8 @@ def get_gambling_alerts():
             ).filter(
                 Transaction.user_id == user_id,
                 Transaction.type == 'expense',
-                func.extract('month', Transaction.date_posted) == current_month,
-                func.extract('year', Transaction.date_posted) == current_year
+                Transaction.date_posted >= month_start,
+                Transaction.date_posted < next_month_start
             ).scalar()
             
             total_monthly_spending = float(total_monthly_spending) if total_monthly_spending else 0
@@ -821,68 +831,20 @@ def recategorize_transactions():
     
     try:
         with get_db_session() as db:
-            # Get all user transactions
-            transactions = db.query(Transaction).filter_by(user_id=user_id).all()
+            # Staged through COPY and applied with one UPDATE (app/bulk_load.py)
+            counts = recategorize_user(db, user_id)
             
-            if not transactions:
+            if not counts['total_transactions']:
                 return jsonify({"message": "No transactions found to recategorize"}), 200
             
-            # Import categorization functions
-            from app.gambling_detection import get_gambling_detection_details, categorize_gambling_transaction
-            from app.transaction_categorization import categorize_transaction
-            
-            # Prepare transaction data for categorization
-            user_transactions_for_categorization = []
-            for tx in transactions:
-                user_transactions_for_categorization.append({
-                    'name': tx.name,
-                    'amount': float(tx.amount),
-                    'date': tx.date_posted.isoformat()
-                })
-            
-            recategorized_count = 0
-            gambling_updated_count = 0
-            
-            for transaction in transactions:
-                # Create a plaid-like transaction object for categorization
-                plaid_like_transaction = {
-                    'name': transaction.name,
-                    'amount': float(transaction.amount),
-                    'merchant_name': None,  # Not available in our current data
-                    'category': transaction.plaid_category.split(', ') if transaction.plaid_category else []
-                }
-                
-                # Perform gambling detection first
-                gambling_detection = get_gambling_detection_details(plaid_like_transaction)
-                
-                old_category = transaction.user_category
-                old_recurring = transaction.is_recurring
-                
-                if gambling_detection.is_gambling:
-                    new_category = categorize_gambling_transaction(plaid_like_transaction)
-                    new_recurring = False  # Gambling transactions are typically not recurring
-                    gambling_updated_count += 1
-                else:
-                    # Use intelligent categorization for non-gambling transactions
-                    categorization_result = categorize_transaction(plaid_like_transaction, user_transactions_for_categorization)
-                    new_category = categorization_result.category
-                    new_recurring = categorization_result.is_recurring
-                
-                # Update if category or recurring status changed
-                if old_category != new_category or old_recurring != new_recurring:
-                    transaction.user_category = new_category
-                    transaction.is_recurring = new_recurring
-                    recategorized_count += 1
-                    
-                    current_app.logger.info(f"Recategorized transaction {transaction.id}: '{transaction.name}' from '{old_category}' to '{new_category}' (recurring: {old_recurring} -> {new_recurring})")
-            
             db.commit()
+            if counts['recategorized_count']:
+                invalidate_user(user_id)
+            current_app.logger.info(f"Recategorized {counts['recategorized_count']} of {counts['total_transactions']} transactions for user {user_id}")
             
             return jsonify({
                 "message": f"Recategorization completed successfully",
-                "total_transactions": len(transactions),
-                "recategorized_count": recategorized_count,
-                "gambling_updated_count": gambling_updated_count,
+                **counts,
                 "user_id": user_id
             }), 200
             
@@ -0,0 +1,103 @@
+"""
+User Snapshots
+
+Most protected routes only need a handful of User fields (does the user exist,
+onboarding progress, bank linked, budget profile). A snapshot of those fields is
+cached per user so such routes skip the users lookup entirely.
+
+Features:
+- Immutable UserSnapshot (no password, no Plaid access token)
+- Short TTL (USER_SNAPSHOT_TTL) + size bound, built on app/cache.py
+- Populated on login; retired by cache.invalidate_user(), which the profile,
+  onboarding and Plaid write paths already call after committing
+- Caches are per worker: another worker can serve a snapshot up to the TTL old
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Optional
+
+from .cache import TTLCache, user_key
+from .database import get_db_session
+from .models import User
+from .prepared import prepare_as, warmup
+
+
+USER_SNAPSHOT_TTL = int(os.getenv('USER_SNAPSHOT_TTL', 30))
+
+_snapshots = TTLCache('user_snapshot', maxsize=10000, ttl=USER_SNAPSHOT_TTL)
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    id: int
+    name: Optional[str]
+    username: str
+    email: str
+    age: Optional[int]
+    is_student: Optional[bool]
+    college_name: Optional[str]
+    financial_goals_json: Optional[str]
+    onboarding_completed: Optional[bool]
+    onboarding_step: Optional[int]
+    salary_monthly: Optional[int]
+    monthly_spending_goal: Optional[int]
+    total_balance: Optional[Decimal]
+    bank_connected: bool
+
+    @property
+    def financial_goals(self) -> List:
+        try:
+            return json.loads(self.financial_goals_json) if self.financial_goals_json not in (None, '', 'null') else []
+        except Exception:
+            return []
+
+
+# Columns a snapshot is built from (select these alongside anything else a query needs)
+SNAPSHOT_COLUMNS = (
+    User.id, User.name, User.username, User.email, User.age, User.is_student, User.college_name,
+    User.financial_goals, User.onboarding_completed, User.onboarding_step, User.salary_monthly,
+    User.monthly_spending_goal, User.total_balance, User.plaid_access_token.isnot(None).label('bank_connected'),
+)
+
+
+def snapshot_from_row(row) -> UserSnapshot:
+    return UserSnapshot(
+        id=row.id, name=row.name, username=row.username, email=row.email, age=row.age,
+        is_student=row.is_student, college_name=row.college_name, financial_goals_json=row.financial_goals,
+        onboarding_completed=row.onboarding_completed, onboarding_step=row.onboarding_step,
+        salary_monthly=row.salary_monthly, monthly_spending_goal=row.monthly_spending_goal,
+        total_balance=row.total_balance, bank_connected=bool(row.bank_connected),
+    )
+
+
+@warmup
+def load_snapshot_row(session, user_id=0):
+    return prepare_as(session.query(*SNAPSHOT_COLUMNS), 'user_snapshot').filter(User.id == int(user_id)).first()
+
+
+def remember_user_snapshot(snapshot: UserSnapshot) -> None:
+    _snapshots.set(user_key(snapshot.id), snapshot)
+
+
+def get_user_snapshot(user_id, db=None) -> Optional[UserSnapshot]:
+    """Cached snapshot, loaded on a miss (db if given, else a readonly session). None if no such user."""
+    if user_id is None:
+        return None
+    key = user_key(user_id)
+    snapshot = _snapshots.get(key)
+    if snapshot is not None:
+        return snapshot
+
+    if db is not None:
+        row = load_snapshot_row(db, user_id)
+    else:
+        with get_db_session(readonly=True, user_id=user_id) as session:
+            row = load_snapshot_row(session, user_id)
+    if row is None:
+        return None  # not cached: the user may be created right after
+    snapshot = snapshot_from_row(row)
+    _snapshots.set(key, snapshot)
+    return snapshot
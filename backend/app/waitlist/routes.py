@@ -7,16 +7,28 @@ Waitlist routes for early access paywall system
 """
 
 import os
-import stripe
-import requests
+import threading
 from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
 from sqlalchemy.exc import IntegrityError
 from ..database import get_db_session
 from ..models import Waitlist
+from ..rate_limit import rate_limit
 
-# Initialize Stripe
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+_stripe = None
+_stripe_lock = threading.Lock()
+
+def get_stripe():
+    """Stripe SDK, imported and configured on first use (it's slow to import at boot)"""
+    global _stripe
+    if _stripe is None:
+        with _stripe_lock:
+            if _stripe is None:
+                import stripe
+                stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+                stripe.set_app_info("Polarity", version="1.0.0")
+                _stripe = stripe
+    return _stripe
 
 # Zapier webhook configuration
 ZAPIER_WEBHOOK_URL = os.getenv('ZAPIER_WEBHOOK_URL')
@@ -51,7 +63,8 @@ def send_to_zapier(email, event_type="waitlist_signup", additional_data=None):
     if not ZAPIER_WEBHOOK_URL:
         current_app.logger.info("Zapier webhook URL not configured, skipping webhook")
         return False
-        
+
+    import requests  # deferred: only needed when a webhook is configured
     try:
         payload = {
             "email": email,
@@ -81,6 +94,7 @@ def send_to_zapier(email, event_type="waitlist_signup", additional_data=None):
         return False
 
 @waitlist_bp.route('/signup', methods=['POST'])
+@rate_limit('waitlist_signup_ip', '10/minute')
 def signup():
     """Add email to waitlist"""
     try:
@@ -149,7 +163,7 @@ def create_checkout_session():
             frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
             
             # Create Stripe checkout session
-            session = stripe.checkout.Session.create(
+            session = get_stripe().checkout.Session.create(
                 payment_method_types=['card'],
                 line_items=[{
                     'price_data': {
@@ -215,11 +229,11 @@ def create_monthly_checkout_session():
             # Get base URL for redirects
             frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
             current_app.logger.info(f"Frontend URL: {frontend_url}")
-            current_app.logger.info(f"Stripe API key configured: {bool(stripe.api_key)}")
+            current_app.logger.info(f"Stripe API key configured: {bool(get_stripe().api_key)}")
             
             # Create Stripe checkout session for monthly plan
             current_app.logger.info("About to call Stripe checkout session create")
-            session = stripe.checkout.Session.create(
+            session = get_stripe().checkout.Session.create(
                 payment_method_types=['card'],
                 line_items=[{
                     'price_data': {
@@ -252,11 +266,11 @@ def create_monthly_checkout_session():
                 "url": session.url
             }), 200
             
-    except stripe.error.StripeError as e:
-        current_app.logger.error(f"Stripe error in monthly checkout: {str(e)}")
-        current_app.logger.error(f"Stripe error type: {type(e).__name__}")
-        return jsonify({"error": f"Stripe error: {str(e)}"}), 500
     except Exception as e:
+        if isinstance(e, get_stripe().error.StripeError):
+            current_app.logger.error(f"Stripe error in monthly checkout: {str(e)}")
+            current_app.logger.error(f"Stripe error type: {type(e).__name__}")
+            return jsonify({"error": f"Stripe error: {str(e)}"}), 500
         current_app.logger.error(f"Monthly checkout session creation error: {str(e)}")
         current_app.logger.error(f"Error type: {type(e).__name__}")
         import traceback
@@ -274,7 +288,7 @@ def confirm_payment():
             return jsonify({"error": "Session ID is required"}), 400
         
         # Retrieve checkout session from Stripe
-        session = stripe.checkout.Session.retrieve(session_id)
+        session = get_stripe().checkout.Session.retrieve(session_id)
         
         if session.payment_status != 'paid':
             return jsonify({"error": "Payment not completed"}), 400
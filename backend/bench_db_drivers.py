@@ -0,0 +1,107 @@
+"""
+Sync-path write throughput: psycopg2 vs psycopg 3 (DB_DRIVER).
+
+For each driver, builds an engine through create_db_engine and times the writes
+a Plaid sync / backfill does, against a temporary copy of the transactions table
+(dropped afterwards, nothing real is touched):
+
+- insert:   executemany INSERT of --rows new transactions
+- update:   executemany UPDATE of every row's category (the ORM's batched flush);
+            psycopg 3 pipelines executemany, psycopg2 makes a round trip per row
+- pipeline: the same UPDATEs as separate statements inside database.pipeline()
+            (psycopg 3 only; with psycopg2 it is a no-op and shows the plain cost)
+- copy:     database.copy_rows (binary COPY on psycopg 3, CSV COPY on psycopg2)
+
+Needs a Postgres DATABASE_URL with the schema migrated. Latency to the server
+dominates the round-trip bound paths, so compare drivers against the same host.
+
+Usage:
+    python bench_db_drivers.py
+    python bench_db_drivers.py --rows 20000 --drivers psycopg
+"""
+
+import argparse
+import dataclasses
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import bindparam, column, insert, table, text, update
+from sqlalchemy.orm import Session
+
+COLUMNS = ('id', 'user_id', 'plaid_transaction_id', 'date_posted', 'name', 'amount', 'type', 'user_category')
+SCRATCH = 'bench_transactions'
+
+
+def make_rows(count):
+    start = date(2025, 1, 1)
+    return [
+        (i + 1, 0, f"bench-{i}", start + timedelta(days=i % 365), f"Merchant {i % 97}",
+         Decimal(f"{(i % 5000) / 100:.2f}"), 'expense', 'Other')
+        for i in range(count)
+    ]
+
+
+def run_driver(url, driver, rows):
+    from app.database import PoolSettings, copy_rows, create_db_engine, pipeline
+    from app.models import Transaction
+
+    settings = dataclasses.replace(PoolSettings.from_env(), driver=driver, prepared_statements=False)
+    engine = create_db_engine(url, name=f'bench_{driver}', settings=settings)
+    if engine.dialect.name != 'postgresql':
+        raise SystemExit("DATABASE_URL must point at Postgres")
+
+    scratch = table(SCRATCH, *(column(name) for name in COLUMNS))
+    as_dicts = [dict(zip(COLUMNS, row)) for row in rows]
+    recategorize = update(scratch).where(scratch.c.id == bindparam('b_id')).values(user_category=bindparam('b_category'))
+    changes = [{'b_id': row[0], 'b_category': 'Groceries'} for row in rows]
+    results = {}
+
+    def timed(label, fn, session):
+        session.execute(text(f"TRUNCATE {SCRATCH}"))
+        if label in ('update', 'pipeline'):
+            session.execute(insert(scratch), as_dicts)
+        session.commit()
+        start = time.perf_counter()
+        fn(session)
+        session.commit()
+        results[label] = time.perf_counter() - start
+
+    def pipelined_updates(session):
+        with pipeline(session):
+            for change in changes:
+                session.execute(recategorize, change)
+
+    with Session(bind=engine) as session:
+        session.execute(text(f"CREATE TEMPORARY TABLE {SCRATCH} (LIKE transactions INCLUDING DEFAULTS)"))
+        try:
+            timed('insert', lambda s: s.execute(insert(scratch), as_dicts), session)
+            timed('update', lambda s: s.execute(recategorize, changes), session)
+            timed('pipeline', pipelined_updates, session)
+            timed('copy', lambda s: copy_rows(s, Transaction.__table__, COLUMNS, rows, target=SCRATCH), session)
+        finally:
+            session.rollback()
+            session.execute(text(f"DROP TABLE IF EXISTS {SCRATCH}"))
+            session.commit()
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--drivers', nargs='+', default=['psycopg2', 'psycopg'], choices=['psycopg2', 'psycopg'])
+    args = parser.parse_args()
+
+    from app.database import SQLALCHEMY_DATABASE_URL
+
+    rows = make_rows(args.rows)
+    print(f"{'driver':<12}{'insert':>12}{'update':>12}{'pipeline':>12}{'copy':>12}   (rows/s, {args.rows} rows)")
+    for driver in args.drivers:
+        results = run_driver(SQLALCHEMY_DATABASE_URL, driver, rows)
+        print(f"{driver:<12}" + ''.join(f"{args.rows / results[label]:>12.0f}"
+                                        for label in ('insert', 'update', 'pipeline', 'copy')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Login storm benchmark for the password hashing service.
+
+Runs a gevent WSGI server (like a gunicorn gevent worker) with two endpoints:
+/login verifies a bcrypt hash, /ping does no work. While a storm of concurrent
+logins is running, it measures the latency of /ping requests: the "unrelated
+requests" that stall when bcrypt blocks the hub.
+
+Usage:
+    python bench_password_hashing.py --mode inline   # bcrypt in the greenlet (old behaviour)
+    python bench_password_hashing.py --mode pool     # app.auth.passwords thread pool
+    python bench_password_hashing.py --mode pool --rounds 12 --logins 200 --concurrency 20
+
+Measured on 1 vCPU, --rounds 10 --logins 60 --concurrency 20: inline, /ping p99
+was 1923 ms (a single ping got through during the whole storm); with the pool,
+/ping p99 was 10 ms over 116 pings, at the same ~10 logins/s. The pool keeps the
+hub free; it doesn't make logins faster.
+"""
+
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import http.client
+import statistics
+import time
+
+import bcrypt
+import gevent
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+
+
+def build_app(mode, rounds, threads):
+    from app.auth.passwords import PasswordHasher
+
+    hashed = bcrypt.hashpw(b"Correct-horse-1", bcrypt.gensalt(rounds=rounds)).decode()
+    hasher = PasswordHasher(rounds=rounds, threads=threads, max_queue=10000)
+
+    def app(environ, start_response):
+        if environ['PATH_INFO'] == '/login':
+            if mode == 'pool':
+                ok = hasher.verify("Correct-horse-1", hashed)
+            else:
+                ok = bcrypt.checkpw(b"Correct-horse-1", hashed.encode())
+            body = b'ok' if ok else b'denied'
+        else:
+            body = b'pong'
+        start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', str(len(body)))])
+        return [body]
+
+    return app
+
+
+def request(port, path):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    start = time.perf_counter()
+    conn.request('GET', path)
+    conn.getresponse().read()
+    conn.close()
+    return time.perf_counter() - start
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('inline', 'pool'), default='pool')
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--ping-interval', type=float, default=0.01)
+    args = parser.parse_args()
+
+    server = WSGIServer(('127.0.0.1', 0), build_app(args.mode, args.rounds, args.threads), log=None)
+    server.start()
+    port = server.server_port
+
+    login_times, ping_times = [], []
+    storm = Pool(args.concurrency)
+    started = time.perf_counter()
+    for _ in range(args.logins):
+        storm.spawn(lambda: login_times.append(request(port, '/login')))
+
+    def pinger():
+        while len(storm):
+            ping_times.append(request(port, '/ping'))
+            gevent.sleep(args.ping_interval)
+
+    gevent.spawn(pinger).join()
+    storm.join()
+    elapsed = time.perf_counter() - started
+    server.stop()
+
+    print(f"mode={args.mode} rounds={args.rounds} threads={args.threads} "
+          f"logins={args.logins} concurrency={args.concurrency}")
+    print(f"  logins/s           {args.logins / elapsed:8.1f}")
+    print(f"  login p50 / p99    {statistics.median(login_times) * 1000:8.1f} / "
+          f"{percentile(login_times, 99) * 1000:.1f} ms")
+    if ping_times:
+        print(f"  /ping p50 / p99    {statistics.median(ping_times) * 1000:8.1f} / "
+              f"{percentile(ping_times, 99) * 1000:.1f} ms  ({len(ping_times)} pings)")
+
+
+if __name__ == '__main__':
+    main()
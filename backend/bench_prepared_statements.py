@@ -0,0 +1,72 @@
+"""
+Planning time saved by preparing the hot queries (app/prepared.py).
+
+Runs each registered hot query once to capture the SQL SQLAlchemy renders, then
+EXPLAIN ANALYZEs it --runs times as a plain statement and --runs times as
+EXECUTE of a prepared statement, and reports the mean planning time of each.
+Execution time is the same either way; planning is what a prepared statement
+saves on every call once Postgres settles on its generic plan (after the first
+five executions).
+
+Needs a Postgres DATABASE_URL (direct endpoint, not a transaction pooler).
+
+Usage:
+    python bench_prepared_statements.py
+    python bench_prepared_statements.py --user-id 42 --runs 50
+"""
+
+import argparse
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+
+def capture_hot_statements(engine, user_id):
+    from app import prepared
+
+    captured = {}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        tag = context.execution_options.get(prepared.PREPARED_OPTION)
+        if tag is not None:
+            captured[tag] = (statement, parameters)
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        with Session(bind=engine) as session:
+            for warm in prepared._warmups:
+                warm(session, user_id=user_id)
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    return captured
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user-id', type=int, default=0, help='user whose rows the queries read')
+    parser.add_argument('--runs', type=int, default=30)
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.database import SQLALCHEMY_DATABASE_URL
+    from app.prepared import planning_time
+
+    create_app()  # registers the hot queries
+    # Own engine without the prepared statement hooks, whatever DB_PREPARED_STATEMENTS says
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    if engine.dialect.name != 'postgresql':
+        raise SystemExit("DATABASE_URL must point at Postgres")
+
+    statements = capture_hot_statements(engine, args.user_id)
+    raw = engine.raw_connection()
+    try:
+        print(f"{'statement':<24}{'plain':>12}{'prepared':>12}{'saved':>12}   (mean planning ms, {args.runs} runs)")
+        for tag, (statement, parameters) in sorted(statements.items()):
+            plain, prepared_ms = planning_time(raw.dbapi_connection, statement, parameters, runs=args.runs)
+            print(f"{tag:<24}{plain:>12.3f}{prepared_ms:>12.3f}{plain - prepared_ms:>12.3f}")
+    finally:
+        raw.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Bulk transaction writes for every user through the COPY loader (app/bulk_load.py):
+
+    python bulk_load.py recategorize                  # re-run categorization for all users
+    python bulk_load.py backfill --days 730           # merge 2 years of Plaid history for linked users
+    python bulk_load.py backfill --user-id 42         # one user only
+
+Each user is committed separately; a failing user is reported and skipped.
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from app.bulk_load import backfill_user, recategorize_user
+from app.database import engine, get_db_session
+from app.models import User
+from app.partitions import ensure_transaction_partitions
+
+parser = argparse.ArgumentParser(description="Recategorize or backfill transactions with COPY-based bulk writes")
+parser.add_argument("command", choices=["recategorize", "backfill"])
+parser.add_argument("--user-id", type=int, default=None, help="Only this user (default: all users)")
+parser.add_argument("--days", type=int, default=730, help="backfill: days of Plaid history to load")
+args = parser.parse_args()
+
+with get_db_session(readonly=True) as db:
+    query = db.query(User.id, User.plaid_access_token)
+    if args.user_id is not None:
+        query = query.filter(User.id == args.user_id)
+    if args.command == "backfill":
+        query = query.filter(User.plaid_access_token.isnot(None))
+    users = query.order_by(User.id).all()
+
+if args.command == "backfill" and engine.dialect.name == "postgresql":
+    # Old months would otherwise all land in the DEFAULT partition
+    with engine.begin() as conn:
+        created = ensure_transaction_partitions(conn, since=date.today() - timedelta(days=args.days))
+        print(f"Created partitions: {created or 'none'}")
+
+start = time.perf_counter()
+written = failed = 0
+for user_id, access_token in users:
+    try:
+        with get_db_session() as db:
+            if args.command == "recategorize":
+                counts = recategorize_user(db, user_id)
+                written += counts["recategorized_count"]
+                print(f"User {user_id}: {counts['recategorized_count']} of {counts['total_transactions']} recategorized")
+            else:
+                inserted, updated = backfill_user(db, user_id, access_token, days=args.days)
+                written += inserted + updated
+                print(f"User {user_id}: {inserted} inserted, {updated} updated")
+            db.commit()
+    except Exception as e:
+        failed += 1
+        print(f"User {user_id}: failed ({e})")
+
+elapsed = time.perf_counter() - start
+print(f"Done! {len(users) - failed} users, {written} rows written in {elapsed:.1f}s "
+      f"({written / elapsed if elapsed else 0:.0f} rows/s), {failed} failed")
@@ -0,0 +1,25 @@
+"""
+Maintain monthly partitions of the transactions table (run daily from cron):
+
+    python manage_partitions.py                      # create partitions for the next months
+    python manage_partitions.py --retain-months 36   # also detach + drop partitions older than 3 years
+"""
+import argparse
+
+from app.database import engine
+from app.partitions import ensure_transaction_partitions, archive_transaction_partitions, MONTHS_AHEAD
+
+parser = argparse.ArgumentParser(description="Create upcoming transaction partitions and apply retention")
+parser.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+parser.add_argument("--retain-months", type=int, default=None, help="Detach and drop partitions older than this")
+args = parser.parse_args()
+
+with engine.begin() as conn:
+    created = ensure_transaction_partitions(conn, months_ahead=args.months_ahead)
+    print(f"Created partitions: {created or 'none'}")
+
+    if args.retain_months is not None:
+        archived = archive_transaction_partitions(conn, retain_months=args.retain_months)
+        print(f"Archived partitions: {archived or 'none'}")
+
+print("Done!")
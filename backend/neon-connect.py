@@ -1,5 +1,4 @@
 import os
-from psycopg2 import pool
 from dotenv import load_dotenv
 
 # Load .env file
@@ -7,20 +6,32 @@ load_dotenv()
 
 # Get the connection string from the environment variable
 connection_string = os.getenv('DATABASE_URL')
+# Same switch the app uses: psycopg2 (default) or psycopg (psycopg 3)
+driver = os.getenv('DB_DRIVER', 'psycopg2').strip().lower()
 
-# Create a connection pool
-connection_pool = pool.SimpleConnectionPool(
-    1,  # Minimum number of connections in the pool
-    10,  # Maximum number of connections in the pool
-    connection_string
-)
+if driver == 'psycopg':
+    import psycopg
 
-# Check if the pool was created successfully
-if connection_pool:
-    print("Connection pool created successfully")
+    # A single connection is enough for a connectivity check
+    connection_pool = None
+    conn = psycopg.connect(connection_string)
+    print("Connected with psycopg 3")
+else:
+    from psycopg2 import pool
 
-# Get a connection from the pool
-conn = connection_pool.getconn()
+    # Create a connection pool
+    connection_pool = pool.SimpleConnectionPool(
+        1,  # Minimum number of connections in the pool
+        10,  # Maximum number of connections in the pool
+        connection_string
+    )
+
+    # Check if the pool was created successfully
+    if connection_pool:
+        print("Connection pool created successfully")
+
+    # Get a connection from the pool
+    conn = connection_pool.getconn()
 
 # Create a cursor object
 cur = conn.cursor()
@@ -34,10 +45,13 @@ version = cur.fetchone()[0]
 
 # Close the cursor and return the connection to the pool
 cur.close()
-connection_pool.putconn(conn)
+if connection_pool is None:
+    conn.close()
+else:
+    connection_pool.putconn(conn)
 
-# Close all connections in the pool
-connection_pool.closeall()
+    # Close all connections in the pool
+    connection_pool.closeall()
 
 # Print the results
 print('Current time:', time)
@@ -0,0 +1,116 @@
+"""
+Local OpenAI stand-in for load testing chat without spending tokens.
+
+Serves POST /v1/chat/completions (plain and stream=true) with configurable
+latency, so limiter/queueing behaviour can be measured against a predictable
+upstream.
+
+Usage:
+    python openai_stub_server.py --port 8089 --first-token-delay 0.5 --tokens 40
+    OPENAI_BASE_URL=http://localhost:8089/v1 gunicorn ... run:app
+"""
+
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def build_handler(first_token_delay, token_delay, token_count):
+    words = [f"word{i} " for i in range(token_count)]
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            model = body.get('model', 'gpt-4o-mini')
+            prompt_tokens = sum(len(m.get('content', '')) // 4 for m in body.get('messages', []))
+            completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+            time.sleep(first_token_delay)
+            if body.get('stream'):
+                self._stream(completion_id, model)
+            else:
+                time.sleep(token_delay * token_count)
+                self._send_json({
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(words).strip()},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": token_count,
+                        "total_tokens": prompt_tokens + token_count,
+                    },
+                })
+
+        def _send_json(self, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, completion_id, model):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            def send_chunk(delta, finish_reason=None):
+                event = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                self._write_chunk(f"data: {json.dumps(event)}\n\n")
+
+            send_chunk({"role": "assistant", "content": ""})
+            for word in words:
+                send_chunk({"content": word})
+                time.sleep(token_delay)
+            send_chunk({}, finish_reason="stop")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, text):
+            data = text.encode()
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return StubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI chat completions stub")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--first-token-delay', type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument('--token-delay', type=float, default=0.02, help="seconds between streamed tokens")
+    parser.add_argument('--tokens', type=int, default=40, help="tokens per completion")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(
+        (args.host, args.port),
+        build_handler(args.first_token_delay, args.token_delay, args.tokens))
+    print(f"OpenAI stub listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,43 @@
-from .app.database import SessionLocal
+"""
+Seed a database with synthetic, production-shaped data for load testing (app/synthetic.py):
+
+    python seed.py --users 100                          # quick local dataset
+    python seed.py --users 10000 --days 365 --waitlist 5000   # ~10M transactions
+    python seed.py --users 100 --seed 7                 # same seed, same data
+
+Seeded users log in as user<id>@seed.polarity.test with --password. Rows are
+appended with COPY; run reset_tables.py first for a clean database.
+"""
+import argparse
+import time
+
+from app.auth.passwords import password_hasher
+from app.database import get_db_session
+from app.synthetic import seed_dataset
+
+parser = argparse.ArgumentParser(description="Generate synthetic users, transactions, conversations and waitlist rows")
+parser.add_argument("--users", type=int, required=True)
+parser.add_argument("--days", type=int, default=365, help="Days of transaction history per user")
+parser.add_argument("--waitlist", type=int, default=0, help="Waitlist rows to add")
+parser.add_argument("--conversations", type=int, default=3, help="Max conversations per user")
+parser.add_argument("--seed", type=int, default=42)
+parser.add_argument("--batch-size", type=int, default=200, help="Users per COPY batch / commit")
+parser.add_argument("--password", default="SeedUser123!", help="Password for every seeded user")
+args = parser.parse_args()
+
+start = time.perf_counter()
+
+
+def report(counts):
+    elapsed = time.perf_counter() - start
+    print(f"{counts.users} users, {counts.transactions} transactions, {counts.messages} messages "
+          f"({counts.transactions / elapsed:.0f} transactions/s)")
+
+
+with get_db_session() as db:
+    counts = seed_dataset(db, args.users, days=args.days, waitlist=args.waitlist, seed=args.seed,
+                          max_conversations=args.conversations, batch_size=args.batch_size,
+                          password_hash=password_hasher.hash(args.password), progress=report)
+
+print(f"Done! {counts.users} users, {counts.transactions} transactions, {counts.conversations} conversations, "
+      f"{counts.messages} messages, {counts.waitlist} waitlist rows in {time.perf_counter() - start:.1f}s")
@@ -1,5 +1,13 @@
 import pytest
-from ..app import create_app
+from app import create_app
+from app.cache import clear_all_caches
+
+@pytest.fixture(autouse=True)
+def isolated_caches():
+    """User ids repeat across test databases, so in-process caches must not leak between tests"""
+    clear_all_caches()
+    yield
+    clear_all_caches()
 
 #Auth functions + routes 
 @pytest.fixture
@@ -9,6 +17,30 @@ def client():
     with app.test_client() as client:
         yield client
 
+@pytest.fixture
+def sqlite_db(monkeypatch, tmp_path):
+    """Point the app's engines/session factories at a throwaway SQLite file"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app import database
+    from app import models  # noqa: F401 - register tables on Base.metadata
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'polarity_test.db'}")
+    database.Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "replica_engine", engine)
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    monkeypatch.setattr(database, "ReplicaSessionLocal", session_factory)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def sqlite_app(sqlite_db):
+    flask_app = create_app()
+    flask_app.config["TESTING"] = True
+    return flask_app
+
 @pytest.fixture
 def valid_request_data_for_signup():
    return {
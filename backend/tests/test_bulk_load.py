@@ -0,0 +1,129 @@
+from datetime import date
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import bulk_load
+from app.bulk_load import merge_transactions, update_transactions
+from app.database import get_db_session
+from app.models import Transaction, User
+
+COLUMNS = ("id", "user_id", "plaid_transaction_id", "date_posted", "name", "amount", "type", "user_category")
+
+
+def create_user_with_transactions(transactions):
+    with get_db_session() as db:
+        user = User(email="peter@parker.com", username="spidey", password="x")
+        db.add(user)
+        db.flush()
+        for i, (name, amount, category) in enumerate(transactions, start=1):
+            db.add(Transaction(id=i, user_id=user.id, plaid_transaction_id=f"tx-{i}", date_posted=date(2025, 7, i),
+                               name=name, amount=amount, type="expense", user_category=category))
+        db.commit()
+        return user.id
+
+
+def categories(user_id):
+    with get_db_session() as db:
+        return {tx.plaid_transaction_id: (tx.name, float(tx.amount), tx.user_category)
+                for tx in db.query(Transaction).filter_by(user_id=user_id)}
+
+
+def test_merge_inserts_new_rows_and_updates_only_changed_ones(sqlite_db):
+    user_id = create_user_with_transactions([("Deli", 4.5, "Food & Dining"), ("Gym", 30, "Fitness")])
+    rows = [
+        (1, user_id, "tx-1", date(2025, 7, 1), "Deli", 4.5, "expense", "Food & Dining"),  # unchanged
+        (2, user_id, "tx-2", date(2025, 7, 2), "Gym", 35, "expense", "Fitness"),  # new amount
+        (3, user_id, "tx-3", date(2025, 7, 3), "Rent", 1200, "expense", "Housing"),
+        (3, user_id, "tx-3", date(2025, 7, 3), "Rent", 1250, "expense", "Housing"),  # later duplicate wins
+    ]
+
+    with get_db_session() as db:
+        assert merge_transactions(db, COLUMNS, rows) == (1, 1)
+        db.commit()
+
+    assert categories(user_id) == {
+        "tx-1": ("Deli", 4.5, "Food & Dining"),
+        "tx-2": ("Gym", 35.0, "Fitness"),
+        "tx-3": ("Rent", 1250.0, "Housing"),
+    }
+
+
+def test_merge_moves_rows_whose_date_changed(sqlite_db):
+    user_id = create_user_with_transactions([("Deli", 4.5, "Food & Dining")])
+    columns = ("user_id", "plaid_transaction_id", "date_posted", "name", "amount", "type")
+    posted = [(user_id, "tx-1", date(2025, 8, 2), "Deli", 4.5, "expense")]  # pending on 7/1, posted in August
+
+    with get_db_session() as db:
+        assert merge_transactions(db, columns, posted) == (0, 1)
+        db.commit()
+
+    with get_db_session() as db:
+        assert [(tx.id, tx.date_posted) for tx in db.query(Transaction)] == [(1, date(2025, 8, 2))]
+
+
+def test_merge_streams_in_batches_and_later_duplicates_win(sqlite_db, monkeypatch):
+    user_id = create_user_with_transactions([])
+    staged = []
+    original = bulk_load.stage_rows
+
+    def stage_rows(db, columns, rows):
+        staged.append(len(rows))
+        return original(db, columns, rows)
+
+    monkeypatch.setattr(bulk_load, "MERGE_BATCH_ROWS", 2)
+    monkeypatch.setattr(bulk_load, "stage_rows", stage_rows)
+    rows = [(i % 3, user_id, f"tx-{i % 3}", date(2025, 7, 1), "Deli", i, "expense", None) for i in range(5)]
+
+    with get_db_session() as db:
+        assert merge_transactions(db, COLUMNS, iter(rows)) == (3, 2)
+        db.commit()
+
+    assert staged == [2, 2, 1]
+    assert {key: amount for key, (_, amount, _) in categories(user_id).items()} == {
+        "tx-0": 3.0, "tx-1": 4.0, "tx-2": 2.0}
+
+
+def test_merge_requires_the_plaid_key_columns(sqlite_db):
+    with get_db_session() as db:
+        with pytest.raises(ValueError):
+            merge_transactions(db, ("id", "name"), [])
+
+
+def test_update_transactions_by_primary_key(sqlite_db):
+    user_id = create_user_with_transactions([("Deli", 4.5, "Other"), ("Gym", 30, "Fitness")])
+
+    with get_db_session() as db:
+        changes = [(1, date(2025, 7, 1), "Food & Dining"), (2, date(2025, 7, 2), "Fitness"),
+                   (2, date(2025, 7, 9), "Wrong partition")]
+        assert update_transactions(db, ("id", "date_posted", "user_category"), changes) == 1
+        db.commit()
+
+    assert categories(user_id)["tx-1"][2] == "Food & Dining"
+    assert categories(user_id)["tx-2"][2] == "Fitness"
+
+
+def test_recategorize_route_writes_changes_in_bulk(sqlite_db, sqlite_app, monkeypatch):
+    user_id = create_user_with_transactions([("Starbucks", 6, "Other"), ("DraftKings", 50, "Other"),
+                                             ("Mystery", 12, "Other")])
+    staged = []
+    original = bulk_load.stage_rows
+
+    def stage_rows(db, columns, rows):
+        rows = list(rows)
+        staged.append(rows)
+        return original(db, columns, rows)
+
+    with sqlite_app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+    monkeypatch.setattr(bulk_load, "stage_rows", stage_rows)
+    response = sqlite_app.test_client().post("/transactions/recategorize", headers=headers)
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert (body["total_transactions"], body["recategorized_count"], body["gambling_updated_count"]) == (3, 2, 1)
+    assert len(staged) == 1 and len(staged[0]) == 2  # one COPY of the changed rows only
+    after = categories(user_id)
+    assert after["tx-1"][2] == "Food & Dining"
+    assert after["tx-2"][2] != "Other"
+    assert after["tx-3"][2] == "Other"
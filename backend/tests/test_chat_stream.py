@@ -0,0 +1,46 @@
+from flask_jwt_extended import create_access_token
+from app.chat import routes as chat_routes
+from app.database import get_db_session
+from app.models import Conversations, Messages, User
+
+
+def create_conversation():
+    with get_db_session() as db:
+        user = User(email="wanda@westview.com", username="scarlet", password="x", onboarding_completed=True)
+        db.add(user)
+        db.flush()
+        convo = Conversations(user_id=user.id, title="Conversation 1")
+        db.add(convo)
+        db.commit()
+        return user.id, convo.id
+
+
+def test_stream_sends_tokens_and_persists_reply_once(sqlite_db, sqlite_app, monkeypatch):
+    user_id, convo_id = create_conversation()
+    seen_history = {}
+
+    def fake_stream(message, conversation_history=None, user_id=None):
+        seen_history["history"] = conversation_history
+        yield "Hello"
+        yield ", Wanda"
+
+    monkeypatch.setattr(chat_routes, "stream_ai_response", fake_stream)
+    with sqlite_app.app_context():
+        token = create_access_token(identity=str(user_id))
+
+    response = sqlite_app.test_client().post(
+        f"/chat/conversations/{convo_id}/messages/stream",
+        json={"message": "Hi"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    body = response.get_data(as_text=True)
+
+    assert response.mimetype == "text/event-stream"
+    assert body.count("event: token") == 2
+    assert "event: done" in body
+    history = seen_history["history"]
+    assert history[0]["content"].startswith("User's financial snapshot")
+    assert [m for m in history if m["role"] != "system"] == []  # the model call appends the new message
+    with get_db_session(readonly=True) as db:
+        replies = db.query(Messages).filter_by(convo_id=convo_id, sender="assistant").all()
+        assert [m.content for m in replies] == ["Hello, Wanda"]
@@ -0,0 +1,64 @@
+from app.chat.context_window import build_context_window, count_tokens, load_conversation_turns
+from app.database import get_db_session
+from app.models import Conversations, Messages, User
+
+
+SYSTEM_PROMPT = "You are Spark, a budgeting assistant."
+
+
+def create_conversation(turns):
+    with get_db_session() as db:
+        user = User(email="t@challa.com", username="tchalla", password="x")
+        db.add(user)
+        db.flush()
+        convo = Conversations(user_id=user.id, title="Conversation 1")
+        db.add(convo)
+        db.flush()
+        for i in range(turns):
+            db.add(Messages(convo_id=convo.id, sender="user" if i % 2 == 0 else "assistant",
+                            content=f"message {i} " + "word " * 40))
+        db.commit()
+        return convo.id
+
+
+def test_short_conversation_is_sent_whole(sqlite_db):
+    convo_id = create_conversation(4)
+    with get_db_session() as db:
+        rows = load_conversation_turns(db, convo_id)
+    window = build_context_window(rows, "How am I doing?", SYSTEM_PROMPT, budget=3000)
+
+    assert len(window.history) == 4
+    assert window.tokens_saved == 0
+    assert window.summarized is False
+
+
+def test_long_conversation_is_summarized_within_budget(sqlite_db):
+    convo_id = create_conversation(40)
+    calls = []
+
+    def summarize(previous, messages):
+        calls.append(len(messages))
+        return "User wants to save $500 a month."
+
+    with get_db_session() as db:
+        rows = load_conversation_turns(db, convo_id)
+    window = build_context_window(rows, "How am I doing?", SYSTEM_PROMPT,
+                                  summarize=summarize, budget=1000)
+
+    assert window.summarized is True
+    assert window.prompt_tokens <= 1000
+    assert window.tokens_saved > 0
+    assert window.history[0]["content"].endswith("User wants to save $500 a month.")
+    assert window.history[-1]["content"].startswith("message 39")
+
+    # Next turn fits again without summarizing a second time
+    second = build_context_window(rows, "And now?", SYSTEM_PROMPT,
+                                  summary=window.summary, summary_message_id=window.summary_message_id,
+                                  summarize=summarize, budget=1000)
+    assert second.summarized is False
+    assert len(calls) == 1
+
+
+def test_count_tokens_handles_empty_text():
+    assert count_tokens("") == 0
+    assert count_tokens("hello there") > 0
@@ -0,0 +1,31 @@
+from flask_jwt_extended import create_access_token
+from app.database import get_db_session
+from app.models import User
+
+
+def test_titles_are_numbered_from_user_counter(sqlite_db, sqlite_app):
+    with get_db_session() as db:
+        user = User(email="sue@storm.com", username="invisible", password="x", conversation_counter=4)
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    with sqlite_app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+    client = sqlite_app.test_client()
+
+    first = client.post("/chat/conversations", json={}, headers=headers).get_json()
+    named = client.post("/chat/conversations", json={"title": "Rent plan"}, headers=headers).get_json()
+    second = client.post("/chat/conversations", json={}, headers=headers).get_json()
+
+    assert first["title"] == "New Conversation 5"
+    assert named["title"] == "Rent plan"
+    assert second["title"] == "New Conversation 6"
+
+
+def test_unknown_user_gets_404(sqlite_db, sqlite_app):
+    with sqlite_app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity='999')}"}
+
+    response = sqlite_app.test_client().post("/chat/conversations", json={}, headers=headers)
+
+    assert response.status_code == 404
@@ -0,0 +1,93 @@
+from datetime import date, timedelta
+from app import cache
+from app.cache import TTLCache, invalidate_user, user_key
+from app.chat.financial_context import build_financial_snapshot, get_financial_context
+from app.database import get_db_session
+from app.models import Transaction, User
+from app.query_stats import assert_query_budget
+
+
+def create_user_with_transactions():
+    today = date.today()
+    rows = [
+        ("Paycheck", 2000, "income", "Income", False, today),
+        ("Rent", 900, "expense", "Rent", True, today),
+        ("Chipotle", 40, "expense", "Food", False, today),
+        ("DraftKings", 120, "expense", "Sports Betting", False, today),
+        ("DraftKings", 50, "expense", "Sports Betting", False, today.replace(day=1) - timedelta(days=3)),
+        ("Spotify", 11, "expense", "Subscriptions", True, today),
+    ]
+    with get_db_session() as db:
+        user = User(email="peter@parker.com", username="spidey", password="x", total_balance=1500,
+                    salary_monthly=2000, monthly_spending_goal=1200)
+        db.add(user)
+        db.flush()
+        for i, (name, amount, kind, category, recurring, posted) in enumerate(rows, start=1):
+            db.add(Transaction(id=i, user_id=user.id, plaid_transaction_id=f"tx-{i}", date_posted=posted,
+                               name=name, amount=amount, type=kind, user_category=category,
+                               is_recurring=recurring))
+        db.commit()
+        return user.id
+
+
+def test_snapshot_aggregates_user_finances(sqlite_db):
+    user_id = create_user_with_transactions()
+    with get_db_session(readonly=True) as db:
+        snapshot = build_financial_snapshot(db, user_id)
+
+    assert snapshot.total_balance == 1500
+    assert snapshot.income_this_month == 2000
+    assert snapshot.top_categories[0] == ("Rent", 900)
+    assert snapshot.gambling_this_month == 120
+    assert snapshot.gambling_trend == "rising"
+    assert ("Rent", 900) in snapshot.recurring
+    assert "Sports Betting" in snapshot.render()
+
+
+def test_render_respects_token_budget(sqlite_db):
+    user_id = create_user_with_transactions()
+    with get_db_session(readonly=True) as db:
+        snapshot = build_financial_snapshot(db, user_id)
+
+    assert len(snapshot.render(max_tokens=60)) < len(snapshot.render(max_tokens=1000))
+
+
+def test_context_is_cached_until_invalidated(sqlite_db):
+    user_id = create_user_with_transactions()
+    first = get_financial_context(user_id)
+    assert "$1,500.00" in first
+
+    with assert_query_budget(max_queries=0):
+        assert get_financial_context(user_id) == first
+
+    with get_db_session() as db:
+        db.query(User).filter_by(id=user_id).update({"total_balance": 42})
+        db.commit()
+    invalidate_user(user_id)
+
+    assert "$42.00" in get_financial_context(user_id)
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache("test", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_user_generations_stay_bounded_without_reviving_stale_keys(monkeypatch):
+    monkeypatch.setattr(cache, "USER_GENERATION_MAXSIZE", 2)
+    stale = user_key(1)
+    invalidate_user(1)
+    fresh = user_key(1)
+    invalidate_user(2)
+    invalidate_user(3)  # user 1 drops out of the table
+
+    assert len(cache._user_generations) == 2
+    assert user_key(1) != stale
+    assert user_key(1) == fresh  # still current, entries built since the last invalidation keep hitting
@@ -0,0 +1,43 @@
+from sqlalchemy import create_engine
+
+from app import database
+from app.lifecycle import ReadinessCheck, readiness, warm_pool
+
+
+def test_healthz_does_not_touch_the_database(sqlite_app, monkeypatch):
+    monkeypatch.setattr(database, "engine", None)
+    response = sqlite_app.test_client().get("/healthz")
+
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "ok"}
+
+
+def test_readyz_checks_the_database_once_per_ttl(sqlite_app, monkeypatch):
+    readiness.reset()
+    client = sqlite_app.test_client()
+    assert client.get("/readyz").get_json() == {"status": "ready", "checks": {"primary": "ok"}}
+
+    # Served from the cached result even though the database is gone now
+    monkeypatch.setattr(database, "engine", create_engine("sqlite:////nonexistent/dir/polarity.db"))
+    assert client.get("/readyz").status_code == 200
+
+    readiness.reset()
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert response.get_json()["checks"]["primary"].startswith("unavailable")
+
+
+def test_readiness_check_recovers_after_ttl(sqlite_db, monkeypatch):
+    check = ReadinessCheck(ttl=0)
+    monkeypatch.setattr(database, "engine", create_engine("sqlite:////nonexistent/dir/polarity.db"))
+    assert check()[0] is False
+    monkeypatch.setattr(database, "engine", sqlite_db)
+    assert check()[0] is True
+
+
+def test_warm_pool_returns_connections_to_the_pool(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'warm.db'}", pool_size=3)
+    assert warm_pool(engine, 3) == 3
+    assert engine.pool.checkedout() == 0
+    assert engine.pool.checkedin() == 3
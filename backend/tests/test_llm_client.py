@@ -0,0 +1,106 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from app.chat import routes as chat_routes
+from app.chat.llm_client import ConcurrencyLimiter, LLMSaturated, llm_limiter
+from app.database import get_db_session
+from app.models import Conversations, Messages, User
+
+
+def create_conversation():
+    with get_db_session() as db:
+        user = User(email="carol@danvers.com", username="marvel", password="x", onboarding_completed=True)
+        db.add(user)
+        db.flush()
+        convo = Conversations(user_id=user.id, title="Conversation 1")
+        db.add(convo)
+        db.commit()
+        return user.id, convo.id
+
+
+def auth_header(app, user_id):
+    with app.app_context():
+        return {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+
+
+def test_limiter_rejects_when_queue_is_full():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=0, queue_timeout=1)
+    with limiter.slot():
+        with pytest.raises(LLMSaturated) as error:
+            limiter.acquire()
+    assert error.value.status_code == 429
+    assert limiter.in_flight == 0
+
+
+def test_limiter_times_out_waiting_for_a_slot():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=5, queue_timeout=0.01)
+    with limiter.slot():
+        with pytest.raises(LLMSaturated) as error:
+            limiter.acquire()
+    assert error.value.status_code == 503
+    assert error.value.retry_after >= 1
+
+
+def test_db_connection_released_during_model_call(sqlite_db, sqlite_app, monkeypatch):
+    user_id, convo_id = create_conversation()
+    checked_out = []
+
+    def fake_response(message, conversation_history=None, user_id=None):
+        checked_out.append(sqlite_db.pool.checkedout())
+        return "Looking good"
+
+    monkeypatch.setattr(chat_routes, "get_ai_response", fake_response)
+    response = sqlite_app.test_client().post(
+        f"/chat/conversations/{convo_id}/messages", json={"message": "Hi"},
+        headers=auth_header(sqlite_app, user_id))
+
+    assert response.status_code == 200
+    assert checked_out == [0]
+    with get_db_session(readonly=True) as db:
+        assert db.query(Messages).filter_by(convo_id=convo_id).count() == 2
+
+
+def test_saturated_chat_returns_retry_after(sqlite_db, sqlite_app, monkeypatch):
+    user_id, convo_id = create_conversation()
+
+    def saturated(message, conversation_history=None, user_id=None):
+        raise LLMSaturated("Chat is busy, please retry shortly", status_code=503, retry_after=3)
+
+    monkeypatch.setattr(chat_routes, "get_ai_response", saturated)
+    response = sqlite_app.test_client().post(
+        f"/chat/conversations/{convo_id}/messages", json={"message": "Hi"},
+        headers=auth_header(sqlite_app, user_id))
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+
+
+def test_stream_releases_limiter_slot(sqlite_db, sqlite_app, monkeypatch):
+    user_id, convo_id = create_conversation()
+    monkeypatch.setattr(chat_routes, "stream_ai_response", lambda *args, **kwargs: iter(["ok"]))
+
+    response = sqlite_app.test_client().post(
+        f"/chat/conversations/{convo_id}/messages/stream", json={"message": "Hi"},
+        headers=auth_header(sqlite_app, user_id))
+    response.get_data()
+    response.close()
+
+    assert llm_limiter.in_flight == 0
+
+
+def test_embedding_calls_take_a_limiter_slot(monkeypatch):
+    from types import SimpleNamespace
+    from app.chat import llm_client
+    from app.chat.retrieval import OpenAIEmbedder
+    in_flight = []
+
+    def create(model, input, dimensions):
+        in_flight.append(llm_limiter.in_flight)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[1.0, 0.0]) for _ in input],
+                               usage=SimpleNamespace(prompt_tokens=3, completion_tokens=0, total_tokens=3))
+
+    monkeypatch.setattr(llm_client, "get_client", lambda: SimpleNamespace(embeddings=SimpleNamespace(create=create)))
+
+    vectors = OpenAIEmbedder(dim=2).embed(["rent", "groceries"])
+
+    assert vectors.shape == (2, 2)
+    assert in_flight == [1] and llm_limiter.in_flight == 0
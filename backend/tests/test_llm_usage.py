@@ -0,0 +1,87 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.chat import ai_service, llm_usage
+from app.chat.llm_client import LLMSaturated
+from app.database import get_db_session
+from app.models import Conversations, User
+
+
+def usage(prompt, completion):
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion)
+
+
+def fake_client(create):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def create_conversation():
+    with get_db_session() as db:
+        user = User(email="peter@dailybugle.com", username="webhead", password="x")
+        db.add(user)
+        db.flush()
+        convo = Conversations(user_id=user.id, title="Conversation 1")
+        db.add(convo)
+        db.commit()
+        return user.id, convo.id
+
+
+def test_calls_accumulate_daily_usage_and_metrics(sqlite_db, monkeypatch):
+    user_id, _ = create_conversation()
+    completion = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Save more"))],
+                                 usage=usage(1000, 200))
+    monkeypatch.setattr(ai_service, "get_client", lambda: fake_client(lambda **kwargs: completion))
+    prompt_before = llm_usage.LLM_PROMPT_TOKENS.value(model=ai_service.CHAT_MODEL, operation="chat")
+
+    ai_service.get_ai_response("How do I save?", user_id=user_id)
+    ai_service.get_ai_response("And invest?", user_id=user_id)
+
+    assert llm_usage.LLM_PROMPT_TOKENS.value(model=ai_service.CHAT_MODEL, operation="chat") - prompt_before == 2000
+    with get_db_session(readonly=True) as db:
+        row = llm_usage.daily_usage(db, user_id)
+        assert (row.requests, row.prompt_tokens, row.completion_tokens) == (2, 2000, 400)
+        assert float(row.cost_usd) == pytest.approx(2 * llm_usage.estimate_cost("gpt-4o-mini", 1000, 200))
+        with pytest.raises(LLMSaturated) as exc:
+            llm_usage.check_daily_quota(db, user_id, quota=2400)
+        assert exc.value.status_code == 429
+        llm_usage.check_daily_quota(db, user_id, quota=5000)
+
+
+def test_streamed_turn_is_traced_with_ttft_and_usage(sqlite_db, sqlite_app, monkeypatch, caplog):
+    user_id, convo_id = create_conversation()
+
+    def create(**kwargs):
+        assert kwargs["stream_options"] == {"include_usage": True}
+        delta = lambda text: SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+        return iter([delta("Hi"), delta(" Peter"), SimpleNamespace(choices=[], usage=usage(300, 2))])
+
+    monkeypatch.setattr(ai_service, "get_client", lambda: fake_client(create))
+    ttft_before = llm_usage.LLM_TTFT.count(model=ai_service.CHAT_MODEL, operation="chat_stream")
+    with sqlite_app.app_context():
+        token = create_access_token(identity=str(user_id))
+
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    with caplog.at_level("INFO"):
+        response = sqlite_app.test_client().post(
+            f"/chat/conversations/{convo_id}/messages/stream",
+            json={"message": "Hi"},
+            headers={"Authorization": f"Bearer {token}",
+                     "traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"},
+        )
+        assert "event: done" in response.get_data(as_text=True)
+        response.close()
+
+    assert response.headers["traceparent"].startswith(f"00-{trace_id}-")
+    assert llm_usage.LLM_TTFT.count(model=ai_service.CHAT_MODEL, operation="chat_stream") == ttft_before + 1
+    traces = [json.loads(r.getMessage()) for r in caplog.records if r.getMessage().startswith('{"event": "trace"')]
+    spans = {span["name"]: span for span in traces[-1]["spans"]}
+    assert traces[-1]["trace_id"] == trace_id
+    assert "db.query" in spans
+    llm_span = spans["llm.chat_stream"]
+    assert llm_span["parent_id"] == spans["http.request"]["span_id"]
+    assert llm_span["attributes"]["completion_tokens"] == 2
+    with get_db_session(readonly=True) as db:
+        assert llm_usage.daily_usage(db, user_id).prompt_tokens == 300
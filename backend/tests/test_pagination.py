@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+from app.database import get_db_session
+from app.models import Conversations, Messages, User
+from app.pagination import decode_cursor, encode_cursor
+
+
+def create_history(conversations=3, messages=7):
+    start = datetime(2025, 6, 1, 12, 0, 0)
+    with get_db_session() as db:
+        user = User(email="scott@lang.com", username="antman", password="x")
+        db.add(user)
+        db.flush()
+        convos = []
+        for i in range(conversations):
+            convo = Conversations(user_id=user.id, title=f"Conversation {i + 1}",
+                                  last_modified=start + timedelta(hours=i))
+            db.add(convo)
+            convos.append(convo)
+        db.flush()
+        for i in range(messages):
+            # Two messages share each timestamp so the id tie-breaker matters
+            db.add(Messages(convo_id=convos[0].id, sender="user", content=f"message {i}",
+                            created_at=start + timedelta(minutes=i // 2)))
+        db.commit()
+        return user.id, convos[0].id
+
+
+def fetch_all(client, url, headers, limit):
+    pages, cursor = [], None
+    while True:
+        response = client.get(url, query_string={"limit": limit, **({"cursor": cursor} if cursor else {})},
+                              headers=headers)
+        assert response.status_code == 200
+        pages.append(response.get_json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+def test_cursor_round_trip():
+    stamp = datetime(2025, 6, 1, 12, 30)
+    assert decode_cursor(encode_cursor(stamp, 42)) == (stamp, 42)
+
+
+def test_messages_paginate_newest_first(sqlite_db, sqlite_app):
+    user_id, convo_id = create_history()
+    with sqlite_app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+
+    pages = fetch_all(sqlite_app.test_client(), f"/chat/conversations/{convo_id}/messages", headers, limit=3)
+
+    assert [[m["content"] for m in page] for page in pages] == [
+        ["message 4", "message 5", "message 6"],
+        ["message 1", "message 2", "message 3"],
+        ["message 0"],
+    ]
+
+
+def test_conversations_paginate_by_last_modified(sqlite_db, sqlite_app):
+    user_id, _ = create_history()
+    with sqlite_app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+
+    pages = fetch_all(sqlite_app.test_client(), "/chat/conversations", headers, limit=2)
+
+    assert [[c["title"] for c in page] for page in pages] == [
+        ["Conversation 3", "Conversation 2"],
+        ["Conversation 1"],
+    ]
+
+
+def test_invalid_cursor_is_rejected(sqlite_db, sqlite_app):
+    user_id, _ = create_history()
+    with sqlite_app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+
+    response = sqlite_app.test_client().get("/chat/conversations?cursor=not-a-cursor", headers=headers)
+
+    assert response.status_code == 400
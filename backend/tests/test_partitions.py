@@ -0,0 +1,26 @@
+from datetime import date
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+from app.models import Transaction
+from app.partitions import add_months, month_bounds, partition_name
+
+
+def test_month_bounds_cover_one_month():
+    assert month_bounds(date(2025, 12, 17)) == (date(2025, 12, 1), date(2026, 1, 1))
+    assert month_bounds(date(2024, 2, 29)) == (date(2024, 2, 1), date(2024, 3, 1))
+
+
+def test_add_months_crosses_years():
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+
+def test_partition_name():
+    assert partition_name(date(2025, 9, 1)) == "transactions_y2025m09"
+
+
+def test_transactions_table_is_range_partitioned():
+    ddl = str(CreateTable(Transaction.__table__).compile(dialect=postgresql.dialect()))
+
+    assert "PARTITION BY RANGE (date_posted)" in ddl
+    assert "PRIMARY KEY (id, date_posted)" in ddl
@@ -0,0 +1,60 @@
+import bcrypt
+import pytest
+
+from app.auth import routes as auth_routes
+from app.auth.passwords import PasswordHasher, PasswordHasherBusy
+from app.database import get_db_session
+from app.models import User
+
+
+def test_hash_verify_and_rehash_detection():
+    hasher = PasswordHasher(rounds=4, threads=0)
+    hashed = hasher.hash("Ironman3000?")
+
+    assert hashed.startswith("$2b$04$")
+    assert hasher.verify("Ironman3000?", hashed)
+    assert not hasher.verify("Ironman3001?", hashed)
+    assert not hasher.verify("Ironman3000?", "not-a-bcrypt-hash")
+    assert not hasher.needs_rehash(hashed)
+    assert PasswordHasher(rounds=5).needs_rehash(hashed)
+
+
+def test_full_queue_is_rejected():
+    hasher = PasswordHasher(rounds=4, threads=1, max_queue=0)
+    hasher._pending = hasher.max_pending
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash("Ironman3000?")
+
+
+def create_user(password, rounds):
+    with get_db_session() as db:
+        user = User(email="pepper@starkindustries.com", username="rescue",
+                    password=bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode())
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+def test_login_upgrades_hash_cost(sqlite_db, sqlite_app, monkeypatch):
+    user_id = create_user("Ironman3000?", rounds=4)
+    monkeypatch.setattr(auth_routes, "password_hasher", PasswordHasher(rounds=5, threads=0))
+
+    response = sqlite_app.test_client().post("/auth/login", json={"username": "rescue", "password": "Ironman3000?"})
+
+    assert response.status_code == 200
+    with get_db_session(readonly=True) as db:
+        stored = db.get(User, user_id).password
+    assert stored.startswith("$2b$05$")
+    assert bcrypt.checkpw(b"Ironman3000?", stored.encode())
+
+
+def test_login_storm_is_shed_with_retry_after(sqlite_db, sqlite_app, monkeypatch):
+    create_user("Ironman3000?", rounds=4)
+    busy = PasswordHasher(rounds=4, threads=1, max_queue=0)
+    busy._pending = busy.max_pending
+    monkeypatch.setattr(auth_routes, "password_hasher", busy)
+
+    response = sqlite_app.test_client().post("/auth/login", json={"username": "rescue", "password": "Ironman3000?"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,81 @@
+from app.chat import post_processing
+from app.chat.post_processing import ConversationPostProcessor
+from app.database import get_db_session
+from app.models import Conversations, Messages, User
+
+
+def create_conversations():
+    with get_db_session() as db:
+        user = User(email="stephen@strange.com", username="sorcerer", password="x")
+        db.add(user)
+        db.flush()
+        convos = [
+            Conversations(user_id=user.id, title="New Conversation 1"),
+            Conversations(user_id=user.id, title="My rent plan"),
+            Conversations(user_id=user.id, title="New Conversation 2"),
+        ]
+        db.add_all(convos)
+        db.flush()
+        for convo in convos:
+            db.add(Messages(convo_id=convo.id, sender="user", content="How do I save for a car?"))
+            db.add(Messages(convo_id=convo.id, sender="assistant", content="Put $200 aside monthly."))
+        db.commit()
+        return [c.id for c in convos]
+
+
+def test_batch_generates_titles_without_clobbering_user_titles(sqlite_db, sqlite_app, monkeypatch):
+    convo_ids = create_conversations()
+    batches, emitted = [], []
+
+    def fake_generate(jobs):
+        batches.append([job["id"] for job in jobs])
+        return {job["id"]: {"id": job["id"], "title": "Saving for a car"} for job in jobs}
+
+    monkeypatch.setattr(post_processing, "generate_updates", fake_generate)
+    monkeypatch.setattr(post_processing.socketio, "emit", lambda *args, **kwargs: emitted.append((args, kwargs)))
+    processor = ConversationPostProcessor(batch_size=8, batch_window=0)
+    with sqlite_app.app_context():
+        for convo_id in convo_ids + [convo_ids[0]]:
+            processor.enqueue(convo_id)
+
+    events = processor.process_pending()
+
+    # One model call for both default-titled conversations, the user's title is left alone
+    assert batches == [[convo_ids[0], convo_ids[2]]]
+    assert [event["conversation_id"] for event in events] == [convo_ids[0], convo_ids[2]]
+    assert emitted[0][0][0] == "conversation_updated"
+    with get_db_session(readonly=True) as db:
+        titles = dict(db.query(Conversations.id, Conversations.title).all())
+    assert titles == {convo_ids[0]: "Saving for a car", convo_ids[1]: "My rent plan",
+                      convo_ids[2]: "Saving for a car"}
+
+
+def test_long_conversation_is_folded_in_background(sqlite_db, monkeypatch):
+    convo_id = create_conversations()[1]
+    with get_db_session() as db:
+        for i in range(60):
+            db.add(Messages(convo_id=convo_id, sender="user" if i % 2 else "assistant",
+                            content=f"turn {i} " + "budget " * 40))
+        db.commit()
+
+    monkeypatch.setattr(post_processing, "generate_updates",
+                        lambda jobs: {job["id"]: {"id": job["id"], "summary": "Saving $200/month."} for job in jobs})
+    monkeypatch.setattr(post_processing.socketio, "emit", lambda *args, **kwargs: None)
+
+    events = ConversationPostProcessor().process_batch([convo_id])
+
+    assert events == [{"conversation_id": convo_id, "summary": "Saving $200/month."}]
+    with get_db_session(readonly=True) as db:
+        convo = db.get(Conversations, convo_id)
+        assert convo.summary == "Saving $200/month."
+        assert convo.summary_message_id is not None
+
+
+def test_enqueue_is_a_no_op_when_post_processing_is_disabled(sqlite_app, monkeypatch):
+    processor = ConversationPostProcessor()
+    processor.enqueue(1)  # no app context: no worker would ever drain it
+    monkeypatch.setenv("CHAT_POST_PROCESSING", "false")
+    with sqlite_app.app_context():
+        processor.enqueue(2)
+
+    assert processor._pending == set() and processor._queue.empty()
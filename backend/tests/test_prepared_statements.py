@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import prepared
+
+
+class FakeCursor:
+    def __init__(self, fail_on=None):
+        self.executed = []
+        self.fail_on = fail_on
+
+    def execute(self, sql, parameters=None):
+        if self.fail_on and self.fail_on in sql:
+            raise RuntimeError("relation does not exist")
+        self.executed.append(sql)
+
+    def close(self):
+        pass
+
+
+class FakeDBAPIConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.commits = self.rollbacks = 0
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def execution(tag):
+    conn = SimpleNamespace(connection=SimpleNamespace(info={}))
+    context = SimpleNamespace(execution_options={prepared.PREPARED_OPTION: tag} if tag else {})
+    return conn, context
+
+
+def test_to_positional_numbers_parameters_in_order():
+    body, params = prepared.to_positional(
+        "SELECT * FROM t WHERE a = %(a_1)s AND b LIKE 'x%%' AND c = %(a_1)s LIMIT %(param_1)s")
+
+    assert body == "SELECT * FROM t WHERE a = $1 AND b LIKE 'x%' AND c = $1 LIMIT $2"
+    assert params == ["a_1", "param_1"]
+
+
+def test_tagged_statement_is_prepared_once_per_connection_then_executed():
+    statement = "SELECT users.id FROM users WHERE users.id = %(id_1)s LIMIT %(param_1)s"
+    parameters = {"id_1": 7, "param_1": 1}
+    conn, context = execution("user_snapshot_test")
+    cursor = FakeCursor()
+
+    sql, params = prepared._before_cursor_execute(conn, cursor, statement, parameters, context, False)
+    name = prepared._names[statement]
+    assert cursor.executed == [f"PREPARE {name} AS SELECT users.id FROM users WHERE users.id = $1 LIMIT $2"]
+    assert (sql, params) == (f"EXECUTE {name}(%(id_1)s, %(param_1)s)", parameters)
+
+    prepared._before_cursor_execute(conn, cursor, statement, {"id_1": 8, "param_1": 1}, context, False)
+    assert len(cursor.executed) == 1
+
+    # A fresh connection prepares it again
+    other_conn, _ = execution("user_snapshot_test")
+    prepared._before_cursor_execute(other_conn, cursor, statement, parameters, context, False)
+    assert len(cursor.executed) == 2
+
+
+def test_untagged_and_executemany_statements_are_untouched():
+    statement = "UPDATE users SET name = %(name)s WHERE users.id = %(id)s"
+    conn, context = execution(None)
+    assert prepared._before_cursor_execute(conn, FakeCursor(), statement, {}, context, False) == (statement, {})
+
+    conn, context = execution("bulk")
+    rows = [{"name": "a", "id": 1}]
+    assert prepared._before_cursor_execute(conn, FakeCursor(), statement, rows, context, True) == (statement, rows)
+
+
+def test_new_connections_prepare_known_statements_and_skip_broken_ones(monkeypatch):
+    monkeypatch.setattr(prepared, "_statements", {
+        "good_1": ("SELECT 1", []),
+        "broken_2": ("SELECT * FROM missing", []),
+    })
+    dbapi_connection = FakeDBAPIConnection(FakeCursor(fail_on="missing"))
+    record = SimpleNamespace(info={})
+
+    prepared._on_connect(dbapi_connection, record)
+
+    assert record.info["prepared_statements"] == {"good_1"}
+    assert (dbapi_connection.commits, dbapi_connection.rollbacks) == (1, 1)
+
+
+def test_hot_queries_are_tagged_and_run_unchanged_elsewhere(sqlite_app, sqlite_db):
+    tags = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        tags.append(context.execution_options.get(prepared.PREPARED_OPTION))
+
+    event.listen(sqlite_db, "before_cursor_execute", capture)
+    try:
+        with Session(bind=sqlite_db) as session:
+            for warm in prepared._warmups:
+                warm(session)
+    finally:
+        event.remove(sqlite_db, "before_cursor_execute", capture)
+
+    assert sorted(tags) == ["conversations_by_user", "monthly_income", "user_snapshot"]
+    # SQLite engines never get the hooks installed
+    with sqlite_db.connect() as conn:
+        assert prepared.warm_connection(conn) == 0
@@ -0,0 +1,65 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from app.auth.revocation import revocation_store
+from app.database import get_db_session
+from app.models import User
+from app.query_stats import QueryBudgetExceeded, assert_query_budget, statement_shape
+
+
+def test_statement_shape_collapses_literals_and_in_lists():
+    first = statement_shape("SELECT * FROM users WHERE id = 1 AND name IN (?, ?, ?)")
+    second = statement_shape("SELECT *  FROM users WHERE id = 22 AND name IN (?)")
+
+    assert first == second == "SELECT * FROM users WHERE id = ? AND name IN (?)"
+
+
+def test_assert_query_budget_detects_repeated_statements(sqlite_db):
+    with pytest.raises(QueryBudgetExceeded):
+        with assert_query_budget(max_repeats=2):
+            with get_db_session(readonly=True) as db:
+                for user_id in range(3):
+                    db.get(User, user_id + 1)
+
+
+def test_server_timing_header_and_budget(sqlite_db, sqlite_app):
+    with get_db_session() as db:
+        user = User(email="nat@shield.org", username="widow", password="x")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    with sqlite_app.app_context():
+        token = create_access_token(identity=str(user_id))
+        revocation_store.sync(force=True)  # keep the periodic revocation sync out of the counts
+    headers = {"Authorization": f"Bearer {token}"}
+    client = sqlite_app.test_client()
+
+    sqlite_app.config.update(QUERY_BUDGET_ENFORCE=True, QUERY_BUDGET_MAX_QUERIES=5, QUERY_BUDGET_MAX_REPEATS=1)
+    response = client.get("/auth/user", headers=headers)
+
+    assert response.status_code == 200
+    assert 'desc="2 queries"' in response.headers["Server-Timing"]
+
+    # The user snapshot is cached now: only the balance query is left
+    response = client.get("/auth/user", headers=headers)
+    assert 'desc="1 queries"' in response.headers["Server-Timing"]
+
+    sqlite_app.config.update(QUERY_BUDGET_MAX_QUERIES=0)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/auth/user", headers=headers)
+
+
+def test_failed_statement_does_not_skew_later_timings(sqlite_db):
+    import time
+    from sqlalchemy import text
+
+    with assert_query_budget() as stats:
+        with sqlite_db.connect() as conn:
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM missing_table"))
+            conn.rollback()
+            time.sleep(0.2)
+            conn.execute(text("SELECT 1"))
+            assert not conn.connection.info.get("_query_start")  # nothing left behind on the pooled connection
+
+    assert stats.count == 1
+    assert stats.slowest_time < 0.1
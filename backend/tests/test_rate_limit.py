@@ -0,0 +1,62 @@
+from app import rate_limit
+from app.query_stats import assert_query_budget
+from app.rate_limit import MemoryRateLimitBackend, RedisRateLimitBackend, check, parse_limit
+
+
+class FakeRedis:
+    """Just the commands RedisRateLimitBackend uses"""
+
+    def __init__(self):
+        self.values, self.expiry, self.queued = {}, {}, []
+
+    def pipeline(self):
+        self.queued = []
+        return self
+
+    def incr(self, key):
+        self.queued.append(lambda: self.values.__setitem__(key, self.values.get(key, 0) + 1) or self.values[key])
+
+    def expire(self, key, seconds):
+        self.queued.append(lambda: self.expiry.__setitem__(key, seconds) or True)
+
+    def get(self, key):
+        self.queued.append(lambda: self.values.get(key))
+
+    def execute(self):
+        return [command() for command in self.queued]
+
+
+def test_parse_limit():
+    assert parse_limit("10/minute") == (10, 60)
+    assert parse_limit("100/15minutes") == (100, 900)
+
+
+def test_sliding_window_weights_previous_window():
+    for backend in (MemoryRateLimitBackend(), RedisRateLimitBackend(client=FakeRedis())):
+        # 10 hits at the end of one window...
+        assert all(check("login", "1.2.3.4", 10, 60, backend, now=59.0).allowed for _ in range(10))
+        # ...still count almost fully just after the boundary
+        decision = check("login", "1.2.3.4", 10, 60, backend, now=61.0)
+        assert not decision.allowed
+        assert 1 <= decision.retry_after <= 60
+        # halfway through the next window half of them have aged out
+        assert check("login", "1.2.3.4", 10, 60, backend, now=90.0).allowed
+        assert check("login", "5.6.7.8", 10, 60, backend, now=61.0).allowed
+
+
+def test_login_storm_is_rejected_before_db_work(sqlite_db, sqlite_app, monkeypatch):
+    backend = MemoryRateLimitBackend()
+    monkeypatch.setattr(rate_limit, "get_backend", lambda: backend)
+    client = sqlite_app.test_client()
+    credentials = {"username": "thor", "password": "Mjolnir123!"}
+
+    for _ in range(10):
+        assert client.post("/auth/login", json=credentials).status_code == 401
+
+    with assert_query_budget(max_queries=0):
+        response = client.post("/auth/login", json=credentials)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # Other accounts from the same address are still limited by the per-IP rule only
+    assert client.post("/auth/login", json={"username": "loki", "password": "x"}).status_code == 401
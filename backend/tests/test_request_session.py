@@ -0,0 +1,163 @@
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+from app.database import after_commit, get_db_session
+from app.models import User
+
+
+def track_checkouts(engine):
+    """Record the peak number of simultaneously checked out connections"""
+    state = {"current": 0, "peak": 0, "total": 0}
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(*args):
+        state["current"] += 1
+        state["total"] += 1
+        state["peak"] = max(state["peak"], state["current"])
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(*args):
+        state["current"] -= 1
+
+    return state
+
+
+def create_user(engine):
+    with get_db_session() as db:
+        user = User(email="sam@wilson.com", username="falcon", password="x", onboarding_completed=True)
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+def test_current_user_uses_single_connection(sqlite_db, sqlite_app):
+    user_id = create_user(sqlite_db)
+    with sqlite_app.app_context():
+        token = create_access_token(identity=str(user_id))
+    checkouts = track_checkouts(sqlite_db)
+
+    response = sqlite_app.test_client().get("/auth/user", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert response.get_json()["username"] == "falcon"
+    assert checkouts["peak"] == 1
+
+
+def test_nested_blocks_share_request_session(sqlite_db, sqlite_app):
+    with sqlite_app.test_request_context("/"):
+        with get_db_session() as outer:
+            with get_db_session(readonly=True) as inner:
+                assert inner is outer
+            with get_db_session(nested=True) as savepoint:
+                assert savepoint is outer
+
+
+def test_nested_savepoint_rollback_keeps_outer_work(sqlite_db, sqlite_app):
+    with sqlite_app.test_request_context("/"):
+        with get_db_session() as db:
+            db.add(User(email="a@b.com", username="steve", password="x"))
+            db.flush()
+            try:
+                with get_db_session(nested=True) as inner:
+                    inner.add(User(email="a@b.com", username="steve", password="x"))
+                    inner.flush()  # violates the unique constraint
+            except Exception:
+                pass
+
+    with get_db_session(readonly=True) as db:
+        assert db.query(User).filter_by(username="steve").count() == 1
+
+
+def test_failing_inner_block_leaves_outer_writes_to_the_outer_block(sqlite_db, sqlite_app):
+    def helper_with_default():
+        try:
+            with get_db_session() as inner:
+                inner.query(User).count()
+                raise RuntimeError("lookup failed")
+        except RuntimeError:
+            return 0
+
+    with sqlite_app.test_request_context("/"):
+        with get_db_session() as db:
+            db.add(User(email="clint@shield.gov", username="hawkeye", password="x"))
+            db.flush()
+            assert helper_with_default() == 0
+
+    with get_db_session(readonly=True) as db:
+        assert [u.username for u in db.query(User)] == ["hawkeye"]
+
+
+def test_inner_block_does_not_commit_the_outer_transaction(sqlite_db, sqlite_app):
+    with sqlite_app.test_request_context("/"):
+        try:
+            with get_db_session() as db:
+                db.add(User(email="clint@shield.gov", username="hawkeye", password="x"))
+                with get_db_session() as inner:
+                    inner.add(User(email="nat@shield.gov", username="widow", password="x"))
+                raise RuntimeError("outer block fails after the helper returned")
+        except RuntimeError:
+            pass
+
+    with get_db_session(readonly=True) as db:
+        assert db.query(User).count() == 0
+
+
+def test_after_commit_callbacks_wait_for_the_outermost_commit(sqlite_db, sqlite_app):
+    ran = []
+    with sqlite_app.test_request_context("/"):
+        with get_db_session() as db:
+            with get_db_session(nested=True) as inner:
+                inner.add(User(email="clint@shield.gov", username="hawkeye", password="x"))
+                inner.flush()
+                after_commit(inner, ran.append, "kept")
+            try:
+                with get_db_session(nested=True) as inner:
+                    after_commit(inner, ran.append, "undone")
+                    inner.add(User(email="clint@shield.gov", username="hawkeye", password="x"))
+                    inner.flush()  # violates the unique constraint
+            except Exception:
+                pass
+            assert ran == []  # the savepoint is released, nothing is committed yet
+        assert ran == ["kept"]
+
+        try:
+            with get_db_session() as db:
+                after_commit(db, ran.append, "rolled back")
+                raise RuntimeError("request failed")
+        except RuntimeError:
+            pass
+    assert ran == ["kept"]
+
+
+def test_readonly_outer_block_commits_writes_of_inner_blocks(sqlite_db, sqlite_app):
+    with sqlite_app.test_request_context("/"):
+        with get_db_session(readonly=True) as db:
+            db.query(User).count()
+            with get_db_session() as inner:
+                inner.add(User(email="nat@shield.gov", username="widow", password="x"))
+
+    with get_db_session(readonly=True) as db:
+        assert [u.username for u in db.query(User)] == ["widow"]
+
+
+def test_reads_go_to_replica_unless_primary_session_holds_writes(sqlite_db, sqlite_app, monkeypatch, tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app import database
+
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    database.Base.metadata.create_all(replica)
+    monkeypatch.setattr(database, "replica_engine", replica)
+    monkeypatch.setattr(database, "ReplicaSessionLocal", sessionmaker(bind=replica))
+
+    with sqlite_app.test_request_context("/"):
+        with get_db_session() as primary:
+            primary.query(User).count()  # e.g. the token revocation sync
+            with get_db_session(readonly=True) as reader:
+                assert reader is not primary and reader.get_bind() is replica
+            primary.add(User(email="wanda@westview.com", username="scarlet", password="x"))
+            with get_db_session(readonly=True) as reader:
+                assert reader is primary  # sees the pending write
+        # The committed primary session is idle again; reads go back to the replica
+        with get_db_session(readonly=True) as reader:
+            assert reader.get_bind() is replica
+    replica.dispose()
@@ -0,0 +1,93 @@
+from app.cache import invalidate_user
+from app.chat.response_cache import ChatResponseCache, normalize_question
+
+
+def test_normalize_question_ignores_case_and_punctuation():
+    assert normalize_question("Can I afford to go out this weekend?!") == \
+        normalize_question("can i afford to go out this   weekend")
+
+
+def test_exact_hit_and_context_change():
+    cache = ChatResponseCache(ttl=60, near_duplicates=False)
+    cache.store(7, "Where can I cut costs?", "gpt-4o-mini", "balance 100", "Cook at home.", latency=2.0)
+
+    assert cache.lookup(7, "where can I cut costs", "gpt-4o-mini", "balance 100") == "Cook at home."
+    assert cache.lookup(7, "Where can I cut costs?", "gpt-4o-mini", "balance 900") is None
+    assert cache.lookup(7, "Where can I cut costs?", "gpt-4o", "balance 100") is None
+    assert cache.hit_ratio() == 1 / 3
+
+
+def test_near_duplicate_match():
+    cache = ChatResponseCache(ttl=60, near_duplicates=True, near_threshold=0.8)
+    cache.store(8, "Can I afford to go out this weekend?", "gpt-4o-mini", None, "Yes, within $50.", latency=1.5)
+
+    assert cache.lookup(8, "Can I afford going out this weekend?", "gpt-4o-mini", None) == "Yes, within $50."
+    assert cache.lookup(8, "How do I open a Roth IRA?", "gpt-4o-mini", None) is None
+
+
+def test_near_duplicates_are_off_by_default():
+    cache = ChatResponseCache(ttl=60)
+    cache.store(8, "Can I afford to go out this weekend?", "gpt-4o-mini", None, "Yes.", latency=1.5)
+
+    assert cache.lookup(8, "Can I afford going out this weekend?", "gpt-4o-mini", None) is None
+
+
+def test_near_match_requires_same_numbers_and_negations():
+    cache = ChatResponseCache(ttl=60, near_duplicates=True, near_threshold=0.8)
+    question = "Can I afford to spend $50 on dinner this weekend?"
+    cache.store(8, question, "gpt-4o-mini", None, "Yes.", latency=1.5)
+
+    assert cache.lookup(8, "Can I afford spending $50 on dinner this weekend?", "gpt-4o-mini", None) == "Yes."
+    assert cache.lookup(8, "Can I afford to spend $5000 on dinner this weekend?", "gpt-4o-mini", None) is None
+    assert cache.lookup(8, "Can I afford to spend $500 on dinner this weekend?", "gpt-4o-mini", None) is None
+    assert cache.lookup(8, "Can I not afford to spend $50 on dinner this weekend?", "gpt-4o-mini", None) is None
+    assert cache.lookup(8, "Can't I afford to spend $50 on dinner this weekend?", "gpt-4o-mini", None) is None
+
+    # $5000 gets its own entry rather than sharing the $50 one
+    cache.store(8, "Can I afford to spend $5000 on dinner this weekend?", "gpt-4o-mini", None, "No.", latency=1.5)
+    assert cache.lookup(8, question, "gpt-4o-mini", None) == "Yes."
+    assert cache.lookup(8, "Can I afford spending $5000 on dinner this weekend?", "gpt-4o-mini", None) == "No."
+
+
+def test_user_invalidation_retires_entries():
+    cache = ChatResponseCache(ttl=60)
+    cache.store(9, "Where can I cut costs?", "gpt-4o-mini", None, "Cook at home.", latency=2.0)
+    invalidate_user(9)
+
+    assert cache.lookup(9, "Where can I cut costs?", "gpt-4o-mini", None) is None
+
+
+def test_disabled_cache_never_hits():
+    cache = ChatResponseCache(ttl=0)
+    cache.store(10, "Hi", "gpt-4o-mini", None, "Hello", latency=1.0)
+
+    assert cache.lookup(10, "Hi", "gpt-4o-mini", None) is None
+
+
+def test_repeated_opening_question_skips_model(sqlite_db, sqlite_app, monkeypatch):
+    from flask_jwt_extended import create_access_token
+    from app.chat import routes as chat_routes
+    from app.database import get_db_session
+    from app.models import Conversations, User
+
+    with get_db_session() as db:
+        user = User(email="bruce@banner.com", username="hulk", password="x")
+        db.add(user)
+        db.flush()
+        convos = [Conversations(user_id=user.id, title=f"Conversation {i}") for i in (1, 2)]
+        db.add_all(convos)
+        db.commit()
+        user_id, convo_ids = user.id, [c.id for c in convos]
+    with sqlite_app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+
+    calls = []
+    monkeypatch.setattr(chat_routes, "get_ai_response",
+                        lambda message, conversation_history=None, user_id=None: calls.append(message) or "Skip takeout.")
+    client = sqlite_app.test_client()
+    for convo_id in convo_ids:
+        response = client.post(f"/chat/conversations/{convo_id}/messages",
+                               json={"message": "Where can I cut costs?"}, headers=headers)
+        assert response.get_json() == {"response": "Skip takeout."}
+
+    assert len(calls) == 1
@@ -0,0 +1,113 @@
+from datetime import date
+import numpy as np
+from app.chat.retrieval import HashingEmbedder, RetrievalIndex, render_retrieved
+from app.database import get_db_session
+from app.models import Conversations, Messages, Transaction, User
+
+
+def create_user():
+    rows = [
+        ("Starbucks", 5.40, "Food", date(2025, 6, 3)),
+        ("Starbucks", 6.10, "Food", date(2025, 6, 17)),
+        ("Shell Gas", 40.00, "Transportation", date(2025, 6, 9)),
+        ("Netflix", 15.49, "Subscriptions", date(2025, 7, 1)),
+    ]
+    with get_db_session() as db:
+        user = User(email="natasha@shield.gov", username="widow", password="x")
+        db.add(user)
+        db.flush()
+        for i, (name, amount, category, posted) in enumerate(rows, start=1):
+            db.add(Transaction(id=i, user_id=user.id, plaid_transaction_id=f"tx-{i}", date_posted=posted,
+                               name=name, amount=amount, type="expense", user_category=category))
+        convo = Conversations(user_id=user.id, title="Conversation 1")
+        db.add(convo)
+        db.flush()
+        db.add(Messages(convo_id=convo.id, sender="user", content="I want to cut back on coffee"))
+        db.commit()
+        return user.id
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=64)
+    first, second = embedder.embed(["Starbucks coffee", "Starbucks coffee"])
+
+    assert first.dtype == np.float32
+    assert np.allclose(first, second)
+    assert np.isclose(np.linalg.norm(first), 1.0)
+
+
+def test_search_finds_matching_transactions(sqlite_db):
+    user_id = create_user()
+    index = RetrievalIndex(embedder=HashingEmbedder())
+
+    with get_db_session(readonly=True) as db:
+        rows = index.search(db, user_id, "how much did I spend at Starbucks in June", k=3)
+
+    assert all("Starbucks" in row.text for row in rows[:2])
+    assert "Starbucks" in render_retrieved(rows)
+
+
+def test_index_updates_incrementally(sqlite_db):
+    user_id = create_user()
+    index = RetrievalIndex(embedder=HashingEmbedder())
+    with get_db_session(readonly=True) as db:
+        index.refresh(db, user_id)
+    assert index._user_index(user_id).size == 5
+
+    with get_db_session() as db:
+        db.add(Transaction(id=10, user_id=user_id, plaid_transaction_id="tx-10", date_posted=date(2025, 7, 4),
+                           name="Chipotle", amount=12.5, type="expense", user_category="Food"))
+        db.commit()
+    with get_db_session(readonly=True) as db:
+        rows = index.search(db, user_id, "Chipotle burrito", k=1)
+        updated = db.query(Transaction).filter_by(id=3).one()
+        updated.user_category = "Gas"
+        index.sync_transactions(user_id, [updated])
+
+    assert index._user_index(user_id).size == 6
+    assert rows[0].id == 10
+    assert "Gas" in index._user_index(user_id).texts[index._user_index(user_id).positions[("transaction", 3)]]
+
+
+def test_index_keeps_newest_rows_and_caps_messages_separately(sqlite_db, monkeypatch):
+    from app.chat import retrieval
+
+    monkeypatch.setattr(retrieval, "RETRIEVAL_MAX_ROWS", 2)
+    monkeypatch.setattr(retrieval, "RETRIEVAL_MAX_MESSAGES", 1)
+    user_id = create_user()
+    index = RetrievalIndex(embedder=HashingEmbedder())
+    with get_db_session(readonly=True) as db:
+        index.refresh(db, user_id)
+
+    keys = set(index._user_index(user_id).keys)
+    assert {key for key in keys if key[0] == "transaction"} == {("transaction", 3), ("transaction", 4)}
+    assert len([key for key in keys if key[0] == "message"]) == 1  # not crowded out by transactions
+
+    # New rows are still picked up once the cap is reached
+    with get_db_session() as db:
+        db.add(Transaction(id=10, user_id=user_id, plaid_transaction_id="tx-10", date_posted=date(2025, 7, 4),
+                           name="Chipotle", amount=12.5, type="expense", user_category="Food"))
+        db.commit()
+    with get_db_session(readonly=True) as db:
+        index.refresh(db, user_id)
+    assert ("transaction", 10) in index._user_index(user_id).positions
+
+
+def test_empty_index_picks_up_first_rows(sqlite_db):
+    with get_db_session() as db:
+        user = User(email="maria@hill.gov", username="hill", password="x")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    index = RetrievalIndex(embedder=HashingEmbedder())
+    with get_db_session(readonly=True) as db:
+        index.refresh(db, user_id)
+    assert index._user_index(user_id).size == 0
+
+    with get_db_session() as db:
+        db.add(Transaction(id=1, user_id=user_id, plaid_transaction_id="tx-1", date_posted=date(2025, 7, 4),
+                           name="Chipotle", amount=12.5, type="expense", user_category="Food"))
+        db.commit()
+    with get_db_session(readonly=True) as db:
+        index.refresh(db, user_id)
+    assert index._user_index(user_id).size == 1
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+# Generous enough for a slow CI box; booting with the SDKs imported eagerly took ~3.6s
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 2500))
+LAZY_SDKS = ("plaid", "stripe", "openai")
+
+
+def import_times(code):
+    """Run code under `python -X importtime`; returns {module: cumulative microseconds} and the top-level total"""
+    env = dict(os.environ, SECRET_KEY="x", JWT_SECRET_KEY="y", DATABASE_URL="sqlite://", OPENAI_API_KEY="x")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    modules, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+        if not name.startswith("  "):  # nested imports are already in their parent's cumulative time
+            total += int(cumulative)
+    return modules, total
+
+
+def test_app_boot_skips_sdks_and_stays_within_import_budget():
+    # Warm run first so .pyc compilation isn't counted
+    import_times("from app import create_app; create_app()")
+    modules, total = import_times("from app import create_app; create_app()")
+
+    assert [sdk for sdk in LAZY_SDKS if sdk in modules] == []
+    assert total / 1000 < STARTUP_IMPORT_BUDGET_MS, f"app boot imports took {total / 1000:.0f}ms"
+
+
+def test_sdk_clients_load_on_first_use():
+    modules, _ = import_times(
+        "from app.plaid.client import get_plaid_client; from app.chat.llm_client import get_client; "
+        "from app.waitlist.routes import get_stripe; get_plaid_client(); get_client(); get_stripe()")
+
+    assert all(sdk in modules for sdk in LAZY_SDKS)
@@ -0,0 +1,46 @@
+from datetime import date
+
+from app.database import get_db_session
+from app.gambling_detection import get_gambling_detection_details
+from app.models import Conversations, Messages, Transaction, User, Waitlist
+from app.synthetic import generate_user, seed_dataset
+
+TODAY = date(2025, 7, 31)
+
+
+def test_users_are_deterministic_per_seed_and_index():
+    first = generate_user(seed=7, index=3, user_id=10, today=TODAY, days=90)
+    again = generate_user(seed=7, index=3, user_id=10, today=TODAY, days=90)
+    other = generate_user(seed=8, index=3, user_id=10, today=TODAY, days=90)
+
+    assert first == again
+    assert first.transactions != other.transactions
+    assert all(TODAY.replace(month=5, day=3) <= row[2] <= TODAY for row in first.transactions)
+
+
+def test_histories_have_income_subscriptions_and_detectable_bets():
+    users = [generate_user(seed=1, index=i, user_id=i + 1, today=TODAY, days=120) for i in range(40)]
+    rows = [row for user in users for row in user.transactions]
+
+    assert any(row[5] == "income" and row[8] == "Income" and row[9] for row in rows)
+    assert any(row[5] == "expense" and row[9] for row in rows)  # subscriptions
+    bets = [row for row in rows if row[7] == "Recreation, Gambling"]
+    assert bets, "a share of users should gamble"
+    assert all(get_gambling_detection_details({"name": row[3], "amount": row[4]}).is_gambling for row in bets)
+
+
+def test_seed_dataset_copies_everything_and_appends_on_rerun(sqlite_db):
+    with get_db_session() as db:
+        counts = seed_dataset(db, users=5, days=30, waitlist=4, seed=3, batch_size=2, today=TODAY)
+        again = seed_dataset(db, users=2, days=30, seed=3, batch_size=2, today=TODAY)
+
+        assert counts.users == 5 and again.users == 2
+        assert db.query(User).count() == 7
+        assert db.query(Transaction).count() == counts.transactions + again.transactions
+        assert db.query(Conversations).count() == counts.conversations + again.conversations
+        assert db.query(Messages).count() == counts.messages + again.messages
+        assert db.query(Waitlist).count() == 4
+        # Same seed and index, new ids: the rerun's first user mirrors the first run's
+        first, rerun_first = db.query(User).order_by(User.id).all()[0::5]
+        assert (first.name, first.salary_monthly) == (rerun_first.name, rerun_first.salary_monthly)
+        assert rerun_first.email == f"user{rerun_first.id}@seed.polarity.test"
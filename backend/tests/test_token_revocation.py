@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+
+from flask_jwt_extended import create_refresh_token
+
+from app.auth import revocation
+from app.auth.revocation import BloomFilter, DatabaseRevocationBackend, RevocationStore
+from app.database import get_db_session
+from app.models import RevokedToken, User
+from app.query_stats import assert_query_budget
+
+
+def in_hours(hours):
+    return datetime.now(timezone.utc) + timedelta(hours=hours)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+    assert all(f"jti-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_revocations_are_shared_and_unknown_tokens_skip_the_db(sqlite_db):
+    worker_a = RevocationStore(DatabaseRevocationBackend(), sync_interval=0)
+    worker_b = RevocationStore(DatabaseRevocationBackend(), sync_interval=60)
+    worker_b.sync(force=True)
+
+    worker_a.revoke("logged-out", in_hours(1), user_id="7")
+    assert worker_a.is_revoked("logged-out")
+
+    # worker_b learns about it on its next sync
+    assert not worker_b.is_revoked("logged-out")
+    worker_b.sync(force=True)
+    assert worker_b.is_revoked("logged-out")
+
+    with assert_query_budget(max_queries=0):
+        assert not worker_b.is_revoked("never-revoked")
+
+
+def test_backend_lookup_uses_a_readonly_session(sqlite_db, monkeypatch):
+    backend = DatabaseRevocationBackend()
+    backend.add("logged-out", in_hours(1))
+    opened = []
+    original = revocation.get_db_session
+
+    def get_db_session(*args, **kwargs):
+        opened.append(kwargs.get("readonly", False))
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(revocation, "get_db_session", get_db_session)
+
+    assert backend.contains("logged-out") and not backend.contains("unknown")
+    assert opened == [True, True]
+
+
+def test_purge_drops_expired_entries(sqlite_db):
+    store = RevocationStore(DatabaseRevocationBackend(), sync_interval=0)
+    store.revoke("expired", in_hours(-1))
+    store.revoke("active", in_hours(1))
+
+    assert store.purge() == 1
+
+    assert not store.is_revoked("expired")
+    assert store.is_revoked("active")
+    with get_db_session(readonly=True) as db:
+        assert [row.jti for row in db.query(RevokedToken).all()] == ["active"]
+
+
+def test_logout_revokes_refresh_token(sqlite_db, sqlite_app):
+    with get_db_session() as db:
+        user = User(email="tony@starkindustries.com", username="ironman", password="x")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    with sqlite_app.app_context():
+        refresh_token = create_refresh_token(identity=str(user_id))
+    client = sqlite_app.test_client()
+    headers = {"Authorization": f"Bearer {refresh_token}"}
+
+    assert client.post("/auth/refresh", headers=headers).status_code == 200
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+
+    response = client.post("/auth/refresh", headers=headers)
+    assert response.status_code == 401
+    assert response.get_json() == {"error": "Token has been revoked"}
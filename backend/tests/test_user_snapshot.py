@@ -0,0 +1,48 @@
+import bcrypt
+
+from app.auth.revocation import revocation_store
+from app.database import get_db_session
+from app.models import User
+from app.query_stats import assert_query_budget
+from app.user_snapshot import get_user_snapshot
+
+
+def create_user():
+    with get_db_session() as db:
+        user = User(email="carol@starforce.org", username="marvel", name="Carol",
+                    password=bcrypt.hashpw(b"Binary-Power7", bcrypt.gensalt(rounds=4)).decode(),
+                    onboarding_step=1, financial_goals='["save"]')
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+def test_login_primes_the_snapshot(sqlite_db, sqlite_app):
+    user_id = create_user()
+    client = sqlite_app.test_client()
+    response = client.post("/auth/login", json={"username": "marvel", "password": "Binary-Power7"})
+    headers = {"Authorization": f"Bearer {response.get_json()['access_token']}"}
+    with sqlite_app.app_context():
+        revocation_store.sync(force=True)
+
+    with assert_query_budget(max_queries=0):
+        response = client.get("/onboarding/status", headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_json()["user_data"]["financial_goals"] == ["save"]
+    assert get_user_snapshot(user_id).bank_connected is False
+
+
+def test_onboarding_write_invalidates_the_snapshot(sqlite_db, sqlite_app):
+    user_id = create_user()
+    assert get_user_snapshot(user_id).age is None
+    client = sqlite_app.test_client()
+    response = client.post("/auth/login", json={"username": "marvel", "password": "Binary-Power7"})
+    headers = {"Authorization": f"Bearer {response.get_json()['access_token']}"}
+
+    response = client.post("/onboarding/step/3", json={"age": 29}, headers=headers)
+    assert response.status_code == 200
+
+    status = client.get("/onboarding/status", headers=headers).get_json()
+    assert status["user_data"]["age"] == 29
+    assert get_user_snapshot(user_id).age == 29
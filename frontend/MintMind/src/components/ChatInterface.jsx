@@ -84,6 +84,9 @@ const ChatInterface = ({
   onSendMessage,
   isLoading,
   isNewConversation,
+  hasOlderMessages = false,
+  onLoadOlderMessages,
+  isLoadingOlder = false,
 }) => {
   const [inputMessage, setInputMessage] = useState("");
   const messagesEndRef = useRef(null);
@@ -92,9 +95,11 @@ const ChatInterface = ({
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
+  // Follow new messages at the bottom, but stay put when older ones are prepended
+  const lastMessageId = messages[messages.length - 1]?.id;
   useEffect(() => {
     scrollToBottom();
-  }, [messages]);
+  }, [lastMessageId]);
 
   const handleSend = () => {
     if (!inputMessage.trim() || isLoading) return;
@@ -141,6 +146,19 @@ const ChatInterface = ({
             <div className="flex-1 min-h-0 overflow-y-auto">
               <ScrollArea className="h-full p-6">
                 <div className="max-w-3xl mx-auto space-y-6">
+                  {hasOlderMessages && (
+                    <div className="flex justify-center">
+                      <Button
+                        variant="ghost"
+                        size="sm"
+                        onClick={onLoadOlderMessages}
+                        disabled={isLoadingOlder}
+                        className="text-slate-300 hover:text-emerald-400 hover:bg-white/10 rounded-xl"
+                      >
+                        {isLoadingOlder ? "Loading..." : "Load earlier messages"}
+                      </Button>
+                    </div>
+                  )}
                   {messages.map((message, index) => (
                     <div
                       key={message.id}
@@ -21,6 +21,9 @@ const ConversationSidebar = ({
   isCollapsed,
   onToggleCollapse,
   appSidebarCollapsed = false, // Add this prop to know AppSidebar state
+  hasOlderConversations = false,
+  onLoadOlderConversations,
+  isLoadingOlder = false,
 }) => {
   const [hoveredId, setHoveredId] = useState(null);
   const [searchTerm, setSearchTerm] = useState("");
@@ -211,6 +214,17 @@ const ConversationSidebar = ({
               ))}
             </div>
           )}
+          {/* Only the newest page is loaded up front; search covers loaded conversations */}
+          {hasOlderConversations && (
+            <Button
+              variant="ghost"
+              onClick={onLoadOlderConversations}
+              disabled={isLoadingOlder}
+              className="w-full mt-3 text-slate-300 hover:text-emerald-400 hover:bg-white/10 rounded-xl"
+            >
+              {isLoadingOlder ? "Loading..." : "Load older conversations"}
+            </Button>
+          )}
         </div>
       </ScrollArea>
     </div>
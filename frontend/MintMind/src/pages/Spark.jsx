@@ -7,6 +7,7 @@ import {
   create_conversation,
   get_conversations,
   get_conversation_messages,
+  next_cursor,
   get_specific_conversation,
   delete_conversation,
   send_user_message,
@@ -22,6 +23,10 @@ const Spark = () => {
   const [errorMessage, setErrorMessage] = useState("");
   const [messages, setMessages] = useState([]);
   const [userData, setUserData] = useState(null);
+  // X-Next-Cursor of the oldest loaded page; null once everything is loaded
+  const [conversationsCursor, setConversationsCursor] = useState(null);
+  const [messagesCursor, setMessagesCursor] = useState(null);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
 
   // Get main sidebar state
   const { state: mainSidebarState } = useSidebar();
@@ -43,14 +48,34 @@ const Spark = () => {
     return fullName.split(" ")[0];
   };
 
-  // Function to fetch and update conversations
-  const fetchConversations = async () => {
+  const sortByLastModified = (list) =>
+    [...list].sort(
+      (a, b) => new Date(b.last_modified) - new Date(a.last_modified)
+    );
+
+  const formatMessages = (data) =>
+    data.map((msg) => ({
+      id: msg.id,
+      text: msg.content,
+      isBot: msg.sender !== "user",
+      timestamp: msg.timestamp,
+    }));
+
+  // Function to fetch and update conversations. Only the newest page is loaded;
+  // with keepOlder, pages loaded through "load more" stay below it.
+  const fetchConversations = async ({ keepOlder = false } = {}) => {
     try {
-      const { data } = await get_conversations(); //We abstract away logic for fetching conversations in service layer
-      const sorted = [...data].sort(
-        (a, b) => new Date(b.last_modified) - new Date(a.last_modified)
-      );
+      const { data, response } = await get_conversations(); //We abstract away logic for fetching conversations in service layer
+      const newest = sortByLastModified(data);
+      const newestIds = new Set(newest.map((conv) => conv.id));
+      const older = keepOlder
+        ? conversations.filter((conv) => !newestIds.has(conv.id))
+        : [];
+      const sorted = [...newest, ...older];
       setConversations(sorted);
+      if (!keepOlder || older.length === 0) {
+        setConversationsCursor(next_cursor(response));
+      }
       if (sorted.length > 0 && !activeConversationId) {
         setActiveConversationId(sorted[0].id);
       }
@@ -87,6 +112,24 @@ const Spark = () => {
     });
   }, []);
 
+  const loadOlderConversations = async () => {
+    if (!conversationsCursor || isLoadingOlder) return;
+    setIsLoadingOlder(true);
+    try {
+      const { data, response } = await get_conversations({
+        cursor: conversationsCursor,
+      });
+      setConversations((prev) => {
+        const loaded = new Set(prev.map((conv) => conv.id));
+        return [...prev, ...data.filter((conv) => !loaded.has(conv.id))];
+      });
+      setConversationsCursor(next_cursor(response));
+    } catch (error) {
+      setErrorMessage("Failed to load older conversations.");
+    }
+    setIsLoadingOlder(false);
+  };
+
   const handleNewConversation = async () => {
     try {
       //Refactor: call new conversation from service layer
@@ -96,6 +139,7 @@ const Spark = () => {
       await fetchConversations();
       setActiveConversationId(data.id);
       setMessages([]); // Clear messages for new conversation
+      setMessagesCursor(null);
     } catch (error) {
       setErrorMessage("Failed to create new conversation.");
     }
@@ -105,20 +149,35 @@ const Spark = () => {
     setActiveConversationId(conversationId);
     setIsLoading(true);
     try {
-      const { data } = await get_conversation_messages(conversationId);
-      const formattedMessages = data.map((msg) => ({
-        id: msg.id,
-        text: msg.content,
-        isBot: msg.sender !== "user",
-        timestamp: msg.timestamp,
-      }));
-      setMessages(formattedMessages);
+      // Newest page only; older messages are loaded on demand
+      const { data, response } = await get_conversation_messages(conversationId);
+      setMessages(formatMessages(data));
+      setMessagesCursor(next_cursor(response));
     } catch (error) {
       setMessages([]);
+      setMessagesCursor(null);
     }
     setIsLoading(false);
   };
 
+  const loadOlderMessages = async () => {
+    if (!messagesCursor || !activeConversationId || isLoadingOlder) return;
+    const conversationId = activeConversationId;
+    setIsLoadingOlder(true);
+    try {
+      const { data, response } = await get_conversation_messages(
+        conversationId,
+        { cursor: messagesCursor }
+      );
+      // Each page is oldest-first, and this one comes before everything loaded
+      setMessages((prev) => [...formatMessages(data), ...prev]);
+      setMessagesCursor(next_cursor(response));
+    } catch (error) {
+      setErrorMessage("Failed to load older messages.");
+    }
+    setIsLoadingOlder(false);
+  };
+
   const handleDeleteConversation = async (conversationId) => {
     try {
       await delete_conversation(conversationId);
@@ -133,6 +192,7 @@ const Spark = () => {
         } else {
           setActiveConversationId(null);
           setMessages([]);
+          setMessagesCursor(null);
         }
       }
     } catch (error) {
@@ -157,6 +217,7 @@ const Spark = () => {
         await fetchConversations();
         setActiveConversationId(conversationId);
         setMessages([]); // Clear messages for new conversation
+        setMessagesCursor(null);
       } catch (error) {
         setErrorMessage("Failed to create new conversation.");
         return;
@@ -174,22 +235,20 @@ const Spark = () => {
     setIsLoading(true);
 
     try {
-      await send_user_message(conversationId, messageText);
+      const { data } = await send_user_message(conversationId, messageText);
 
-      // After sending, fetch both the updated message list and refresh conversations
-      const [messagesResponse] = await Promise.all([
-        get_conversation_messages(conversationId),
-        fetchConversations(),
+      // Append the reply instead of reloading the history
+      setMessages((prev) => [
+        ...prev,
+        {
+          id: `${userMessage.id}-reply`,
+          text: data.response,
+          isBot: true,
+          timestamp: new Date().toISOString(),
+        },
       ]);
-
-      // Update messages
-      const formattedMessages = messagesResponse.data.map((msg) => ({
-        id: msg.id,
-        text: msg.content,
-        isBot: msg.sender !== "user",
-        timestamp: msg.timestamp,
-      }));
-      setMessages(formattedMessages);
+      // Newest conversations page only: picks up the new order and titles
+      await fetchConversations({ keepOlder: true });
     } catch (error) {
       // Optionally show an error message
     }
@@ -215,6 +274,9 @@ const Spark = () => {
         onSelectConversation={handleSelectConversation}
         onNewConversation={handleNewConversation}
         onDeleteConversation={handleDeleteConversation}
+        hasOlderConversations={Boolean(conversationsCursor)}
+        onLoadOlderConversations={loadOlderConversations}
+        isLoadingOlder={isLoadingOlder}
         isCollapsed={sidebarCollapsed}
         onToggleCollapse={() => setSidebarCollapsed(!sidebarCollapsed)}
         appSidebarCollapsed={isMainSidebarCollapsed}
@@ -237,6 +299,9 @@ const Spark = () => {
           onSendMessage={handleSendMessage}
           isLoading={isLoading}
           isNewConversation={messages.length === 0}
+          hasOlderMessages={Boolean(messagesCursor)}
+          onLoadOlderMessages={loadOlderMessages}
+          isLoadingOlder={isLoadingOlder}
         />
         {errorMessage && (
           <div className="text-red-500 text-center py-2">{errorMessage}</div>
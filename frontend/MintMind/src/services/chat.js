@@ -18,9 +18,24 @@ export async function create_conversation(title) {
   });
 }
 
-export async function get_conversations() {
+// List endpoints are cursor paginated: pass the previous response's
+// X-Next-Cursor header as `cursor` to load the next (older) page.
+function pageQuery({ cursor, limit } = {}) {
+  const params = new URLSearchParams();
+  if (cursor) params.set("cursor", cursor);
+  if (limit) params.set("limit", limit);
+  const query = params.toString();
+  return query ? `?${query}` : "";
+}
+
+// Cursor for the page after `response`, null once the oldest page is loaded
+export function next_cursor(response) {
+  return response.headers.get("X-Next-Cursor");
+}
+
+export async function get_conversations(page) {
   const token = localStorage.getItem("access_token");
-  return apiService.request("/chat/conversations", {
+  return apiService.request(`/chat/conversations${pageQuery(page)}`, {
     method: "GET",
     headers: {
       Authorization: `Bearer ${token}`,
@@ -38,9 +53,9 @@ export async function get_specific_conversation(id) {
   });
 }
 
-export async function get_conversation_messages(id) {
+export async function get_conversation_messages(id, page) {
   const token = localStorage.getItem("access_token");
-  return apiService.request(`/chat/conversations/${id}/messages`, {
+  return apiService.request(`/chat/conversations/${id}/messages${pageQuery(page)}`, {
     method: "GET",
     headers: {
       Authorization: `Bearer ${token}`,